@@ -1,12 +1,16 @@
 import streamlit as st
 import streamlit.components.v1 as components
 from database import db
+from scheduling import SlotUnavailable, SLOT_MINUTES
+from vitals import GRAIN_DAYS, add_bmi, health_scores, trend_slopes
+from downsampling import CHART_WIDTH_PX, OVERSAMPLE, downsample, point_budget
+from intent_router import route_intent
 import hashlib
 import json
 from datetime import datetime, date, time
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
 from PIL import Image
 import io
 import requests
@@ -87,6 +91,38 @@ def get_status_badge(status):
     }
     return f'<span class="status-badge {status_classes.get(status, "status-pending")}">{status.title()}</span>'
 
+# Keyset-paginated history lists
+HISTORY_PAGE_SIZE = 10
+
+def history_filters(key, statuses):
+    """Status and date filters for a history list; changing them goes back to the first page"""
+    col1, col2, col3 = st.columns(3)
+    status = col1.selectbox("Status", ["All"] + statuses, key=f"{key}_status",
+                            format_func=lambda s: s.replace('_', ' ').title())
+    date_from = col2.date_input("From", value=None, key=f"{key}_from")
+    date_to = col3.date_input("To", value=None, key=f"{key}_to")
+
+    filters = {"status": None if status == "All" else status, "date_from": date_from, "date_to": date_to}
+    if st.session_state.get(f"{key}_filters") != filters:
+        st.session_state[f"{key}_filters"] = filters
+        st.session_state[f"{key}_cursors"] = [None]
+    return filters
+
+def fetch_history_page(key, fetch_page, filters):
+    """Fetch only the current page; the session keeps the cursor of every page visited so far"""
+    cursors = st.session_state.setdefault(f"{key}_cursors", [None])
+    return fetch_page(st.session_state.user[0], cursors[-1], HISTORY_PAGE_SIZE, **filters)
+
+def history_page_controls(key, next_cursor):
+    cursors = st.session_state[f"{key}_cursors"]
+    if len(cursors) == 1 and next_cursor is None:
+        return
+    col1, col2, col3 = st.columns([1, 2, 1])
+    col1.button("◀ Previous", key=f"{key}_prev", disabled=len(cursors) == 1, on_click=cursors.pop)
+    col2.markdown(f"<div style='text-align: center'>Page {len(cursors)}</div>", unsafe_allow_html=True)
+    col3.button("Next ▶", key=f"{key}_next", disabled=next_cursor is None,
+                on_click=cursors.append, args=(next_cursor,))
+
 # Authentication functions
 def login():
     st.sidebar.markdown("### 🔐 Login")
@@ -187,11 +223,44 @@ def ai_symptom_checker():
             st.error("Please describe your symptoms")
 
 # Health Monitoring Dashboard
+# Chart range label -> days of history (None for everything)
+HEALTH_RANGES = {"Last 30 days": 30, "Last 90 days": 90, "Last year": 365, "All time": None}
+
+def trend_text(slope, unit):
+    return f" ({slope:+.1f} {unit}/week)" if pd.notna(slope) else ""
+
+def series_figure_json(title, traces, mode, budget, method):
+    """Figure JSON with each (name, series) trace downsampled to the point budget."""
+    fig = go.Figure([go.Scatter(x=points.index, y=points.to_numpy(), name=name, mode=mode)
+                     for name, series in traces
+                     for points in [downsample(series, budget, method)]])
+    fig.update_layout(title_text=title, showlegend=len(traces) > 1)
+    spec = fig.to_plotly_json()
+    # Streamlit applies its own theme, and the default template is most of the payload
+    spec["layout"].pop("template", None)
+    return json.dumps(spec, cls=PlotlyJSONEncoder)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def health_charts(user_id, range_label, resolution, fingerprint, _df, _trends):
+    """Vitals chart JSON, cached per (patient, range, resolution) and the data it was drawn from."""
+    return {
+        "weight": series_figure_json(
+            f"Weight Trend{trend_text(_trends['weight_kg'], 'kg')}",
+            [("Weight", _df["weight_kg"])], "lines+markers", resolution, "lttb"),
+        "blood_pressure": series_figure_json(
+            f"Blood Pressure Trend{trend_text(_trends['blood_pressure_systolic'], 'mmHg')}",
+            [("Systolic", _df["blood_pressure_systolic"]), ("Diastolic", _df["blood_pressure_diastolic"])],
+            "lines+markers", resolution, "lttb"),
+        "heart_rate": series_figure_json(
+            f"Heart Rate{trend_text(_trends['heart_rate'], 'bpm')}",
+            [("Heart Rate", _df["heart_rate"])], "markers", resolution, "minmax"),
+    }
+
 def health_monitoring():
     st.markdown("### 📈 Health Monitoring Dashboard")
 
-    if st.button("➕ Add Health Data", use_container_width=True):
-        with st.form("health_form"):
+    with st.expander("➕ Add Health Data"):
+        with st.form("health_form", clear_on_submit=True):
             col1, col2, col3 = st.columns(3)
 
             with col1:
@@ -207,46 +276,63 @@ def health_monitoring():
             with col3:
                 blood_glucose = st.number_input("Blood Glucose (mg/dL)", min_value=0.0, max_value=600.0, step=0.1)
                 oxygen_sat = st.number_input("Oxygen Saturation (%)", min_value=0, max_value=100)
+                date_recorded = st.date_input("Date", value=date.today(), max_value=date.today())
                 notes = st.text_area("Additional Notes", height=100)
 
             if st.form_submit_button("Save Data", use_container_width=True):
-                # In a real app, this would insert into health_monitoring table
-                st.success("Health data saved successfully!")
-
-    # Mock health data for demonstration
-    health_data = {
-        'Date': pd.date_range(start='2024-01-01', periods=30, freq='D'),
-        'Weight': [75 + i*0.1 for i in range(-15, 15)],
-        'Blood Pressure Sys': [120 + i for i in range(-10, 20)],
-        'Blood Pressure Dia': [80 + i//2 for i in range(-10, 20)],
-        'Heart Rate': [72 + i%10 for i in range(30)]
-    }
-
-    df = pd.DataFrame(health_data)
+                # Fields left at zero weren't measured
+                readings = {name: value for name, value in {
+                    "weight_kg": weight, "height_cm": height,
+                    "blood_pressure_systolic": systolic, "blood_pressure_diastolic": diastolic,
+                    "heart_rate": heart_rate, "temperature": temperature,
+                    "blood_glucose": blood_glucose, "oxygen_saturation": oxygen_sat,
+                }.items() if value}
+                if readings:
+                    db.create_health_reading(st.session_state.user[0], date_recorded, notes or None, **readings)
+                    st.success("Health data saved successfully!")
+                else:
+                    st.error("Enter at least one measurement")
+
+    range_label = st.radio("Range", list(HEALTH_RANGES), horizontal=True, label_visibility="collapsed")
+    user_id = st.session_state.user[0]
+    # Fetch a few periods per plotted point so long ranges still have detail to downsample from
+    grain, df = db.get_health_series(user_id, HEALTH_RANGES[range_label],
+                                     max_periods=point_budget(CHART_WIDTH_PX) * OVERSAMPLE)
+
+    if df.empty:
+        st.info("No health data recorded for this period yet. Add a reading above to start tracking.")
+        return
+
+    df = add_bmi(df)
+    # Health score and BMI from the latest value of each measurement in the range
+    latest = df.ffill().iloc[[-1]]
+    health_score, bmi = health_scores(latest).iloc[0], latest["bmi"].iloc[0]
+    trends = trend_slopes(df, ["weight_kg", "blood_pressure_systolic", "heart_rate"])
+
+    visible_days = HEALTH_RANGES[range_label] or (df.index[-1] - df.index[0]).days + 1
+    resolution = point_budget(CHART_WIDTH_PX, visible_days, GRAIN_DAYS[grain])
+    fingerprint = int(pd.util.hash_pandas_object(df).sum())
+    charts = health_charts(user_id, range_label, resolution, fingerprint, df, trends)
+    st.caption(f"{grain.title()} averages of {int(df['readings'].sum())} readings")
 
     # Charts
     col1, col2 = st.columns(2)
 
     with col1:
-        fig = px.line(df, x='Date', y='Weight', title='Weight Trend')
-        st.plotly_chart(fig, use_container_width=True)
-
-        fig2 = px.line(df, x='Date', y=['Blood Pressure Sys', 'Blood Pressure Dia'],
-                      title='Blood Pressure Trend')
-        st.plotly_chart(fig2, use_container_width=True)
+        st.plotly_chart(json.loads(charts["weight"]), use_container_width=True)
+        st.plotly_chart(json.loads(charts["blood_pressure"]), use_container_width=True)
 
     with col2:
-        fig3 = px.scatter(df, x='Date', y='Heart Rate', title='Heart Rate')
-        st.plotly_chart(fig3, use_container_width=True)
+        st.plotly_chart(json.loads(charts["heart_rate"]), use_container_width=True)
 
         # Health score card
         st.markdown("### 🏥 Health Score")
-        bmi = 75 / ((180/100)**2)  # Mock BMI calculation
-        health_score = 85  # Mock health score
+        if pd.notna(bmi):
+            st.metric("BMI", f"{bmi:.1f}")
 
         fig4 = go.Figure(go.Indicator(
             mode="gauge+number",
-            value=health_score,
+            value=health_score if pd.notna(health_score) else 0,
             title={'text': "Overall Health Score"},
             gauge={'axis': {'range': [None, 100]},
                    'steps': [
@@ -399,20 +485,19 @@ def display_current_page():
 def display_dashboard():
     st.markdown('<h2 class="main-header">🏠 Dashboard</h2>', unsafe_allow_html=True)
 
+    summary = db.get_dashboard_summary(st.session_state.user[0])
+
     # Quick stats
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        appointments = db.get_user_appointments(st.session_state.user[0])
-        st.metric("Total Appointments", len(appointments))
+        st.metric("Total Appointments", summary["appointments"])
 
     with col2:
-        lab_appointments = db.get_user_lab_appointments(st.session_state.user[0])
-        st.metric("Lab Tests", len(lab_appointments))
+        st.metric("Lab Tests", summary["lab_appointments"])
 
     with col3:
-        pharmacy_orders = db.get_user_pharmacy_orders(st.session_state.user[0])
-        st.metric("Pharmacy Orders", len(pharmacy_orders))
+        st.metric("Pharmacy Orders", summary["pharmacy_orders"])
 
     with col4:
         st.metric("Health Score", "85%")
@@ -423,7 +508,7 @@ def display_dashboard():
     tab1, tab2, tab3, tab4 = st.tabs(["🗓️ Appointments", "🧪 Lab Results", "💊 Pharmacy", "🏃‍♂️ Activities"])
 
     with tab1:
-        recent_appointments = appointments[:5] if appointments else []
+        recent_appointments = summary["recent_appointments"]
         if recent_appointments:
             for appt in recent_appointments:
                 st.markdown(f"""
@@ -437,8 +522,9 @@ def display_dashboard():
         st.info("No recent lab results")
 
     with tab3:
-        if pharmacy_orders:
-            st.markdown(f"Latest order: {pharmacy_orders[0][4]} - {get_status_badge(pharmacy_orders[0][5])}", unsafe_allow_html=True)
+        latest_order = summary["latest_pharmacy_order"]
+        if latest_order:
+            st.markdown(f"Latest order: {latest_order[4]} - {get_status_badge(latest_order[5])}", unsafe_allow_html=True)
 
     with tab4:
         st.info("Track your daily health activities here")
@@ -446,48 +532,55 @@ def display_dashboard():
 def display_book_appointment():
     st.markdown("### 📅 Book Doctor Appointment")
 
-    doctors = db.get_available_doctors()
+    doctors = db.get_catalog().doctors
 
     col1, col2 = st.columns(2)
 
     with col1:
-        doctor_options = {f"{doc[1]} - {doc[2]}": doc[0] for doc in doctors}
+        doctor_options = {f"{doc[1]} - {doc[2]}": doc[0] for doc in doctors.rows}
         selected_doctor = st.selectbox("Select Doctor", list(doctor_options.keys()))
 
         appointment_type = st.selectbox("Appointment Type",
                                       ["Regular Checkup", "Consultation", "Follow-up", "Emergency"])
 
-        appointment_date = st.date_input("Appointment Date", min_value=date.today())
-        appointment_time = st.time_input("Appointment Time")
+        doctor_id = doctor_options[selected_doctor]
+        st.caption(f"Available: {doctors.by_id[doctor_id][5]} ({SLOT_MINUTES}-minute slots)")
+        appointment_date = st.date_input("Earliest Date", min_value=date.today())
+        slots = db.get_available_slots(doctor_id, count=8, after=datetime.combine(appointment_date, time.min))
+        selected_slot = st.selectbox(
+            "Available Slot", slots,
+            format_func=lambda slot: f"{datetime.fromisoformat(slot[0]).strftime('%a %d %b %Y')} at {slot[1]}")
 
     with col2:
         symptoms = st.text_area("Describe your Symptoms (optional)", height=100)
         additional_notes = st.text_area("Additional Notes", height=80)
 
     if st.button("Book Appointment", use_container_width=True):
-        if selected_doctor and appointment_date and appointment_time:
-            doctor_id = doctor_options[selected_doctor]
-            appointment_id = db.create_appointment(
-                st.session_state.user[0],
-                doctor_id,
-                appointment_type,
-                appointment_date,
-                appointment_time,
-                symptoms,
-                additional_notes
-            )
-            if appointment_id:
+        if selected_doctor and selected_slot:
+            try:
+                db.create_appointment(
+                    st.session_state.user[0],
+                    doctor_id,
+                    appointment_type,
+                    selected_slot[0],
+                    selected_slot[1],
+                    symptoms,
+                    additional_notes
+                )
                 st.success("✅ Appointment booked successfully!")
                 st.balloons()
-            else:
-                st.error("Failed to book appointment")
+            except SlotUnavailable as e:
+                st.error(f"Failed to book appointment: {e}")
+        elif not slots:
+            st.error("No free slots with this doctor in the booking window")
         else:
             st.error("Please fill all required fields")
 
 def display_my_appointments():
     st.markdown("### 📋 My Appointments")
 
-    appointments = db.get_user_appointments(st.session_state.user[0])
+    filters = history_filters("appointments", ["scheduled", "confirmed", "completed", "cancelled"])
+    appointments, next_cursor = fetch_history_page("appointments", db.get_user_appointments_page, filters)
 
     if appointments:
         for appt in appointments:
@@ -510,20 +603,21 @@ def display_my_appointments():
                     if appt[6] == 'scheduled':
                         if st.button("Cancel Appointment", key=f"cancel_{appt[0]}"):
                             st.success("Appointment cancelled")
+        history_page_controls("appointments", next_cursor)
     else:
         st.info("No appointments found. Book your first appointment!")
 
 def display_lab_services():
     st.markdown("### 🧪 Lab Services")
 
-    lab_services = db.get_lab_services()
+    lab_services = db.get_catalog().lab_services
 
     col1, col2 = st.columns([2, 1])
 
     with col1:
-        selected_service = st.selectbox("Select Lab Test", [service[1] for service in lab_services])
+        selected_service = st.selectbox("Select Lab Test", lab_services.names())
 
-        service_details = next((s for s in lab_services if s[1] == selected_service), None)
+        service_details = lab_services.by_name.get(selected_service)
 
         if service_details:
             st.markdown(f"**Description:** {service_details[2]}")
@@ -554,7 +648,8 @@ def display_lab_services():
 
     # My lab appointments
     st.markdown("### My Lab Appointments")
-    lab_appointments = db.get_user_lab_appointments(st.session_state.user[0])
+    filters = history_filters("lab_appointments", ["scheduled", "completed", "cancelled"])
+    lab_appointments, next_cursor = fetch_history_page("lab_appointments", db.get_user_lab_appointments_page, filters)
 
     if lab_appointments:
         for appt in lab_appointments:
@@ -562,6 +657,7 @@ def display_lab_services():
             **{appt[-3]}** - ${appt[-1]:.2f}
             - Date: {appt[3]} at {appt[4]}
             - Status: {get_status_badge(appt[5])}""", unsafe_allow_html=True)
+        history_page_controls("lab_appointments", next_cursor)
     else:
         st.info("No lab appointments")
 
@@ -620,7 +716,8 @@ def display_pharmacy():
 
     # Order history
     st.markdown("### 📋 Order History")
-    orders = db.get_user_pharmacy_orders(st.session_state.user[0])
+    filters = history_filters("pharmacy_orders", ["ordered", "ready", "picked_up", "delivered"])
+    orders, next_cursor = fetch_history_page("pharmacy_orders", db.get_user_pharmacy_orders_page, filters)
 
     if orders:
         for order in orders:
@@ -630,21 +727,21 @@ def display_pharmacy():
                 **Total:** ${order[5]:.2f}
                 **Option:** {order[7].title()}
                 **Status:** {get_status_badge(order[4])}""", unsafe_allow_html=True)
+        history_page_controls("pharmacy_orders", next_cursor)
     else:
         st.info("No pharmacy orders yet")
 
 def display_diagnostics():
     st.markdown("### 🔬 Diagnostic Services")
 
-    diagnostic_services = db.get_diagnostic_services()
+    diagnostic_services = db.get_catalog().diagnostic_services
 
     col1, col2 = st.columns([2, 1])
 
     with col1:
-        selected_service = st.selectbox("Select Diagnostic Service",
-                                      [service[1] for service in diagnostic_services])
+        selected_service = st.selectbox("Select Diagnostic Service", diagnostic_services.names())
 
-        service_details = next((s for s in diagnostic_services if s[1] == selected_service), None)
+        service_details = diagnostic_services.by_name.get(selected_service)
 
         if service_details:
             st.markdown(f"**Category:** {service_details[2].title()}")
@@ -814,22 +911,8 @@ def display_chatbot():
 def get_patient_data_for_context(user_id):
     """Get comprehensive patient data for enhanced chatbot context"""
     try:
-        # Use the database functions to get relevant patient data
-        appointments = db.get_user_appointments(user_id)
-        lab_appointments = db.get_user_lab_appointments(user_id)
-        pharmacy_orders = db.get_user_pharmacy_orders(user_id)
-
-        # Get user info
-        user = db.get_user_by_email(None)  # Need to modify to get by user_id
-        # Note: This might need adjustment based on available db methods
-
-        return {
-            'appointments': appointments,
-            'lab_appointments': lab_appointments,
-            'pharmacy_orders': pharmacy_orders,
-            'user_id': user_id,
-            # Add more data as needed
-        }
+        # Cached per patient and rebuilt only after one of their records changes
+        return {**db.get_patient_context(user_id), 'catalog': db.get_catalog()}
     except Exception as e:
         st.error(f"Error retrieving patient data: {e}")
         return {}
@@ -837,10 +920,10 @@ def get_patient_data_for_context(user_id):
 def generate_chatbot_response(user_query, patient_data):
     """Generate AI chatbot response with enhanced logic and risk-appropriate guidance"""
     user_query = user_query.lower().strip()
+    intent = route_intent(user_query)
 
     # Phase 1: Basic Services (Office hours, symptom navigation, medication info, prep instructions)
-    office_keywords = ['office', 'hours', 'open', 'when', 'time', 'schedule', 'operating', 'clinic']
-    if any(keyword in user_query for keyword in office_keywords):
+    if intent == "office_hours":
         return """🏥 **Hospital Operating Hours:**
 
 **Monday - Friday:** 8:00 AM - 8:00 PM
@@ -852,8 +935,7 @@ def generate_chatbot_response(user_query, patient_data):
 **Note:** Appointments are available during regular business hours. Walk-in patients are seen based on urgency."""
 
     # Symptom navigation
-    symptom_keywords = ['symptom', 'pain', 'headache', 'fever', 'cough', 'stomach', 'nausea', 'feeling sick']
-    if any(keyword in user_query for keyword in symptom_keywords):
+    if intent == "symptoms":
         return """🤒 **Symptom Navigation Guide:**
 
 Based on your description, here's how to proceed:
@@ -876,8 +958,7 @@ Based on your description, here's how to proceed:
 Would you like me to help you book an appointment?"""
 
     # Medication information
-    med_keywords = ['medication', 'medicine', 'drug', 'pill', 'prescription', 'taking', 'dosage']
-    if any(keyword in user_query for keyword in med_keywords):
+    if intent == "medications":
         pharmacy_orders = patient_data.get('pharmacy_orders', [])
         if pharmacy_orders:
             response = "💊 **Your Current Medications:**\n\n"
@@ -893,8 +974,7 @@ Would you like me to help you book an appointment?"""
             return "💊 **Medication Information:**\n\nYou don't have any recent pharmacy orders. If you're taking medications, please inform your healthcare provider.\n\n**General Medication Guidelines:**\n• Always follow prescription instructions\n• Take with food if stomach upset occurs\n• Use pill organizers for multiple medications"
 
     # Preparation instructions
-    prep_keywords = ['prepare', 'preparation', 'before', 'appointment', 'test', 'exam', 'procedure', 'instructions']
-    if any(keyword in user_query for keyword in prep_keywords):
+    if intent == "preparation":
         return """📋 **Appointment & Test Preparation Guidelines:**
 
 **🩺 Doctor Appointments:**
@@ -925,8 +1005,7 @@ Would you like me to help you book an appointment?"""
 Would you like information about a specific appointment or test?"""
 
     # Appointment queries
-    appt_keywords = ['appointment', 'booking', 'schedule', 'doctor', 'visit', 'next', 'upcoming']
-    if any(keyword in user_query for keyword in appt_keywords):
+    if intent == "appointments":
         appointments = patient_data.get('appointments', [])
         upcoming = [a for a in appointments if a[6] == 'scheduled']
 
@@ -940,8 +1019,7 @@ Would you like information about a specific appointment or test?"""
             return "📅 **No scheduled appointments found.**\n\nWould you like to book a new appointment?\n\n**How I can help:**\n• Book appointments with specialists\n• Reschedule existing appointments\n• Cancel if needed\n• Prepare you for your visit"
 
     # Lab results
-    lab_keywords = ['lab', 'test', 'result', 'blood', 'urine', 'analysis', 'cbc', 'thyroid']
-    if any(keyword in user_query for keyword in lab_keywords):
+    if intent == "lab_results":
         lab_appointments = patient_data.get('lab_appointments', [])
         if lab_appointments:
             response = "🧪 **Your Recent Lab Tests:**\n\n"
@@ -951,11 +1029,12 @@ Would you like information about a specific appointment or test?"""
             response += "\n**Doctor will review results and contact you if needed.**\n"
             return response
         else:
-            return "🧪 **Lab Services Available:**\n\nWe offer comprehensive laboratory testing including:\n• Complete Blood Count (CBC)\n• Lipid Profile & Cholesterol\n• Thyroid Function Tests\n• Diabetes Screening\n• Liver & Kidney Function\n\nWould you like to schedule a lab test?"
+            catalog = patient_data.get('catalog') or db.get_catalog()
+            services = "\n".join(f"• {name}" for name in catalog.lab_services.names())
+            return f"🧪 **Lab Services Available:**\n\nWe offer comprehensive laboratory testing including:\n{services}\n\nWould you like to schedule a lab test?"
 
     # Medical reports
-    report_keywords = ['report', 'medical', 'history', 'diagnosis', 'treatment', 'record', 'chart']
-    if any(keyword in user_query for keyword in report_keywords):
+    if intent == "medical_records":
         return """📋 **Medical Records Access:**
 
 Your medical reports include:
@@ -975,8 +1054,7 @@ Your medical reports include:
 Would you like help accessing specific reports?"""
 
     # Billing and payments
-    billing_keywords = ['bill', 'billing', 'payment', 'cost', 'insurance', 'fee', 'charge', 'money']
-    if any(keyword in user_query for keyword in billing_keywords):
+    if intent == "billing":
         return """💰 **Billing & Insurance Information:**
 
 **Payment Methods Accepted:**
@@ -998,8 +1076,7 @@ Would you like help accessing specific reports?"""
 For detailed billing inquiries, please contact our billing department directly."""
 
     # General hospital information
-    hospital_keywords = ['hospital', 'location', 'address', 'directions', 'parking', 'entrance', 'where']
-    if any(keyword in user_query for keyword in hospital_keywords):
+    if intent == "hospital_info":
         return """🏥 **EasyHealth Hospital Information:**
 
 **Address:** 123 Medical Center Drive, Healthcare City, HC 12345
@@ -1107,3 +1184,4 @@ def display_medication_reminders():
                     st.warning("Reminder stopped")
 
 if __name__ == "__main__":
+    main()
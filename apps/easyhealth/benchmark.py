@@ -0,0 +1,214 @@
+"""
+Database benchmark for the EasyHealth portal.
+
+Times every Database method and the data path of every display_* page against a
+(usually generated) database, reports p50/p99 per target, and appends the run to
+benchmark_history.jsonl so results can be tracked across commits.
+
+    python generate_data.py --db bench.db --patients 100000
+    python benchmark.py --db bench.db                  # run and compare with the previous run
+    python benchmark.py --db bench.db --only dashboard # targets whose name contains "dashboard"
+
+Writes run inside a transaction that is rolled back, so the database is left unchanged.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import subprocess
+import numpy as np
+from vitals import add_bmi, health_scores, trend_slopes
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(APP_DIR, "benchmark_history.jsonl")
+
+
+def _read_targets(db):
+    """Database reads, each called with one sampled patient."""
+    return {
+        "get_user_by_email": lambda user: db.get_user_by_email(user["email"]),
+        "get_patient_context": lambda user: db.get_patient_context(user["id"]),
+        "get_catalog": lambda user: db.get_catalog(),
+        "get_available_doctors": lambda user: db.get_available_doctors(),
+        "get_available_slots": lambda user: db.get_available_slots(user["id"] % 5 + 1, 8),
+        "get_user_appointments": lambda user: db.get_user_appointments(user["id"]),
+        "get_dashboard_summary": lambda user: db.get_dashboard_summary(user["id"]),
+        "get_lab_services": lambda user: db.get_lab_services(),
+        "get_user_lab_appointments": lambda user: db.get_user_lab_appointments(user["id"]),
+        "get_diagnostic_services": lambda user: db.get_diagnostic_services(),
+        "get_user_pharmacy_orders": lambda user: db.get_user_pharmacy_orders(user["id"]),
+        "get_user_appointments_page": lambda user: db.get_user_appointments_page(user["id"]),
+        "get_user_lab_appointments_page": lambda user: db.get_user_lab_appointments_page(user["id"]),
+        "get_user_pharmacy_orders_page": lambda user: db.get_user_pharmacy_orders_page(user["id"]),
+        "get_health_series": lambda user: db.get_health_series(user["id"]),
+    }
+
+
+def _write_targets(db):
+    """Database writes; timed inside a transaction that is rolled back afterwards."""
+    today = datetime.date.today().isoformat()
+    return {
+        "create_user": lambda user: db.create_user(f"bench-{time.perf_counter_ns()}@example.com", "x", "Bench User"),
+        "create_appointment": lambda user: db.create_appointment(user["id"], 1, "Consultation",
+                                                                 *db.get_available_slots(1, 1)[0]),
+        "create_lab_appointment": lambda user: db.create_lab_appointment(user["id"], 1, today, "10:00"),
+        "create_diagnostic_appointment": lambda user: db.create_diagnostic_appointment(user["id"], 1, today, "10:00"),
+        "create_pharmacy_order": lambda user: db.create_pharmacy_order(user["id"], '["Aspirin 100mg"]', 15.99),
+        "create_health_reading": lambda user: db.create_health_reading(user["id"], today, weight_kg=72.5, heart_rate=68),
+    }
+
+
+def health_page_data(db, user_id):
+    """What health_monitoring computes before plotting, for the default range."""
+    _, frame = db.get_health_series(user_id, 30)
+    if not frame.empty:
+        frame = add_bmi(frame)
+        health_scores(frame.ffill().iloc[[-1]])
+        trend_slopes(frame, ["weight_kg", "blood_pressure_systolic", "heart_rate"])
+    return frame
+
+
+def _page_targets(db):
+    """The Database calls each display_* page makes on one render."""
+    return {
+        "page:display_dashboard": lambda user: db.get_dashboard_summary(user["id"]),
+        "page:display_book_appointment": lambda user: (db.get_catalog(), db.get_available_slots(1, 8)),
+        "page:display_my_appointments": lambda user: db.get_user_appointments_page(user["id"]),
+        "page:display_lab_services": lambda user: (db.get_catalog(), db.get_user_lab_appointments_page(user["id"])),
+        "page:display_pharmacy": lambda user: db.get_user_pharmacy_orders_page(user["id"]),
+        "page:display_diagnostics": lambda user: db.get_catalog(),
+        "page:display_chatbot": lambda user: (db.get_patient_context(user["id"]), db.get_catalog()),
+        "page:health_monitoring": lambda user: health_page_data(db, user["id"]),
+    }
+
+
+def sample_patients(db, count, seed):
+    """Pick patients uniformly by id, so heavy-history patients show up in proportion."""
+    with db.get_connection() as conn:
+        low, high = conn.execute("SELECT MIN(id), MAX(id) FROM users").fetchone()
+        if low is None:
+            raise SystemExit("The database has no patients; fill it with generate_data.py first")
+        ids = np.random.default_rng(seed).integers(low, high + 1, count * 2).tolist()
+        placeholders = ",".join("?" * len(ids))
+        rows = conn.execute(f"SELECT id, email FROM users WHERE id IN ({placeholders})", ids).fetchall()
+    by_id = {row[0]: {"id": row[0], "email": row[1]} for row in rows}
+    return [by_id[i] for i in ids if i in by_id][:count]
+
+
+def time_target(db, call, patients, write=False):
+    """Time one call per sampled patient; returns latencies in milliseconds."""
+    latencies = []
+    for user in patients:
+        if write:
+            with db.get_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    start = time.perf_counter()
+                    call(user)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                finally:
+                    conn.rollback()
+        else:
+            start = time.perf_counter()
+            call(user)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(latencies):
+    values = np.asarray(latencies)
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3),
+        "calls": int(values.size),
+    }
+
+
+def run(db, iterations, seed=7, only=None, warmup=20):
+    """Benchmark every target and return {target: summary}."""
+    patients = sample_patients(db, iterations + warmup, seed)
+    targets = [(name, call, False) for name, call in {**_read_targets(db), **_page_targets(db)}.items()]
+    targets += [(name, call, True) for name, call in _write_targets(db).items()]
+    results = {}
+    for name, call, write in targets:
+        if only and only not in name:
+            continue
+        time_target(db, call, patients[:warmup], write)
+        results[name] = summarize(time_target(db, call, patients[warmup:], write))
+    return results
+
+
+def table_sizes(db):
+    with db.get_connection() as conn:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_run(db_path):
+    """Most recent history entry for the same database file, if any."""
+    if not os.path.exists(HISTORY_FILE):
+        return None
+    last = None
+    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry.get("db") == os.path.basename(db_path):
+                last = entry
+    return last
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time EasyHealth Database methods and page data paths")
+    parser.add_argument("--db", default=os.environ.get("EASYHEALTH_DB", "hospital_portal.db"),
+                        help="database to benchmark (see generate_data.py)")
+    parser.add_argument("--iterations", type=int, default=200, help="timed calls per target")
+    parser.add_argument("--seed", type=int, default=7, help="seed for sampling patients")
+    parser.add_argument("--only", help="only run targets whose name contains this text")
+    parser.add_argument("--no-history", action="store_true", help="don't append this run to the history file")
+    args = parser.parse_args()
+
+    # Importing database opens its module-level Database; point it at the benchmarked file
+    os.environ["EASYHEALTH_DB"] = args.db
+    from database import db
+
+    sizes = table_sizes(db)
+    print(f"{args.db}: {sizes.get('users', 0):,} patients, {sizes.get('appointments', 0):,} appointments")
+    results = run(db, args.iterations, args.seed, args.only)
+    previous = previous_run(args.db)
+    previous_results = previous["results"] if previous else {}
+
+    print(f"\n{'target':36} {'p50 ms':>9} {'p99 ms':>9}   vs previous p50")
+    for name, summary in results.items():
+        before = previous_results.get(name)
+        change = ""
+        if before and before["p50_ms"]:
+            change = f"{(summary['p50_ms'] - before['p50_ms']) / before['p50_ms']:+.0%}"
+        print(f"{name:36} {summary['p50_ms']:9.3f} {summary['p99_ms']:9.3f}   {change}")
+
+    if not args.no_history:
+        with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                "revision": git_revision(),
+                "db": os.path.basename(args.db),
+                "tables": sizes,
+                "iterations": args.iterations,
+                "results": results,
+            }) + "\n")
+    db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
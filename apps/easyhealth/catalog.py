@@ -0,0 +1,77 @@
+"""
+Process-wide cache of the reference tables (doctors, lab and diagnostic services).
+
+The catalog changes rarely but is read on nearly every page, so it is loaded once
+and shared by every session. Triggers bump catalog_version on any change to the
+catalog tables; readers compare that single value and reload only when it moved.
+"""
+
+# Catalog tables and the column position of each one's display name
+CATALOG_TABLES = {
+    "doctors": 1,
+    "lab_services": 1,
+    "diagnostic_services": 1,
+}
+
+
+def version_triggers():
+    """DDL for the catalog_version counter and the triggers that bump it."""
+    statements = [
+        '''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+        ''',
+        "INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1)",
+    ]
+    for table in CATALOG_TABLES:
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            statements.append(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_catalog_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+    return statements
+
+
+class CatalogTable:
+    """Rows of one reference table in table order, indexed by id and by display name."""
+
+    def __init__(self, rows, name_column):
+        self.rows = rows
+        self.by_id = {row[0]: row for row in rows}
+        self.by_name = {row[name_column]: row for row in rows}
+
+    def names(self):
+        return list(self.by_name)
+
+
+class Catalog:
+    """A consistent snapshot of every catalog table, tagged with the version it was read at."""
+
+    def __init__(self, version, tables):
+        self.version = version
+        self.doctors = tables["doctors"]
+        self.lab_services = tables["lab_services"]
+        self.diagnostic_services = tables["diagnostic_services"]
+
+    @classmethod
+    def load(cls, conn):
+        # Read inside one transaction so the version and the rows come from the same snapshot
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN")
+        try:
+            version = read_version(conn)
+            tables = {table: CatalogTable(conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall(), name_column)
+                      for table, name_column in CATALOG_TABLES.items()}
+        finally:
+            if own_transaction:
+                conn.rollback()
+        return cls(version, tables)
+
+
+def read_version(conn):
+    return conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()[0]
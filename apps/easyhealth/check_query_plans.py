@@ -0,0 +1,115 @@
+"""
+Query-plan regression check for the easyhealth schema.
+
+Builds a fresh database through the migrations, captures the SQL each per-patient
+Database read issues, and fails if EXPLAIN QUERY PLAN shows a table scan, a
+temp B-tree sort, or a plan that no longer uses the expected index.
+
+    python check_query_plans.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+# Point the module-level Database at a scratch file before it is imported
+_scratch = tempfile.mkdtemp(prefix="easyhealth_plans_")
+os.environ["EASYHEALTH_DB"] = os.path.join(_scratch, "plans.db")
+
+from database import db  # noqa: E402
+
+# Database method -> (arguments, indexes its plan must use)
+EXPECTED_PLANS = {
+    "get_user_appointments": ((1,), ["idx_appointments_user_date"]),
+    "get_user_lab_appointments": ((1,), ["idx_lab_appointments_user_date"]),
+    "get_user_pharmacy_orders": ((1,), ["idx_pharmacy_orders_user_created"]),
+    "get_dashboard_summary": ((1,), ["idx_appointments_user_date", "idx_pharmacy_orders_user_created"]),
+    # Keyset pages, checked past the first page and with every filter applied
+    "get_user_appointments_page": ((1, ("2024-06-01", "10:00", 500), 10, "completed", "2023-01-01", "2024-12-31"),
+                                   ["idx_appointments_user_date"]),
+    "get_user_lab_appointments_page": ((1, ("2024-06-01", "10:00", 500), 10, "completed", "2023-01-01", "2024-12-31"),
+                                       ["idx_lab_appointments_user_date"]),
+    "get_user_pharmacy_orders_page": ((1, ("2024-06-01 10:00:00", 500), 10, "delivered", "2023-01-01", "2024-12-31"),
+                                      ["idx_pharmacy_orders_user_created"]),
+    "get_booking_index": ((1, "2024-06-01", "2024-07-31"), ["idx_appointments_doctor_slot"]),
+    # Rollups are WITHOUT ROWID tables keyed on (user_id, period), so there is no named index to expect
+    "get_health_series": ((1, 365), []),
+}
+
+# Per-patient lookups that have no Database reader yet, so their indexes stay covered
+EXPECTED_QUERIES = {
+    "diagnostic history": (
+        "SELECT * FROM diagnostic_appointments WHERE user_id = 1 ORDER BY appointment_date DESC, appointment_time DESC",
+        ["idx_diagnostic_appointments_user_date"]),
+    "physiotherapy history": (
+        "SELECT * FROM physiotherapy_sessions WHERE user_id = 1 ORDER BY session_date DESC, session_time DESC",
+        ["idx_physiotherapy_sessions_user_date"]),
+    "health readings": (
+        "SELECT * FROM health_monitoring WHERE user_id = 1 AND date_recorded >= '2024-01-01' ORDER BY date_recorded",
+        ["idx_health_monitoring_user_date"]),
+    "active reminders": (
+        "SELECT * FROM medication_reminders WHERE user_id = 1 AND active = 1",
+        ["idx_medication_reminders_user_active"]),
+}
+
+
+def capture_sql(method, *args):
+    """Call a Database method and return the SQL statements it ran."""
+    statements = []
+    with db.get_connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            getattr(db, method)(*args)
+        finally:
+            conn.set_trace_callback(None)
+    return statements
+
+
+def query_plan(sql):
+    with db.get_connection() as conn:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+def plan_problems(plan, indexes):
+    """Return what is wrong with a plan, or an empty list."""
+    problems = [f"uses {step}" for step in plan if step.startswith("SCAN") or "TEMP B-TREE" in step]
+    problems += [f"does not use {index}" for index in indexes
+                 if not any(f"INDEX {index} " in step + " " for step in plan)]
+    return problems
+
+
+def check_plans():
+    """Return {check name: (plan, problems)} for every expected plan."""
+    results = {}
+    for method, (args, indexes) in EXPECTED_PLANS.items():
+        statements = [s for s in capture_sql(method, *args) if s.lstrip().upper().startswith("SELECT")]
+        plan = [step for sql in statements for step in query_plan(sql)]
+        problems = plan_problems(plan, indexes) if statements else ["issued no SELECT"]
+        results[method] = (plan, problems)
+    for name, (sql, indexes) in EXPECTED_QUERIES.items():
+        plan = query_plan(sql)
+        results[name] = (plan, plan_problems(plan, indexes))
+    return results
+
+
+def main():
+    failures = 0
+    for name, (plan, problems) in check_plans().items():
+        status = "FAIL" if problems else "ok"
+        print(f"{status:4} {name}")
+        for step in plan:
+            print(f"       {step}")
+        for problem in problems:
+            print(f"     ! {problem}")
+        failures += bool(problems)
+    print(f"\n{len(EXPECTED_PLANS) + len(EXPECTED_QUERIES) - failures} passed, {failures} failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    try:
+        exit_code = main()
+    finally:
+        db.close()
+        shutil.rmtree(_scratch, ignore_errors=True)
+    sys.exit(exit_code)
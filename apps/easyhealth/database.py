@@ -1,381 +1,786 @@
+import os
 import sqlite3
+import queue
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
 import pandas as pd
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import streamlit as st
+from migrations import migrate, MigrationError
+from catalog import Catalog, read_version, version_triggers
+from scheduling import (ACTIVE_CONDITION, BOOKING_HORIZON_DAYS, BookingIndex, SlotUnavailable,
+                        available_slots, check_slot, date_text, parse_schedule, time_text)
+from vitals import MAX_PERIODS, VITALS, choose_grain, rollup_frame, rollup_query, rollup_statements
+
+# One pool serves every Streamlit session in the process. Connections are only held
+# for the duration of a query, so a small pool covers many concurrent sessions.
+POOL_SIZE = 16
+POOL_TIMEOUT = 30  # seconds to wait for a free connection
+
+# Applied to every pooled connection. WAL lets readers run alongside a writer, and
+# synchronous=NORMAL is durable under WAL except for the last commits on power loss.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-16000",  # 16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",  # 256 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Patients whose chatbot context is kept in memory, least recently used dropped first
+CONTEXT_CACHE_SIZE = 1024
+
+# Stamped into the database header so another app's schema is never migrated ("EHLP")
+APPLICATION_ID = 0x45484C50
+
+def create_tables(cursor):
+    """Migration 1: the base schema. Existing tables from earlier releases are kept as they are."""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(users)")}
+    if columns and "full_name" not in columns:
+        raise MigrationError("This database file holds the simple_app.py schema; "
+                             "point Database at another file")
+
+    # Users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            full_name TEXT NOT NULL,
+            phone TEXT,
+            date_of_birth DATE,
+            medical_history TEXT,
+            allergies TEXT,
+            blood_type TEXT,
+            emergency_contact TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Doctors table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS doctors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            specialization TEXT NOT NULL,
+            phone TEXT,
+            email TEXT,
+            availability_schedule TEXT,
+            rating REAL DEFAULT 5.0,
+            experience_years INTEGER DEFAULT 0
+        )
+    ''')
+
+    # Appointments table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            doctor_id INTEGER,
+            appointment_type TEXT NOT NULL,
+            appointment_date DATE NOT NULL,
+            appointment_time TIME NOT NULL,
+            status TEXT DEFAULT 'scheduled', -- scheduled, confirmed, completed, cancelled
+            symptoms TEXT,
+            notes TEXT,
+            patient_type TEXT DEFAULT 'regular', -- regular, walkin, emergency
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (doctor_id) REFERENCES doctors (id)
+        )
+    ''')
+
+    # Lab services table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lab_services (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            service_name TEXT NOT NULL,
+            description TEXT,
+            price DECIMAL(10,2),
+            estimated_duration INTEGER, -- in minutes
+            preparation_instructions TEXT
+        )
+    ''')
+
+    # Lab appointments table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lab_appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            service_id INTEGER,
+            appointment_date DATE NOT NULL,
+            appointment_time TIME NOT NULL,
+            status TEXT DEFAULT 'scheduled',
+            results TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (service_id) REFERENCES lab_services (id)
+        )
+    ''')
+
+    # Pharmacy orders table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pharmacy_orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            prescription_id TEXT,
+            medications TEXT NOT NULL, -- JSON string of medications
+            status TEXT DEFAULT 'ordered', -- ordered, ready, picked_up, delivered
+            total_amount DECIMAL(10,2),
+            payment_status TEXT DEFAULT 'pending',
+            delivery_option TEXT DEFAULT 'pickup', -- pickup, delivery
+            delivery_address TEXT,
+            delivery_time DATETIME,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Diagnostic services table (X-ray, CT, etc.)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS diagnostic_services (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            service_name TEXT NOT NULL,
+            category TEXT NOT NULL, -- xray, ct, mri, ultrasound, etc.
+            description TEXT,
+            price DECIMAL(10,2),
+            estimated_duration INTEGER
+        )
+    ''')
+
+    # Diagnostic appointments table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS diagnostic_appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            service_id INTEGER,
+            appointment_date DATE NOT NULL,
+            appointment_time TIME NOT NULL,
+            status TEXT DEFAULT 'scheduled',
+            results TEXT,
+            urgency TEXT DEFAULT 'routine', -- routine, urgent, emergency
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (service_id) REFERENCES diagnostic_services (id)
+        )
+    ''')
+
+    # Physiotherapy sessions table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS physiotherapy_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            therapist_id INTEGER,
+            session_date DATE NOT NULL,
+            session_time TIME NOT NULL,
+            duration INTEGER DEFAULT 45, -- in minutes
+            session_type TEXT NOT NULL,
+            status TEXT DEFAULT 'scheduled',
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Health monitoring data table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS health_monitoring (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            date_recorded DATE NOT NULL,
+            weight_kg REAL,
+            height_cm REAL,
+            blood_pressure_systolic INTEGER,
+            blood_pressure_diastolic INTEGER,
+            heart_rate INTEGER,
+            temperature REAL,
+            blood_glucose REAL,
+            oxygen_saturation REAL,
+            notes TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Medication reminders table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS medication_reminders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            medication_name TEXT NOT NULL,
+            dosage TEXT NOT NULL,
+            frequency TEXT NOT NULL, -- e.g., "twice daily", "every 8 hours"
+            start_date DATE NOT NULL,
+            end_date DATE,
+            notes TEXT,
+            active BOOLEAN DEFAULT 1,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+def _is_empty(cursor, table):
+    return cursor.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None
+
+def seed_catalog(cursor):
+    """Migration 2: sample doctors and services, only into tables that are still empty."""
+    # Sample doctors
+    doctors_data = [
+        ("Dr. Sarah Johnson", "Cardiology", "+1-555-0101", "sarah.johnson@hospital.com", "Mon-Fri 9AM-5PM", 4.8, 12),
+        ("Dr. Michael Chen", "Neurology", "+1-555-0102", "michael.chen@hospital.com", "Tue-Sat 8AM-4PM", 4.9, 15),
+        ("Dr. Emily Rodriguez", "Dermatology", "+1-555-0103", "emily.rodriguez@hospital.com", "Mon-Thu 10AM-6PM", 4.7, 8),
+        ("Dr. James Wilson", "Orthopedics", "+1-555-0104", "james.wilson@hospital.com", "Wed-Sun 9AM-5PM", 4.6, 20),
+        ("Dr. Lisa Park", "Pediatrics", "+1-555-0105", "lisa.park@hospital.com", "Mon-Fri 8AM-4PM", 4.9, 10),
+    ]
+
+    if _is_empty(cursor, "doctors"):
+        cursor.executemany('''
+            INSERT INTO doctors (name, specialization, phone, email, availability_schedule, rating, experience_years)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', doctors_data)
 
-class Database:
-    def __init__(self, db_name="hospital_portal.db"):
-        self.db_name = db_name
-        self.init_db()
-
-    def get_connection(self):
-        return sqlite3.connect(self.db_name)
-
-    def init_db(self):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                full_name TEXT NOT NULL,
-                phone TEXT,
-                date_of_birth DATE,
-                medical_history TEXT,
-                allergies TEXT,
-                blood_type TEXT,
-                emergency_contact TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Doctors table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS doctors (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                specialization TEXT NOT NULL,
-                phone TEXT,
-                email TEXT,
-                availability_schedule TEXT,
-                rating REAL DEFAULT 5.0,
-                experience_years INTEGER DEFAULT 0
-            )
-        ''')
-
-        # Appointments table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS appointments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                doctor_id INTEGER,
-                appointment_type TEXT NOT NULL,
-                appointment_date DATE NOT NULL,
-                appointment_time TIME NOT NULL,
-                status TEXT DEFAULT 'scheduled', -- scheduled, confirmed, completed, cancelled
-                symptoms TEXT,
-                notes TEXT,
-                patient_type TEXT DEFAULT 'regular', -- regular, walkin, emergency
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (doctor_id) REFERENCES doctors (id)
-            )
-        ''')
-
-        # Lab services table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS lab_services (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                service_name TEXT NOT NULL,
-                description TEXT,
-                price DECIMAL(10,2),
-                estimated_duration INTEGER, -- in minutes
-                preparation_instructions TEXT
-            )
-        ''')
-
-        # Lab appointments table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS lab_appointments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                service_id INTEGER,
-                appointment_date DATE NOT NULL,
-                appointment_time TIME NOT NULL,
-                status TEXT DEFAULT 'scheduled',
-                results TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (service_id) REFERENCES lab_services (id)
-            )
-        ''')
+    # Sample lab services
+    lab_services_data = [
+        ("Complete Blood Count (CBC)", "Comprehensive blood analysis", 75.00, 30, "Fasting required, avoid alcohol 24hrs before"),
+        ("Lipid Profile", "Cholesterol and triglyceride analysis", 85.00, 20, "Fasting required for 12 hours"),
+        ("Thyroid Function Test", "TSH, T3, T4 levels", 95.00, 25, "No special preparation needed"),
+        ("Diabetes Screening", "Blood glucose and HbA1c", 65.00, 15, "Fasting preferred but not required"),
+        ("Liver Function Test", "Liver enzyme analysis", 90.00, 30, "Avoid alcohol 24hrs before"),
+    ]
 
-        # Pharmacy orders table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS pharmacy_orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                prescription_id TEXT,
-                medications TEXT NOT NULL, -- JSON string of medications
-                status TEXT DEFAULT 'ordered', -- ordered, ready, picked_up, delivered
-                total_amount DECIMAL(10,2),
-                payment_status TEXT DEFAULT 'pending',
-                delivery_option TEXT DEFAULT 'pickup', -- pickup, delivery
-                delivery_address TEXT,
-                delivery_time DATETIME,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
+    if _is_empty(cursor, "lab_services"):
+        cursor.executemany('''
+            INSERT INTO lab_services (service_name, description, price, estimated_duration, preparation_instructions)
+            VALUES (?, ?, ?, ?, ?)
+        ''', lab_services_data)
 
-        # Diagnostic services table (X-ray, CT, etc.)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS diagnostic_services (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                service_name TEXT NOT NULL,
-                category TEXT NOT NULL, -- xray, ct, mri, ultrasound, etc.
-                description TEXT,
-                price DECIMAL(10,2),
-                estimated_duration INTEGER
-            )
-        ''')
+    # Sample diagnostic services
+    diagnostic_data = [
+        ("Chest X-Ray", "xray", "Standard chest imaging", 120.00, 15),
+        ("CT Scan - Head", "ct", "Computed tomography of head", 450.00, 30),
+        ("MRI - Knee", "mri", "Magnetic resonance imaging of knee", 380.00, 45),
+        ("Ultrasound - Abdomen", "ultrasound", "Abdominal ultrasound", 150.00, 20),
+        ("DEXA Scan", "other", "Bone density measurement", 85.00, 25),
+    ]
 
-        # Diagnostic appointments table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS diagnostic_appointments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                service_id INTEGER,
-                appointment_date DATE NOT NULL,
-                appointment_time TIME NOT NULL,
-                status TEXT DEFAULT 'scheduled',
-                results TEXT,
-                urgency TEXT DEFAULT 'routine', -- routine, urgent, emergency
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (service_id) REFERENCES diagnostic_services (id)
-            )
-        ''')
+    if _is_empty(cursor, "diagnostic_services"):
+        cursor.executemany('''
+            INSERT INTO diagnostic_services (service_name, category, description, price, estimated_duration)
+            VALUES (?, ?, ?, ?, ?)
+        ''', diagnostic_data)
 
-        # Physiotherapy sessions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS physiotherapy_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                therapist_id INTEGER,
-                session_date DATE NOT NULL,
-                session_time TIME NOT NULL,
-                duration INTEGER DEFAULT 45, -- in minutes
-                session_type TEXT NOT NULL,
-                status TEXT DEFAULT 'scheduled',
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
+# Per-patient history indexes. Each matches its query's WHERE and ORDER BY so lookups
+# are an index range read with no sort step; check_query_plans.py keeps them honest.
+PATIENT_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_appointments_user_date ON appointments (user_id, appointment_date DESC, appointment_time DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_lab_appointments_user_date ON lab_appointments (user_id, appointment_date DESC, appointment_time DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_diagnostic_appointments_user_date ON diagnostic_appointments (user_id, appointment_date DESC, appointment_time DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_physiotherapy_sessions_user_date ON physiotherapy_sessions (user_id, session_date DESC, session_time DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_pharmacy_orders_user_created ON pharmacy_orders (user_id, created_at DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_health_monitoring_user_date ON health_monitoring (user_id, date_recorded)",
+    "CREATE INDEX IF NOT EXISTS idx_medication_reminders_user_active ON medication_reminders (user_id, active)",
+)
+
+# Tables whose per-patient row counts are kept in patient_stats (column name = table name)
+COUNTED_TABLES = ("appointments", "lab_appointments", "pharmacy_orders")
+
+def create_patient_stats(cursor):
+    """Migration 4: per-patient counters maintained by triggers, backfilled from existing rows."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS patient_stats (
+            user_id INTEGER PRIMARY KEY,
+            appointments INTEGER NOT NULL DEFAULT 0,
+            lab_appointments INTEGER NOT NULL DEFAULT 0,
+            pharmacy_orders INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    for table in COUNTED_TABLES:
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_stats_insert AFTER INSERT ON {table}
+            WHEN NEW.user_id IS NOT NULL
+            BEGIN
+                INSERT INTO patient_stats (user_id, {table}) VALUES (NEW.user_id, 1)
+                ON CONFLICT (user_id) DO UPDATE SET {table} = {table} + 1;
+            END
         ''')
-
-        # Health monitoring data table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS health_monitoring (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                date_recorded DATE NOT NULL,
-                weight_kg REAL,
-                height_cm REAL,
-                blood_pressure_systolic INTEGER,
-                blood_pressure_diastolic INTEGER,
-                heart_rate INTEGER,
-                temperature REAL,
-                blood_glucose REAL,
-                oxygen_saturation REAL,
-                notes TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_stats_delete AFTER DELETE ON {table}
+            WHEN OLD.user_id IS NOT NULL
+            BEGIN
+                UPDATE patient_stats SET {table} = {table} - 1 WHERE user_id = OLD.user_id;
+            END
         ''')
-
-        # Medication reminders table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS medication_reminders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                medication_name TEXT NOT NULL,
-                dosage TEXT NOT NULL,
-                frequency TEXT NOT NULL, -- e.g., "twice daily", "every 8 hours"
-                start_date DATE NOT NULL,
-                end_date DATE,
-                notes TEXT,
-                active BOOLEAN DEFAULT 1,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
+        # Re-assigning a row to another patient moves its count
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_stats_move AFTER UPDATE OF user_id ON {table}
+            WHEN OLD.user_id IS NOT NEW.user_id
+            BEGIN
+                UPDATE patient_stats SET {table} = {table} - 1 WHERE user_id = OLD.user_id;
+                INSERT INTO patient_stats (user_id, {table}) SELECT NEW.user_id, 1 WHERE NEW.user_id IS NOT NULL
+                ON CONFLICT (user_id) DO UPDATE SET {table} = {table} + 1;
+            END
         ''')
 
-        # Insert sample data
-        self.insert_sample_data(cursor)
+    counted = " UNION ALL ".join(f"SELECT user_id, '{table}' AS source FROM {table}" for table in COUNTED_TABLES)
+    sums = ", ".join(f"SUM(source = '{table}')" for table in COUNTED_TABLES)
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO patient_stats (user_id, {", ".join(COUNTED_TABLES)})
+        SELECT user_id, {sums} FROM ({counted})
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+    ''')
+
+# Ascending replacements for the history indexes. The rowid is the implicit last
+# column, so a reverse scan yields (date DESC, time DESC, id DESC) and keyset pages
+# with an id tiebreak need no sort step.
+KEYSET_INDEXES = tuple(
+    statement
+    for table, columns in (
+        ("appointments", "appointment_date, appointment_time"),
+        ("lab_appointments", "appointment_date, appointment_time"),
+        ("diagnostic_appointments", "appointment_date, appointment_time"),
+        ("physiotherapy_sessions", "session_date, session_time"),
+    )
+    for statement in (
+        f"DROP INDEX IF EXISTS idx_{table}_user_date",
+        f"CREATE INDEX idx_{table}_user_date ON {table} (user_id, {columns})",
+    )
+) + (
+    "DROP INDEX IF EXISTS idx_pharmacy_orders_user_created",
+    "CREATE INDEX idx_pharmacy_orders_user_created ON pharmacy_orders (user_id, created_at)",
+)
+
+# Earlier releases accepted any booking, so existing double bookings are resolved
+# (first booked keeps the slot) before the unique index can be built
+SLOT_UNIQUENESS = (
+    f'''
+    UPDATE appointments
+    SET status = 'cancelled', notes = TRIM(COALESCE(notes, '') || ' [Cancelled: slot was double-booked]')
+    WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY doctor_id, appointment_date, appointment_time ORDER BY id) AS booking
+            FROM appointments
+            WHERE {ACTIVE_CONDITION}
+        )
+        WHERE booking > 1
+    )
+    ''',
+    f'''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_appointments_doctor_slot
+    ON appointments (doctor_id, appointment_date, appointment_time)
+    WHERE {ACTIVE_CONDITION}
+    ''',
+)
+
+# Append-only: each entry's position is its schema version (see migrations.migrate)
+MIGRATIONS = [
+    ("create tables", create_tables),
+    ("seed catalog", seed_catalog),
+    ("patient history indexes", PATIENT_INDEXES),
+    ("patient stats counters", create_patient_stats),
+    ("catalog version counter", version_triggers()),
+    ("keyset history indexes", KEYSET_INDEXES),
+    ("one active booking per doctor slot", SLOT_UNIQUENESS),
+    ("health monitoring rollups", rollup_statements()),
+    ("patient data version", ("ALTER TABLE patient_stats ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0",)),
+]
+
+def _history_filters(date_column, status=None, date_from=None, date_to=None, status_column="status"):
+    """(condition, params) pairs for the optional status and inclusive date range filters."""
+    filters = []
+    if status:
+        filters.append((f"{status_column} = ?", [status]))
+    if date_from:
+        filters.append((f"{date_column} >= ?", [str(date_from)]))
+    if date_to:
+        # Dates and timestamps both sort below the next day's date
+        filters.append((f"{date_column} < date(?, '+1 day')", [str(date_to)]))
+    return filters
 
-        conn.commit()
-        conn.close()
+class Database:
+    def __init__(self, db_name="hospital_portal.db", pool_size=POOL_SIZE):
+        self.db_name = db_name
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue()
+        self._opened = 0
+        self._pool_lock = threading.Lock()
+        self._local = threading.local()
+        self._catalog = None
+        self._catalog_lock = threading.Lock()
+        self._contexts = OrderedDict()
+        self._contexts_lock = threading.Lock()
+        self.init_db()
 
-    def insert_sample_data(self, cursor):
-        # Sample doctors
-        doctors_data = [
-            ("Dr. Sarah Johnson", "Cardiology", "+1-555-0101", "sarah.johnson@hospital.com", "Mon-Fri 9AM-5PM", 4.8, 12),
-            ("Dr. Michael Chen", "Neurology", "+1-555-0102", "michael.chen@hospital.com", "Tue-Sat 8AM-4PM", 4.9, 15),
-            ("Dr. Emily Rodriguez", "Dermatology", "+1-555-0103", "emily.rodriguez@hospital.com", "Mon-Thu 10AM-6PM", 4.7, 8),
-            ("Dr. James Wilson", "Orthopedics", "+1-555-0104", "james.wilson@hospital.com", "Wed-Sun 9AM-5PM", 4.6, 20),
-            ("Dr. Lisa Park", "Pediatrics", "+1-555-0105", "lisa.park@hospital.com", "Mon-Fri 8AM-4PM", 4.9, 10),
-        ]
+    def _open_connection(self):
+        # Autocommit mode: reads never hold a snapshot open, writes go through transaction()
+        conn = sqlite3.connect(self.db_name, check_same_thread=False, isolation_level=None)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
 
-        cursor.executemany('''
-            INSERT OR IGNORE INTO doctors (name, specialization, phone, email, availability_schedule, rating, experience_years)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', doctors_data)
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if self._opened < self.pool_size:
+                self._opened += 1
+                try:
+                    return self._open_connection()
+                except Exception:
+                    self._opened -= 1
+                    raise
+        try:
+            return self._pool.get(timeout=POOL_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"No free database connection after {POOL_TIMEOUT}s")
 
-        # Sample lab services
-        lab_services_data = [
-            ("Complete Blood Count (CBC)", "Comprehensive blood analysis", 75.00, 30, "Fasting required, avoid alcohol 24hrs before"),
-            ("Lipid Profile", "Cholesterol and triglyceride analysis", 85.00, 20, "Fasting required for 12 hours"),
-            ("Thyroid Function Test", "TSH, T3, T4 levels", 95.00, 25, "No special preparation needed"),
-            ("Diabetes Screening", "Blood glucose and HbA1c", 65.00, 15, "Fasting preferred but not required"),
-            ("Liver Function Test", "Liver enzyme analysis", 90.00, 30, "Avoid alcohol 24hrs before"),
-        ]
+    @contextmanager
+    def get_connection(self):
+        """Borrow a pooled connection; nested calls on the same thread share it."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Run the block in one write transaction, committed on success and rolled back on error."""
+        with self.get_connection() as conn:
+            if conn.in_transaction:
+                # Already inside transaction() on this thread; join it
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
 
-        cursor.executemany('''
-            INSERT OR IGNORE INTO lab_services (service_name, description, price, estimated_duration, preparation_instructions)
-            VALUES (?, ?, ?, ?, ?)
-        ''', lab_services_data)
+    def close(self):
+        """Close every idle pooled connection."""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._pool_lock:
+                self._opened -= 1
 
-        # Sample diagnostic services
-        diagnostic_data = [
-            ("Chest X-Ray", "xray", "Standard chest imaging", 120.00, 15),
-            ("CT Scan - Head", "ct", "Computed tomography of head", 450.00, 30),
-            ("MRI - Knee", "mri", "Magnetic resonance imaging of knee", 380.00, 45),
-            ("Ultrasound - Abdomen", "ultrasound", "Abdominal ultrasound", 150.00, 20),
-            ("DEXA Scan", "other", "Bone density measurement", 85.00, 25),
-        ]
+    def init_db(self):
+        """Apply pending schema migrations; a no-op pragma read once the schema is current."""
+        with self.get_connection() as conn:
+            migrate(conn, MIGRATIONS, APPLICATION_ID)
+
+    def get_catalog(self):
+        """Doctors and services indexed by id and name, reloaded only after a catalog write."""
+        with self.get_connection() as conn:
+            version = read_version(conn)
+            catalog = self._catalog
+            if catalog is None or catalog.version != version:
+                with self._catalog_lock:
+                    catalog = self._catalog
+                    if catalog is None or catalog.version != version:
+                        catalog = self._catalog = Catalog.load(conn)
+        return catalog
+
+    def _bump_data_version(self, conn, user_id):
+        """Mark a patient's data as changed so cached views of it are rebuilt; call inside the write's transaction."""
+        conn.execute('''
+            INSERT INTO patient_stats (user_id, data_version) VALUES (?, 1)
+            ON CONFLICT (user_id) DO UPDATE SET data_version = data_version + 1
+        ''', (user_id,))
 
-        cursor.executemany('''
-            INSERT OR IGNORE INTO diagnostic_services (service_name, category, description, price, estimated_duration)
-            VALUES (?, ?, ?, ?, ?)
-        ''', diagnostic_data)
+    def get_data_version(self, user_id, conn=None):
+        if conn is None:
+            with self.get_connection() as conn:
+                return self.get_data_version(user_id, conn)
+        row = conn.execute("SELECT data_version FROM patient_stats WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def get_patient_context(self, user_id):
+        """
+        The patient's profile and full appointment, lab and pharmacy history, rebuilt only
+        when their data version has moved. The dict is shared between sessions; don't modify it.
+        """
+        version = self.get_data_version(user_id)
+        with self._contexts_lock:
+            cached = self._contexts.get(user_id)
+            if cached is not None and cached["version"] == version:
+                self._contexts.move_to_end(user_id)
+                return cached
+
+        with self.get_connection() as conn:
+            # One read transaction so the version matches the rows it is stored with
+            own_transaction = not conn.in_transaction
+            if own_transaction:
+                conn.execute("BEGIN")
+            try:
+                context = {
+                    "version": self.get_data_version(user_id, conn),
+                    "user_id": user_id,
+                    "user": self.get_user_by_id(user_id),
+                    "appointments": self.get_user_appointments(user_id),
+                    "lab_appointments": self.get_user_lab_appointments(user_id),
+                    "pharmacy_orders": self.get_user_pharmacy_orders(user_id),
+                }
+            finally:
+                if own_transaction:
+                    conn.rollback()
+
+        with self._contexts_lock:
+            cached = self._contexts.get(user_id)
+            # Another session may have stored a newer build meanwhile
+            if cached is None or cached["version"] <= context["version"]:
+                self._contexts[user_id] = context
+                self._contexts.move_to_end(user_id)
+                while len(self._contexts) > CONTEXT_CACHE_SIZE:
+                    self._contexts.popitem(last=False)
+        return context
+
+    def get_user_by_id(self, user_id):
+        with self.get_connection() as conn:
+            return conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
 
     def get_user_by_email(self, email):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-        user = cursor.fetchone()
-        conn.close()
-        return user
+        with self.get_connection() as conn:
+            return conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
 
     def create_user(self, email, password, full_name, phone=None, date_of_birth=None):
-        conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute('''
-                INSERT INTO users (email, password, full_name, phone, date_of_birth)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (email, password, full_name, phone, date_of_birth))
-            conn.commit()
-            user_id = cursor.lastrowid
-            conn.close()
-            return user_id
+            with self.transaction() as conn:
+                cursor = conn.execute('''
+                    INSERT INTO users (email, password, full_name, phone, date_of_birth)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (email, password, full_name, phone, date_of_birth))
+                return cursor.lastrowid
         except sqlite3.IntegrityError:
-            conn.close()
             return None
 
     def get_available_doctors(self):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM doctors")
-        doctors = cursor.fetchall()
-        conn.close()
-        return doctors
+        return list(self.get_catalog().doctors.rows)
+
+    def get_booking_index(self, doctor_id, date_from, date_to=None):
+        """A doctor's active bookings between two dates (inclusive) as a BookingIndex."""
+        with self.get_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT appointment_date, appointment_time FROM appointments
+                WHERE doctor_id = ? AND appointment_date BETWEEN ? AND ? AND {ACTIVE_CONDITION}
+                ORDER BY appointment_date, appointment_time
+            ''', (doctor_id, date_text(date_from), date_text(date_to or date_from))).fetchall()
+        return BookingIndex.from_sorted(rows)
+
+    def get_available_slots(self, doctor_id, count=5, after=None):
+        """The doctor's next `count` free (date, "HH:MM") slots, starting now or at `after`."""
+        doctor = self.get_catalog().doctors.by_id.get(doctor_id)
+        if doctor is None:
+            return []
+        start = max(after or datetime.now(), datetime.now())
+        index = self.get_booking_index(doctor_id, start.date(), start.date() + timedelta(days=BOOKING_HORIZON_DAYS))
+        return available_slots(parse_schedule(doctor[5]), index, count, start)
 
     def create_appointment(self, user_id, doctor_id, appointment_type, appointment_date, appointment_time, symptoms="", notes=""):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO appointments (user_id, doctor_id, appointment_type, appointment_date, appointment_time, symptoms, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, doctor_id, appointment_type, appointment_date, appointment_time, symptoms, notes))
-        appointment_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return appointment_id
+        """Book a slot; raises SlotUnavailable if it is outside the doctor's hours or already taken."""
+        appointment_date, appointment_time = date_text(appointment_date), time_text(appointment_time)
+        doctor = self.get_catalog().doctors.by_id.get(doctor_id)
+        if doctor is None:
+            raise SlotUnavailable("Unknown doctor")
+        try:
+            with self.transaction() as conn:
+                check_slot(parse_schedule(doctor[5]), self.get_booking_index(doctor_id, appointment_date),
+                           appointment_date, appointment_time)
+                cursor = conn.execute('''
+                    INSERT INTO appointments (user_id, doctor_id, appointment_type, appointment_date, appointment_time, symptoms, notes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (user_id, doctor_id, appointment_type, appointment_date, appointment_time, symptoms, notes))
+                self._bump_data_version(conn, user_id)
+                return cursor.lastrowid
+        except sqlite3.IntegrityError:
+            # The unique slot index caught a booking the check above didn't see
+            raise SlotUnavailable(f"{appointment_date} at {appointment_time} was just booked by someone else")
 
     def get_user_appointments(self, user_id):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT a.*, d.name as doctor_name, d.specialization
-            FROM appointments a
-            JOIN doctors d ON a.doctor_id = d.id
-            WHERE a.user_id = ?
-            ORDER BY a.appointment_date DESC, a.appointment_time DESC
-        ''', (user_id,))
-        appointments = cursor.fetchall()
-        conn.close()
-        return appointments
+        with self.get_connection() as conn:
+            return conn.execute('''
+                SELECT a.*, d.name as doctor_name, d.specialization
+                FROM appointments a
+                JOIN doctors d ON a.doctor_id = d.id
+                WHERE a.user_id = ?
+                ORDER BY a.appointment_date DESC, a.appointment_time DESC
+            ''', (user_id,)).fetchall()
+
+    def get_dashboard_summary(self, user_id, recent=5):
+        """Counts from patient_stats plus the latest few appointments and the latest pharmacy order."""
+        with self.get_connection() as conn:
+            counts = conn.execute(
+                f"SELECT {', '.join(COUNTED_TABLES)} FROM patient_stats WHERE user_id = ?", (user_id,)
+            ).fetchone() or (0,) * len(COUNTED_TABLES)
+            recent_appointments = conn.execute('''
+                SELECT a.*, d.name as doctor_name, d.specialization
+                FROM appointments a
+                JOIN doctors d ON a.doctor_id = d.id
+                WHERE a.user_id = ?
+                ORDER BY a.appointment_date DESC, a.appointment_time DESC
+                LIMIT ?
+            ''', (user_id, recent)).fetchall()
+            latest_order = conn.execute('''
+                SELECT * FROM pharmacy_orders
+                WHERE user_id = ?
+                ORDER BY created_at DESC
+                LIMIT 1
+            ''', (user_id,)).fetchone()
+        summary = dict(zip(COUNTED_TABLES, counts))
+        summary["recent_appointments"] = recent_appointments
+        summary["latest_pharmacy_order"] = latest_order
+        return summary
+
+    def _history_page(self, sql, params, key_columns, row_key, filters, cursor, page_size):
+        """
+        Fetch one page of a patient history, newest first, using keyset pagination.
+        `cursor` is the sort key of the last row of the previous page (None for the
+        first page); returns (rows, next_cursor) with next_cursor None on the last page.
+        """
+        conditions = [condition for condition, _ in filters]
+        params = list(params) + [value for _, values in filters for value in values]
+        if cursor is not None:
+            conditions.append(f"({', '.join(key_columns)}) < ({', '.join('?' * len(key_columns))})")
+            params.extend(cursor)
+        where = "".join(f" AND {condition}" for condition in conditions)
+        order = ", ".join(f"{column} DESC" for column in key_columns)
+        with self.get_connection() as conn:
+            rows = conn.execute(f"{sql}{where} ORDER BY {order} LIMIT ?", params + [page_size + 1]).fetchall()
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            return rows, row_key(rows[-1])
+        return rows, None
+
+    def get_user_appointments_page(self, user_id, cursor=None, page_size=10, status=None, date_from=None, date_to=None):
+        """One page of get_user_appointments, keyed on (date, time, id)."""
+        return self._history_page(
+            '''
+                SELECT a.*, d.name as doctor_name, d.specialization
+                FROM appointments a
+                JOIN doctors d ON a.doctor_id = d.id
+                WHERE a.user_id = ?''', [user_id],
+            ["a.appointment_date", "a.appointment_time", "a.id"], lambda row: (row[4], row[5], row[0]),
+            _history_filters("a.appointment_date", status, date_from, date_to, "a.status"), cursor, page_size)
 
     def get_lab_services(self):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM lab_services")
-        services = cursor.fetchall()
-        conn.close()
-        return services
+        return list(self.get_catalog().lab_services.rows)
 
     def create_lab_appointment(self, user_id, service_id, appointment_date, appointment_time):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO lab_appointments (user_id, service_id, appointment_date, appointment_time)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, service_id, appointment_date, appointment_time))
-        appointment_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return appointment_id
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO lab_appointments (user_id, service_id, appointment_date, appointment_time)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, service_id, date_text(appointment_date), time_text(appointment_time)))
+            self._bump_data_version(conn, user_id)
+            return cursor.lastrowid
 
     def get_user_lab_appointments(self, user_id):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT la.*, ls.service_name, ls.description, ls.price
-            FROM lab_appointments la
-            JOIN lab_services ls ON la.service_id = ls.id
-            WHERE la.user_id = ?
-            ORDER BY la.appointment_date DESC, la.appointment_time DESC
-        ''', (user_id,))
-        appointments = cursor.fetchall()
-        conn.close()
-        return appointments
+        with self.get_connection() as conn:
+            return conn.execute('''
+                SELECT la.*, ls.service_name, ls.description, ls.price
+                FROM lab_appointments la
+                JOIN lab_services ls ON la.service_id = ls.id
+                WHERE la.user_id = ?
+                ORDER BY la.appointment_date DESC, la.appointment_time DESC
+            ''', (user_id,)).fetchall()
+
+    def get_user_lab_appointments_page(self, user_id, cursor=None, page_size=10, status=None, date_from=None, date_to=None):
+        """One page of get_user_lab_appointments, keyed on (date, time, id)."""
+        return self._history_page(
+            '''
+                SELECT la.*, ls.service_name, ls.description, ls.price
+                FROM lab_appointments la
+                JOIN lab_services ls ON la.service_id = ls.id
+                WHERE la.user_id = ?''', [user_id],
+            ["la.appointment_date", "la.appointment_time", "la.id"], lambda row: (row[3], row[4], row[0]),
+            _history_filters("la.appointment_date", status, date_from, date_to, "la.status"), cursor, page_size)
 
     def get_diagnostic_services(self):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM diagnostic_services")
-        services = cursor.fetchall()
-        conn.close()
-        return services
+        return list(self.get_catalog().diagnostic_services.rows)
 
     def create_diagnostic_appointment(self, user_id, service_id, appointment_date, appointment_time, urgency="routine"):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO diagnostic_appointments (user_id, service_id, appointment_date, appointment_time, urgency)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (user_id, service_id, appointment_date, appointment_time, urgency))
-        appointment_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return appointment_id
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO diagnostic_appointments (user_id, service_id, appointment_date, appointment_time, urgency)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (user_id, service_id, date_text(appointment_date), time_text(appointment_time), urgency))
+            self._bump_data_version(conn, user_id)
+            return cursor.lastrowid
 
     def create_pharmacy_order(self, user_id, medications, total_amount, delivery_option="pickup", delivery_address=None):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO pharmacy_orders (user_id, medications, total_amount, delivery_option, delivery_address)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (user_id, medications, total_amount, delivery_option, delivery_address))
-        order_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return order_id
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO pharmacy_orders (user_id, medications, total_amount, delivery_option, delivery_address)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (user_id, medications, total_amount, delivery_option, delivery_address))
+            self._bump_data_version(conn, user_id)
+            return cursor.lastrowid
 
     def get_user_pharmacy_orders(self, user_id):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM pharmacy_orders
-            WHERE user_id = ?
-            ORDER BY created_at DESC
-        ''', (user_id,))
-        orders = cursor.fetchall()
-        conn.close()
-        return orders
+        with self.get_connection() as conn:
+            return conn.execute('''
+                SELECT * FROM pharmacy_orders
+                WHERE user_id = ?
+                ORDER BY created_at DESC
+            ''', (user_id,)).fetchall()
+
+    def get_user_pharmacy_orders_page(self, user_id, cursor=None, page_size=10, status=None, date_from=None, date_to=None):
+        """One page of get_user_pharmacy_orders, keyed on (created_at, id)."""
+        return self._history_page(
+            "SELECT * FROM pharmacy_orders WHERE user_id = ?", [user_id],
+            ["created_at", "id"], lambda row: (row[10], row[0]),
+            _history_filters("created_at", status, date_from, date_to), cursor, page_size)
+
+    def create_health_reading(self, user_id, date_recorded, notes=None, **readings):
+        """Store one set of vitals (keyword arguments named after VITALS); rollups follow by trigger."""
+        unknown = set(readings) - set(VITALS)
+        if unknown:
+            raise ValueError(f"Unknown vitals: {', '.join(sorted(unknown))}")
+        columns = list(readings)
+        with self.transaction() as conn:
+            cursor = conn.execute(f'''
+                INSERT INTO health_monitoring (user_id, date_recorded, {", ".join(columns + ["notes"])})
+                VALUES (?, ?, {", ".join("?" * (len(columns) + 1))})
+            ''', (user_id, date_text(date_recorded), *readings.values(), notes))
+            self._bump_data_version(conn, user_id)
+            return cursor.lastrowid
+
+    def get_health_series(self, user_id, days=None, max_periods=MAX_PERIODS):
+        """
+        Per-period vitals averages for the last `days` days (all history if None) as
+        (grain, DataFrame), read from the finest rollup that fits in `max_periods` rows.
+        """
+        with self.get_connection() as conn:
+            if days is None:
+                first = conn.execute("SELECT MIN(period) FROM health_rollup_monthly WHERE user_id = ?",
+                                     (user_id,)).fetchone()[0]
+                span = (date.today() - date.fromisoformat(first)).days if first else 0
+                grain, params = choose_grain(span, max_periods), (user_id,)
+            else:
+                grain = choose_grain(days, max_periods)
+                params = (user_id, (date.today() - timedelta(days=days)).isoformat())
+            rows = conn.execute(rollup_query(grain, len(params) > 1), params).fetchall()
+        return grain, rollup_frame(rows)
 
 # Initialize database
-db = Database()</content>
+db = Database(os.environ.get("EASYHEALTH_DB", "hospital_portal.db"))
@@ -0,0 +1,99 @@
+"""
+Server-side downsampling for time-series charts.
+
+A chart can't show more points than it has pixels, so each series is reduced to a
+point budget set by the chart's width before it is sent to the browser. Line
+charts use Largest-Triangle-Three-Buckets, which keeps the visual shape of the
+series; scatter charts keep each bucket's minimum and maximum so outliers survive.
+"""
+import numpy as np
+import pandas as pd
+
+# Width of a half-page chart column, and the horizontal pixels each point gets
+CHART_WIDTH_PX = 600
+PIXELS_PER_POINT = 2
+MIN_POINTS = 50
+
+# Periods fetched per point shown, so the downsampler has detail to choose from
+OVERSAMPLE = 3
+
+
+def point_budget(width_px=CHART_WIDTH_PX, visible_days=None, period_days=1):
+    """Points worth sending for a chart `width_px` wide showing `visible_days` of periods."""
+    budget = max(width_px // PIXELS_PER_POINT, MIN_POINTS)
+    if visible_days is not None:
+        # Zoomed in past the data's own resolution there is nothing to thin out
+        budget = min(budget, max(int(np.ceil(visible_days / period_days)), 1))
+    return budget
+
+
+def lttb(x, y, n_out):
+    """Indices of the `n_out` points Largest-Triangle-Three-Buckets keeps from (x, y)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    # The first and last points are always kept; the rest are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    sizes = np.diff(edges)
+    x_means = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / sizes
+    y_means = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes
+    # Each bucket is scored against the average of the bucket after it (the last point for the final bucket)
+    next_x, next_y = np.append(x_means[1:], x[-1]), np.append(y_means[1:], y[-1])
+
+    kept = np.empty(n_out, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        area = np.abs((x[previous] - next_x[bucket]) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y[bucket] - y[previous]))
+        previous = start + int(area.argmax())
+        kept[bucket + 1] = previous
+    return kept
+
+
+def minmax(y, n_out):
+    """Indices of each bucket's minimum and maximum (about `n_out` points, in order)."""
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    buckets = n_out // 2
+    edges = np.linspace(0, n, buckets + 1).astype(int)[:-1]
+    bucket_of = np.repeat(np.arange(buckets), np.diff(np.append(edges, n)))
+    lows, highs = np.minimum.reduceat(y, edges), np.maximum.reduceat(y, edges)
+    keep = [0, n - 1]
+    for extremes in (lows, highs):
+        # First position in each bucket holding its extreme value
+        at = np.flatnonzero(y == extremes[bucket_of])
+        _, first = np.unique(bucket_of[at], return_index=True)
+        keep.extend(at[first])
+    return np.unique(keep)
+
+
+def downsample(series, budget, method="lttb"):
+    """A datetime-indexed series, missing values dropped, reduced to about `budget` points."""
+    series = series.dropna()
+    if len(series) <= budget:
+        return series
+    if method == "minmax":
+        kept = minmax(series.to_numpy(), budget)
+    else:
+        days = (series.index - series.index[0]) / pd.Timedelta(days=1)
+        kept = lttb(np.asarray(days, dtype=float), series.to_numpy(), budget)
+    return series.iloc[kept]
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(1)
+    index = pd.date_range("2020-01-01", periods=200_000, freq="15min")
+    values = pd.Series(np.cumsum(rng.normal(0, 1, len(index))) + 70, index=index)
+    for method in ("lttb", "minmax"):
+        start = time.perf_counter()
+        reduced = downsample(values, point_budget(), method)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{method:7} {len(values):,} -> {len(reduced)} points in {elapsed:.1f} ms, "
+              f"range kept {reduced.min():.1f}..{reduced.max():.1f} of {values.min():.1f}..{values.max():.1f}")
@@ -0,0 +1,317 @@
+"""
+Synthetic data generator for the EasyHealth portal.
+
+Fills a database with patients and their history at a configurable scale, drawing
+per-patient volumes from heavy-tailed distributions so a few long-term patients
+have hundreds of visits while most have a handful. Rows are built with NumPy and
+written with executemany, one transaction per chunk of patients.
+
+    python generate_data.py --db bench.db --patients 10000
+    python generate_data.py --db bench.db --patients 1000000   # ~20M appointments
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import hashlib
+import sqlite3
+import numpy as np
+from scheduling import SLOT_MINUTES
+
+# Mean rows per patient for each table; counts are negative binomial around these
+DEFAULT_RATES = {
+    "appointments": 20,
+    "lab_appointments": 6,
+    "diagnostic_appointments": 2,
+    "pharmacy_orders": 8,
+    "physiotherapy_sessions": 1.5,
+    "health_monitoring": 12,
+    "medication_reminders": 2,
+}
+
+# Lower is heavier-tailed; 1.2 gives a long tail of frequent visitors
+DISPERSION = 1.2
+
+HISTORY_DAYS = 5 * 365
+FUTURE_DAYS = 60
+
+FIRST_NAMES = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+               "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Priya", "Wei",
+               "Carlos", "Fatima", "Hiroshi", "Aisha", "Olga", "Mateo", "Amara", "Noah", "Sofia", "Arjun"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+              "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Patel", "Nguyen",
+              "Kim", "Chen", "Singh", "Okafor", "Ivanova", "Tanaka", "Cohen", "Haddad", "Silva", "Kowalski"]
+BLOOD_TYPES = (["O+", "A+", "B+", "AB+", "O-", "A-", "B-", "AB-"],
+               [0.37, 0.36, 0.08, 0.03, 0.07, 0.06, 0.02, 0.01])
+SPECIALIZATIONS = ["Cardiology", "Neurology", "Dermatology", "Orthopedics", "Pediatrics", "General Medicine",
+                   "Endocrinology", "Gastroenterology", "Oncology", "Psychiatry", "Ophthalmology", "ENT"]
+SCHEDULES = ["Mon-Fri 9AM-5PM", "Tue-Sat 8AM-4PM", "Mon-Thu 10AM-6PM", "Wed-Sun 9AM-5PM", "Mon-Fri 8AM-4PM"]
+APPOINTMENT_TYPES = (["Regular Checkup", "Consultation", "Follow-up", "Emergency"], [0.40, 0.30, 0.25, 0.05])
+SYMPTOMS = ["", "", "", "Headache", "Chest pain", "Fatigue", "Back pain", "Fever and cough", "Skin rash",
+            "Shortness of breath", "Joint pain", "Dizziness"]
+MEDICATIONS = [("Aspirin 100mg", 15.99), ("Lisinopril 10mg", 12.50), ("Vitamin D3 1000IU", 8.99),
+               ("Metformin 500mg", 10.25), ("Atorvastatin 20mg", 18.40), ("Amoxicillin 500mg", 14.75),
+               ("Omeprazole 20mg", 11.30), ("Levothyroxine 50mcg", 9.80)]
+FREQUENCIES = ["once daily", "twice daily", "every 8 hours", "at bedtime", "weekly"]
+PHYSIO_TYPES = ["Initial Assessment", "Sports Rehabilitation", "Pain Management", "Post-Surgery Recovery"]
+
+# Clinic slots on the booking grid from 08:00 to the last slot before 18:00
+SLOT_TIMES = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(8 * 60, 18 * 60, SLOT_MINUTES)])
+
+
+def _counts(rng, rate, size):
+    """Heavy-tailed per-patient row counts with the given mean."""
+    if rate <= 0:
+        return np.zeros(size, dtype=np.int64)
+    return rng.negative_binomial(DISPERSION, DISPERSION / (DISPERSION + rate), size)
+
+
+def _dates(days):
+    return np.datetime_as_string(np.datetime64(datetime.date.today()) + days.astype("timedelta64[D]"), unit="D")
+
+
+def _timestamps(days, seconds):
+    moments = (np.datetime64(datetime.date.today(), "s") + days.astype("timedelta64[D]")
+               + seconds.astype("timedelta64[s]"))
+    return np.char.replace(np.datetime_as_string(moments, unit="s"), "T", " ")
+
+
+def _visit_status(rng, days, future_status=("scheduled", "confirmed"), past_status=("completed", "cancelled", "scheduled"),
+                  past_weights=(0.85, 0.12, 0.03)):
+    """Future visits are booked; past ones mostly completed, some cancelled or never closed out."""
+    future = rng.choice(future_status, size=len(days), p=[0.8, 0.2])
+    past = rng.choice(past_status, size=len(days), p=past_weights)
+    return np.where(days >= 0, future, past)
+
+
+def _visits(rng, owners):
+    """Dates (as day offsets from today), times and statuses for one visit per owner entry."""
+    days = rng.integers(-HISTORY_DAYS, FUTURE_DAYS, len(owners))
+    times = SLOT_TIMES[rng.integers(0, len(SLOT_TIMES), len(owners))]
+    return days, times, _visit_status(rng, days)
+
+
+def _created_before(rng, days):
+    """Booking timestamps between 1 and 30 days before each visit, never in the future."""
+    booked = np.minimum(days - rng.integers(1, 31, len(days)), -1)
+    return _timestamps(booked, rng.integers(7 * 3600, 22 * 3600, len(days)))
+
+
+def generate_doctors(conn, rng, count):
+    rows = []
+    for i in range(count):
+        name = f"Dr. {FIRST_NAMES[rng.integers(len(FIRST_NAMES))]} {LAST_NAMES[rng.integers(len(LAST_NAMES))]}"
+        rows.append((name, SPECIALIZATIONS[i % len(SPECIALIZATIONS)], f"+1-555-{1000 + i % 9000:04d}",
+                     f"doctor{i}@hospital.com", SCHEDULES[rng.integers(len(SCHEDULES))],
+                     round(min(5.0, float(rng.normal(4.6, 0.25))), 1), int(rng.integers(1, 35))))
+    conn.executemany('''
+        INSERT INTO doctors (name, specialization, phone, email, availability_schedule, rating, experience_years)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+
+def generate_chunk(conn, rng, first_id, size, rates, doctor_ids, doctor_weights, lab_ids, diagnostic_ids, password):
+    """Insert `size` patients starting at user id `first_id` with all their history; returns rows per table."""
+    ids = np.arange(first_id, first_id + size)
+    written = {}
+
+    # Patients
+    first = np.array(FIRST_NAMES)[rng.integers(0, len(FIRST_NAMES), size)]
+    last = np.array(LAST_NAMES)[rng.integers(0, len(LAST_NAMES), size)]
+    dob = _dates(-rng.integers(365 * 1, 365 * 90, size))
+    blood = rng.choice(BLOOD_TYPES[0], size=size, p=BLOOD_TYPES[1])
+    joined = _timestamps(-rng.integers(HISTORY_DAYS, HISTORY_DAYS + 365, size), rng.integers(0, 86400, size))
+    conn.executemany('''
+        INSERT INTO users (id, email, password, full_name, phone, date_of_birth, blood_type, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', zip(ids.tolist(), (f"patient{i}@example.com" for i in ids.tolist()), [password] * size,
+             np.char.add(np.char.add(first, " "), last).tolist(), (f"+1-555-{i % 10_000_000:07d}" for i in ids.tolist()),
+             dob.tolist(), blood.tolist(), joined.tolist()))
+    written["users"] = size
+
+    counts = {table: _counts(rng, rate, size) for table, rate in rates.items()}
+
+    # Doctor appointments, with popular (higher rated) doctors booked more often
+    owners = np.repeat(ids, counts["appointments"])
+    days, times, status = _visits(rng, owners)
+    doctors = rng.choice(doctor_ids, size=len(owners), p=doctor_weights)
+    kinds = rng.choice(APPOINTMENT_TYPES[0], size=len(owners), p=APPOINTMENT_TYPES[1])
+    symptoms = np.array(SYMPTOMS)[rng.integers(0, len(SYMPTOMS), len(owners))]
+    # A doctor slot holds one active booking (idx_appointments_doctor_slot); colliding draws are dropped
+    cursor = conn.executemany('''
+        INSERT OR IGNORE INTO appointments (user_id, doctor_id, appointment_type, appointment_date, appointment_time,
+                                  status, symptoms, notes, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, '', ?)
+    ''', zip(owners.tolist(), doctors.tolist(), kinds.tolist(), _dates(days).tolist(), times.tolist(),
+             status.tolist(), symptoms.tolist(), _created_before(rng, days).tolist()))
+    written["appointments"] = cursor.rowcount
+
+    # Lab and diagnostic visits
+    owners = np.repeat(ids, counts["lab_appointments"])
+    days, times, status = _visits(rng, owners)
+    results = np.where(status == "completed", "Within normal range", None)
+    conn.executemany('''
+        INSERT INTO lab_appointments (user_id, service_id, appointment_date, appointment_time, status, results, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', zip(owners.tolist(), rng.choice(lab_ids, len(owners)).tolist(), _dates(days).tolist(), times.tolist(),
+             status.tolist(), results.tolist(), _created_before(rng, days).tolist()))
+    written["lab_appointments"] = len(owners)
+
+    owners = np.repeat(ids, counts["diagnostic_appointments"])
+    days, times, status = _visits(rng, owners)
+    urgency = rng.choice(["routine", "urgent", "emergency"], size=len(owners), p=[0.85, 0.12, 0.03])
+    conn.executemany('''
+        INSERT INTO diagnostic_appointments (user_id, service_id, appointment_date, appointment_time, status,
+                                             urgency, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', zip(owners.tolist(), rng.choice(diagnostic_ids, len(owners)).tolist(), _dates(days).tolist(),
+             times.tolist(), status.tolist(), urgency.tolist(), _created_before(rng, days).tolist()))
+    written["diagnostic_appointments"] = len(owners)
+
+    owners = np.repeat(ids, counts["physiotherapy_sessions"])
+    days, times, status = _visits(rng, owners)
+    conn.executemany('''
+        INSERT INTO physiotherapy_sessions (user_id, therapist_id, session_date, session_time, duration,
+                                            session_type, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', zip(owners.tolist(), rng.integers(1, 20, len(owners)).tolist(), _dates(days).tolist(), times.tolist(),
+             rng.choice([30, 45, 60], len(owners)).tolist(), rng.choice(PHYSIO_TYPES, len(owners)).tolist(),
+             status.tolist(), _created_before(rng, days).tolist()))
+    written["physiotherapy_sessions"] = len(owners)
+
+    # Pharmacy orders of one to three medications
+    owners = np.repeat(ids, counts["pharmacy_orders"])
+    days = rng.integers(-HISTORY_DAYS, 0, len(owners))
+    sizes = rng.integers(1, 4, len(owners))
+    picks = rng.integers(0, len(MEDICATIONS), (len(owners), 3))
+    medications, totals = [], []
+    for row, n in zip(picks.tolist(), sizes.tolist()):
+        chosen = [MEDICATIONS[i] for i in dict.fromkeys(row[:n])]
+        medications.append(json.dumps([name for name, _ in chosen]))
+        totals.append(round(sum(price for _, price in chosen), 2))
+    delivery = rng.choice(["pickup", "delivery"], size=len(owners), p=[0.7, 0.3])
+    status = np.where(days > -3, rng.choice(["ordered", "ready"], len(owners)),
+                      np.where(delivery == "delivery", "delivered", "picked_up"))
+    addresses = np.where(delivery == "delivery", "221B Baker Street", None)
+    conn.executemany('''
+        INSERT INTO pharmacy_orders (user_id, medications, status, total_amount, payment_status,
+                                     delivery_option, delivery_address, created_at)
+        VALUES (?, ?, ?, ?, 'paid', ?, ?, ?)
+    ''', zip(owners.tolist(), medications, status.tolist(), totals, delivery.tolist(), addresses.tolist(),
+             _timestamps(days, rng.integers(8 * 3600, 21 * 3600, len(owners))).tolist()))
+    written["pharmacy_orders"] = len(owners)
+
+    # Vitals drift around a per-patient baseline
+    owners = np.repeat(ids, counts["health_monitoring"])
+    baseline = np.repeat(np.arange(size), counts["health_monitoring"])
+    weight = rng.normal(75, 15, size).clip(35, 180)[baseline] + rng.normal(0, 1.5, len(owners))
+    height = rng.normal(170, 10, size).clip(140, 210)[baseline]
+    systolic = rng.normal(122, 14, size)[baseline] + rng.normal(0, 6, len(owners))
+    conn.executemany('''
+        INSERT INTO health_monitoring (user_id, date_recorded, weight_kg, height_cm, blood_pressure_systolic,
+                                       blood_pressure_diastolic, heart_rate, temperature, blood_glucose,
+                                       oxygen_saturation)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', zip(owners.tolist(), _dates(rng.integers(-HISTORY_DAYS, 1, len(owners))).tolist(),
+             weight.round(1).tolist(), height.round(0).tolist(), systolic.round().astype(int).tolist(),
+             (systolic * 0.65 + rng.normal(0, 4, len(owners))).round().astype(int).tolist(),
+             rng.normal(72, 9, len(owners)).round().astype(int).tolist(),
+             rng.normal(36.8, 0.3, len(owners)).round(1).tolist(),
+             rng.normal(98, 15, len(owners)).round().tolist(),
+             rng.normal(97.5, 1.2, len(owners)).clip(85, 100).round(1).tolist()))
+    written["health_monitoring"] = len(owners)
+
+    owners = np.repeat(ids, counts["medication_reminders"])
+    start = rng.integers(-HISTORY_DAYS, 0, len(owners))
+    end = start + rng.integers(7, 365, len(owners))
+    conn.executemany('''
+        INSERT INTO medication_reminders (user_id, medication_name, dosage, frequency, start_date, end_date, active)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', zip(owners.tolist(), [MEDICATIONS[i][0] for i in rng.integers(0, len(MEDICATIONS), len(owners))],
+             rng.choice(["1 tablet", "2 tablets", "5 ml"], len(owners)).tolist(),
+             rng.choice(FREQUENCIES, len(owners)).tolist(), _dates(start).tolist(), _dates(end).tolist(),
+             (end >= 0).astype(int).tolist()))
+    written["medication_reminders"] = len(owners)
+    return written
+
+
+def generate(db_path, patients, rates=None, doctors=None, seed=42, chunk_size=20_000, progress=True):
+    """
+    Fill db_path with `patients` synthetic patients and their history; returns rows written per table.
+    The schema comes from the app's migrations, so the file can be new or an existing portal database.
+    """
+    # Importing database opens its module-level Database; point it at the file being filled
+    os.environ.setdefault("EASYHEALTH_DB", db_path)
+    from database import Database
+
+    rates = {**DEFAULT_RATES, **(rates or {})}
+    rng = np.random.default_rng(seed)
+    # Migrate the schema through the app's own pool, then load over a dedicated connection
+    Database(db_path, pool_size=1).close()
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")
+    password = hashlib.sha256(b"password").hexdigest()
+    totals = {}
+    started = time.perf_counter()
+    try:
+        conn.execute("BEGIN")
+        generate_doctors(conn, rng, doctors if doctors is not None else max(5, patients // 2000))
+        conn.execute("COMMIT")
+        doctor_ids, ratings = map(np.array, zip(*conn.execute("SELECT id, rating FROM doctors")))
+        doctor_weights = ratings ** 4 / (ratings ** 4).sum()
+        lab_ids = [row[0] for row in conn.execute("SELECT id FROM lab_services")]
+        diagnostic_ids = [row[0] for row in conn.execute("SELECT id FROM diagnostic_services")]
+        first_id = (conn.execute("SELECT MAX(id) FROM users").fetchone()[0] or 0) + 1
+
+        for offset in range(0, patients, chunk_size):
+            size = min(chunk_size, patients - offset)
+            conn.execute("BEGIN")
+            try:
+                written = generate_chunk(conn, rng, first_id + offset, size, rates, doctor_ids, doctor_weights,
+                                         lab_ids, diagnostic_ids, password)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            for table, count in written.items():
+                totals[table] = totals.get(table, 0) + count
+            if progress:
+                done = offset + size
+                rate = done / (time.perf_counter() - started)
+                print(f"  {done:,}/{patients:,} patients, {sum(totals.values()):,} rows ({rate:,.0f} patients/s)",
+                      file=sys.stderr)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill an EasyHealth database with synthetic patients")
+    parser.add_argument("--db", default=os.environ.get("EASYHEALTH_DB", "hospital_portal.db"),
+                        help="database file to fill (created if missing)")
+    parser.add_argument("--patients", type=int, default=10_000, help="number of patients to add")
+    parser.add_argument("--doctors", type=int, default=None, help="number of doctors to add (default patients/2000)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--chunk-size", type=int, default=20_000, help="patients per transaction")
+    for table, rate in DEFAULT_RATES.items():
+        parser.add_argument(f"--{table.replace('_', '-')}", type=float, default=rate, dest=table,
+                            help=f"mean {table} rows per patient (default {rate})")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    totals = generate(args.db, args.patients, {table: getattr(args, table) for table in DEFAULT_RATES},
+                      args.doctors, args.seed, args.chunk_size)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {sum(totals.values()):,} rows to {args.db} in {elapsed:.1f}s")
+    for table, count in totals.items():
+        print(f"  {table:24} {count:>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Intent routing for the rule-based chatbot.
+
+Every keyword of every intent is compiled into one regex with word boundaries, so a
+query is scanned once and "when" no longer matches inside "whenever" nor "pain"
+inside "Spain". The keywords are laid out as a character trie ("pa(?:in|rking|y...)")
+because Python's re tries a flat alternation one branch at a time at every position.
+Each hit adds its weight to the intent(s) it belongs to and the highest total wins,
+ties going to the intent listed first.
+
+    python intent_router.py   # check the labeled queries and time both routers
+"""
+import re
+import sys
+import timeit
+
+# Intent -> {keyword or phrase: weight}. Strong, unambiguous words weigh 3; words
+# that only hint at an intent ("next", "doctor") weigh 1. Plurals match automatically.
+INTENT_RULES = {
+    "office_hours": {
+        "hours": 3, "opening hours": 4, "open": 2, "opening": 3, "closing": 3, "close": 1, "operating": 3,
+        "office": 2, "clinic": 1, "weekend": 2, "saturday": 1, "sunday": 1, "time": 1,
+    },
+    "symptoms": {
+        "symptom": 3, "pain": 3, "headache": 3, "fever": 3, "cough": 3, "stomach": 2, "nausea": 3,
+        "feeling sick": 4, "sick": 2, "dizzy": 3, "ache": 2, "hurt": 2, "vomiting": 3, "rash": 3, "sore": 2,
+    },
+    "medications": {
+        "medication": 3, "medicine": 3, "meds": 3, "drug": 2, "pill": 3, "prescription": 3, "refill": 3,
+        "dosage": 3, "dose": 2, "taking": 1,
+    },
+    "preparation": {
+        "prepare": 4, "preparation": 4, "instruction": 2, "fasting": 3, "fast": 1, "before": 1,
+        "what to bring": 3, "bring": 1, "procedure": 2, "exam": 1, "test": 1,
+    },
+    "appointments": {
+        "appointment": 2, "next appointment": 4, "booking": 3, "book": 2, "schedule": 2, "reschedule": 3,
+        "cancel": 2, "upcoming": 2, "doctor": 1, "visit": 1, "next": 1,
+    },
+    "lab_results": {
+        "lab": 3, "lab result": 4, "test result": 4, "result": 2, "blood work": 4, "blood": 2, "urine": 3,
+        "analysis": 2, "cbc": 3, "thyroid": 3, "test": 1,
+    },
+    "medical_records": {
+        "report": 3, "medical record": 4, "record": 3, "diagnosis": 3, "history": 2, "treatment": 2,
+        "chart": 2, "medical": 1,
+    },
+    "billing": {
+        "bill": 3, "billing": 3, "payment": 3, "pay": 2, "cost": 3, "insurance": 3, "fee": 3, "copay": 3,
+        "charge": 2, "price": 2, "money": 2,
+    },
+    "hospital_info": {
+        "location": 3, "address": 3, "direction": 3, "park": 3, "parking": 3, "entrance": 3, "floor": 2, "where": 1,
+        "department": 1, "hospital": 1,
+    },
+}
+
+# A query must score at least this much for any intent to be chosen, so one weak
+# hint such as "next" on its own falls through to the help text
+MIN_SCORE = 2
+
+
+def trie_pattern(terms):
+    """A regex matching any of the lower-case terms, factored on shared prefixes."""
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node):
+        branches = [(r"\s+" if char == " " else re.escape(char)) + emit(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        # A term ending here makes the rest optional; greedy, so longer terms are tried first
+        return group + "?" if "" in node else group
+
+    return emit(trie)
+
+
+class IntentRouter:
+    """A compiled INTENT_RULES-style table; route() returns the best intent or None."""
+
+    def __init__(self, rules=INTENT_RULES, min_score=MIN_SCORE):
+        self.intents = list(rules)
+        self.min_score = min_score
+        # Keyword -> [(intent position, weight)]; one keyword may count for several intents
+        self._weights = {}
+        for position, terms in enumerate(rules.values()):
+            for term, weight in terms.items():
+                self._weights.setdefault(" ".join(term.lower().split()), []).append((position, weight))
+        # Queries are lower-cased before matching, which is much cheaper than IGNORECASE
+        self._pattern = re.compile(rf"\b({trie_pattern(self._weights)})(?:s|es)?\b")
+
+    def _totals(self, query):
+        totals = {}
+        for term in self._pattern.findall(query.lower()):
+            hits = self._weights.get(term) or self._weights[" ".join(term.split())]
+            for position, weight in hits:
+                totals[position] = totals.get(position, 0) + weight
+        return totals
+
+    def scores(self, query):
+        """{intent: score} for every intent with at least one keyword in the query."""
+        return {self.intents[position]: score for position, score in sorted(self._totals(query).items())}
+
+    def route(self, query):
+        totals = self._totals(query)
+        if not totals:
+            return None
+        # Highest score, then the intent listed first
+        position, score = max(totals.items(), key=lambda item: (item[1], -item[0]))
+        return self.intents[position] if score >= self.min_score else None
+
+
+router = IntentRouter()
+
+
+def route_intent(query):
+    return router.route(query)
+
+
+# Queries with the intent a person would expect; None means "fall back to the help text"
+LABELED_QUERIES = [
+    # The chatbot page's quick-action buttons
+    ("When is my next appointment?", "appointments"),
+    ("What medications am I currently taking?", "medications"),
+    ("What are my most recent lab results?", "lab_results"),
+    # Typed questions
+    ("What should I prepare for my lab test?", "preparation"),
+    ("What medications am I taking?", "medications"),
+    ("What are the hospital hours?", "office_hours"),
+    ("Are you open on Sunday?", "office_hours"),
+    ("What time does the clinic close?", "office_hours"),
+    ("I have a headache and a fever", "symptoms"),
+    ("I've been feeling sick since yesterday", "symptoms"),
+    ("My stomach hurts when I eat", "symptoms"),
+    ("Can I get a refill of my prescription?", "medications"),
+    ("How many pills should I take?", "medications"),
+    ("Do I need fasting before blood work?", "preparation"),
+    ("What to bring for my MRI procedure", "preparation"),
+    ("I want to book a visit with a cardiologist", "appointments"),
+    ("Please reschedule my upcoming appointment", "appointments"),
+    ("Can I cancel my appointment?", "appointments"),
+    ("Are my lab results back?", "lab_results"),
+    ("What did my thyroid test show?", "lab_results"),
+    ("Show my CBC results", "lab_results"),
+    ("I need a copy of my medical records", "medical_records"),
+    ("What was my diagnosis last time?", "medical_records"),
+    ("How much does an office visit cost?", "billing"),
+    ("Do you take my insurance?", "billing"),
+    ("Where do I pay my bill?", "billing"),
+    ("Where is the parking entrance?", "hospital_info"),
+    ("Where do I park?", "hospital_info"),
+    ("What is the hospital address?", "hospital_info"),
+    ("Directions to the lab floor", "hospital_info"),
+    ("Whenever I stand up I feel dizzy", "symptoms"),
+    ("I'm travelling to Spain next month", None),
+    ("Thanks!", None),
+    ("hello there", None),
+]
+
+# The keyword lists generate_chatbot_response checked in order before the router
+LEGACY_KEYWORDS = [
+    ("office_hours", ['office', 'hours', 'open', 'when', 'time', 'schedule', 'operating', 'clinic']),
+    ("symptoms", ['symptom', 'pain', 'headache', 'fever', 'cough', 'stomach', 'nausea', 'feeling sick']),
+    ("medications", ['medication', 'medicine', 'drug', 'pill', 'prescription', 'taking', 'dosage']),
+    ("preparation", ['prepare', 'preparation', 'before', 'appointment', 'test', 'exam', 'procedure', 'instructions']),
+    ("appointments", ['appointment', 'booking', 'schedule', 'doctor', 'visit', 'next', 'upcoming']),
+    ("lab_results", ['lab', 'test', 'result', 'blood', 'urine', 'analysis', 'cbc', 'thyroid']),
+    ("medical_records", ['report', 'medical', 'history', 'diagnosis', 'treatment', 'record', 'chart']),
+    ("billing", ['bill', 'billing', 'payment', 'cost', 'insurance', 'fee', 'charge', 'money']),
+    ("hospital_info", ['hospital', 'location', 'address', 'directions', 'parking', 'entrance', 'where']),
+]
+
+
+def legacy_route(query):
+    query = query.lower().strip()
+    for intent, keywords in LEGACY_KEYWORDS:
+        if any(keyword in query for keyword in keywords):
+            return intent
+    return None
+
+
+def main():
+
+    failures = 0
+    legacy_correct = 0
+    for query, expected in LABELED_QUERIES:
+        got = route_intent(query)
+        legacy_correct += legacy_route(query) == expected
+        if got != expected:
+            failures += 1
+            print(f"FAIL {query!r}: expected {expected}, got {got} {router.scores(query)}")
+    total = len(LABELED_QUERIES)
+    print(f"router {total - failures}/{total} correct, keyword chain {legacy_correct}/{total}")
+
+    queries = [query for query, _ in LABELED_QUERIES]
+    for name, route in (("router", route_intent), ("keyword chain", legacy_route)):
+        runs = 200
+        seconds = min(timeit.repeat(lambda: [route(q) for q in queries], number=runs, repeat=5))
+        print(f"{name:14} {seconds / (runs * total) * 1e6:6.2f} µs per query")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import sqlite3
+
+# Both counters live in the database header, so checking them costs no table reads
+STATE_QUERY = "SELECT (SELECT user_version FROM pragma_user_version), (SELECT application_id FROM pragma_application_id)"
+
+
+class MigrationError(sqlite3.DatabaseError):
+    """The database can't be brought up to date by this code."""
+
+
+def schema_version(conn):
+    """Return (user_version, application_id) for a connection."""
+    return conn.execute(STATE_QUERY).fetchone()
+
+
+def _apply(cursor, step):
+    if callable(step):
+        step(cursor)
+    else:
+        for statement in step:
+            cursor.execute(statement)
+
+
+def migrate(conn, migrations, application_id):
+    """
+    Apply pending migrations and return how many ran.
+
+    `migrations` is an append-only list of (name, step) pairs. Migration N is
+    list entry N-1, and `PRAGMA user_version` records how many have been
+    applied. A step is either a callable taking a cursor or a sequence of SQL
+    statements. Every pending step runs in one transaction, so a failure
+    leaves the database exactly as it was. `application_id` marks which app
+    owns the schema, so one app never migrates another app's database file.
+    """
+    latest = len(migrations)
+    version, owner = schema_version(conn)
+    if version == latest and owner == application_id:
+        return 0
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Re-read under the write lock; another process may have migrated meanwhile
+        version, owner = schema_version(conn)
+        if owner not in (0, application_id):
+            raise MigrationError(f"Database belongs to application {owner:#x}, not {application_id:#x}")
+        if version > latest:
+            raise MigrationError(f"Database schema version {version} is newer than this code ({latest})")
+
+        cursor = conn.cursor()
+        for number, (name, step) in enumerate(migrations[version:], start=version + 1):
+            try:
+                _apply(cursor, step)
+            except sqlite3.Error as e:
+                raise MigrationError(f"Migration {number} ({name}) failed: {e}") from e
+
+        # PRAGMA values can't be bound as parameters; both are ints we control
+        conn.execute(f"PRAGMA application_id = {int(application_id)}")
+        conn.execute(f"PRAGMA user_version = {latest}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return latest - version
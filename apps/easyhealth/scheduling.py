@@ -0,0 +1,211 @@
+"""
+Doctor availability and slot booking.
+
+Free-text schedules such as "Mon-Fri 9AM-5PM" are parsed into weekly windows;
+appointments sit on a fixed grid of SLOT_MINUTES slots inside those windows. A
+BookingIndex holds a doctor's booked slot starts per day in sorted arrays, so a
+conflict check is a bisect. The partial UNIQUE index on (doctor_id,
+appointment_date, appointment_time) is what keeps two concurrent bookings from
+taking the same slot; the checks here give a clear reason before it gets that far.
+"""
+import re
+import bisect
+import datetime
+from itertools import groupby
+from functools import lru_cache
+
+SLOT_MINUTES = 30
+BOOKING_HORIZON_DAYS = 60
+
+# Appointments in these states hold their slot; the UNIQUE index uses the same condition
+ACTIVE_STATUSES = ("scheduled", "confirmed")
+ACTIVE_CONDITION = "status IN ('scheduled', 'confirmed')"
+
+DAY_NAMES = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+_DAY = r"(?:mon|tue|wed|thu|fri|sat|sun)[a-z]*"
+_TIME = r"(?:\d{1,2}(?::\d{2})?\s*(?:am|pm)?|noon|midnight)"
+_SEGMENT = re.compile(
+    rf"(?P<days>{_DAY}(?:\s*(?:-|–|to|,|&|and)\s*{_DAY})*)\s+(?P<start>{_TIME})\s*(?:-|–|to)\s*(?P<end>{_TIME})",
+    re.IGNORECASE,
+)
+
+
+class SlotUnavailable(ValueError):
+    """The requested appointment slot can't be booked."""
+
+
+def parse_time(text):
+    """Minutes after midnight for "9AM", "9:30 pm", "17:00", "noon" or "midnight"."""
+    text = text.strip().lower().replace(" ", "")
+    if text == "noon":
+        return 12 * 60
+    if text == "midnight":
+        return 0
+    match = re.fullmatch(r"(\d{1,2})(?::(\d{2}))?(am|pm)?", text)
+    if not match:
+        raise ValueError(f"Unrecognised time: {text!r}")
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"Unrecognised time: {text!r}")
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    if hour > 24 or minute > 59:
+        raise ValueError(f"Unrecognised time: {text!r}")
+    return hour * 60 + minute
+
+
+def _parse_days(text):
+    days = set()
+    for part in re.split(r"\s*(?:,|&|and)\s*", text.lower()):
+        bounds = re.split(r"\s*(?:-|–|to)\s*", part)
+        first, last = DAY_NAMES.index(bounds[0][:3]), DAY_NAMES.index(bounds[-1][:3])
+        # Ranges may wrap past Sunday, e.g. Sat-Mon
+        span = (last - first) % 7
+        days.update((first + offset) % 7 for offset in range(span + 1))
+    return days
+
+
+@lru_cache(maxsize=1024)
+def parse_schedule(text):
+    """
+    Parse a schedule like "Mon-Fri 9AM-5PM" or "Mon, Wed 8AM-12PM; Sat 10AM-2PM"
+    into a tuple of seven tuples (Monday first) of (start, end) minute windows.
+    Text that doesn't parse gives no windows, so the doctor has no bookable slots.
+    """
+    week = [[] for _ in DAY_NAMES]
+    for match in _SEGMENT.finditer(text or ""):
+        start, end = parse_time(match.group("start")), parse_time(match.group("end"))
+        if end <= start:
+            continue
+        for day in _parse_days(match.group("days")):
+            week[day].append((start, end))
+
+    merged = []
+    for windows in week:
+        day = []
+        for start, end in sorted(windows):
+            if day and start <= day[-1][1]:
+                day[-1] = (day[-1][0], max(day[-1][1], end))
+            else:
+                day.append((start, end))
+        merged.append(tuple(day))
+    return tuple(merged)
+
+
+def day_slots(schedule, day):
+    """Slot start minutes on a date, in order."""
+    return [minute
+            for start, end in schedule[day.weekday()]
+            for minute in range(start, end - SLOT_MINUTES + 1, SLOT_MINUTES)]
+
+
+def time_text(value):
+    """Normalise a datetime.time or "H:MM[:SS]" string to the stored "HH:MM" form."""
+    if isinstance(value, datetime.time):
+        return value.strftime("%H:%M")
+    hour, minute = str(value).strip().split(":")[:2]
+    return f"{int(hour):02d}:{int(minute):02d}"
+
+
+def date_text(value):
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return datetime.date.fromisoformat(str(value).strip()).isoformat()
+
+
+def minutes_of(value):
+    if isinstance(value, int):
+        return value
+    hour, minute = time_text(value).split(":")
+    return int(hour) * 60 + int(minute)
+
+
+def format_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class BookingIndex:
+    """
+    One doctor's booked slot starts, kept as a sorted array per date. Lookups and
+    inserts are a bisect, so checking a slot stays O(log n) however full the diary.
+    """
+
+    def __init__(self, bookings=()):
+        self._starts = {}
+        for day, start in bookings:
+            self.add(day, start)
+
+    @classmethod
+    def from_sorted(cls, rows):
+        """Build from stored ("YYYY-MM-DD", "HH:MM") rows already ordered by date and time."""
+        index = cls()
+        for day, group in groupby(rows, key=lambda row: row[0]):
+            index._starts[day] = [int(start[:2]) * 60 + int(start[3:5]) for _, start in group]
+        return index
+
+    def add(self, day, start):
+        bisect.insort(self._starts.setdefault(date_text(day), []), minutes_of(start))
+
+    def conflicts(self, day, start, duration=SLOT_MINUTES):
+        """True if a booking on `day` overlaps [start, start + duration)."""
+        starts = self._starts.get(date_text(day))
+        if not starts:
+            return False
+        minute = minutes_of(start)
+        # The nearest booking at or after the new start, and the one before it
+        position = bisect.bisect_left(starts, minute)
+        if position < len(starts) and starts[position] < minute + duration:
+            return True
+        return position > 0 and starts[position - 1] + SLOT_MINUTES > minute
+
+
+def check_slot(schedule, index, day, start, now=None):
+    """Raise SlotUnavailable unless the slot is on the grid, in hours, in the future and free."""
+    now = now or datetime.datetime.now()
+    day = datetime.date.fromisoformat(date_text(day))
+    minute = minutes_of(start)
+    moment = datetime.datetime.combine(day, datetime.time(minute // 60, minute % 60))
+    if moment <= now:
+        raise SlotUnavailable("Appointments must be booked for a future time")
+    if (day - now.date()).days > BOOKING_HORIZON_DAYS:
+        raise SlotUnavailable(f"Appointments can be booked up to {BOOKING_HORIZON_DAYS} days ahead")
+    if minute not in day_slots(schedule, day):
+        if not schedule[day.weekday()]:
+            raise SlotUnavailable(f"The doctor doesn't see patients on {day.strftime('%A')}s")
+        raise SlotUnavailable(f"{format_minutes(minute)} isn't an available {SLOT_MINUTES}-minute slot in the "
+                              "doctor's hours")
+    if index.conflicts(day, minute):
+        raise SlotUnavailable(f"{day.isoformat()} at {format_minutes(minute)} is already booked")
+
+
+def available_slots(schedule, index, count=5, after=None):
+    """The next `count` free (date, "HH:MM") slots after `after`, within the booking horizon."""
+    now = datetime.datetime.now()
+    after = max(after or now, now)
+    day = after.date()
+    last_day = now.date() + datetime.timedelta(days=BOOKING_HORIZON_DAYS)
+    after_minute = after.hour * 60 + after.minute
+
+    slots = []
+    while day <= last_day and len(slots) < count:
+        for minute in day_slots(schedule, day):
+            if day == after.date() and minute <= after_minute:
+                continue
+            if not index.conflicts(day, minute):
+                slots.append((day.isoformat(), format_minutes(minute)))
+                if len(slots) == count:
+                    break
+        day += datetime.timedelta(days=1)
+    return slots
+
+
+if __name__ == "__main__":
+    for text in ["Mon-Fri 9AM-5PM", "Tue-Sat 8AM-4PM", "Wed-Sun 9AM-5PM", "Sat-Mon 10:30am-2pm",
+                 "Mon, Wed & Fri 08:00-12:00; Thu 1PM-6PM", "by appointment"]:
+        week = parse_schedule(text)
+        print(f"{text!r:45} " + "  ".join(
+            f"{DAY_NAMES[d].title()} " + ",".join(f"{format_minutes(s)}-{format_minutes(e)}" for s, e in windows)
+            for d, windows in enumerate(week) if windows))
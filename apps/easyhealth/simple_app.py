@@ -1,8 +1,10 @@
 import streamlit as st
 import sqlite3
 import hashlib
+import threading
 from datetime import date, time
 import json
+from migrations import migrate
 
 # Configure page
 st.set_page_config(
@@ -11,11 +13,11 @@ st.set_page_config(
     layout="wide"
 )
 
-# Database setup
-def init_db():
-    conn = sqlite3.connect('hospital_portal.db')
-    c = conn.cursor()
+# Stamped into the database header so app.py's schema is never migrated ("EHSP")
+APPLICATION_ID = 0x45485350
 
+# Database setup
+def create_tables(c):
     # Only drop tables if they don't exist - don't drop existing user data
     # Keep existing users table intact
     # c.execute('DROP TABLE IF EXISTS medical_reports')
@@ -68,7 +70,7 @@ def init_db():
                   doctor_name TEXT, diagnosis TEXT, treatment TEXT, recommendations TEXT,
                   file_path TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
 
-    # Insert sample data
+def insert_sample_data(c):
     # Doctors
     c.execute("INSERT OR IGNORE INTO doctors VALUES (1, 'Dr. Sarah Johnson', 'Cardiology', '+1-555-0101', 4.8)")
     c.execute("INSERT OR IGNORE INTO doctors VALUES (2, 'Dr. Michael Chen', 'Neurology', '+1-555-0102', 4.9)")
@@ -87,7 +89,15 @@ def init_db():
     # Sample medical reports
     c.execute("INSERT OR IGNORE INTO medical_reports VALUES (1, 1, 'Consultation Report', '2024-10-15', 'Dr. Sarah Johnson', 'Hypertension', 'Lisinopril 10mg daily', 'Follow up in 3 months, reduce salt intake', NULL, '2024-10-15 10:30:00')")
 
-    conn.commit()
+# Append-only: each entry's position is its schema version (see migrations.migrate)
+MIGRATIONS = [
+    ("create tables", create_tables),
+    ("insert sample data", insert_sample_data),
+]
+
+def init_db():
+    conn = sqlite3.connect('hospital_portal.db')
+    migrate(conn, MIGRATIONS, APPLICATION_ID)
     conn.close()
 
 def hash_password(password):
@@ -134,6 +144,7 @@ def create_appointment(user_id, doctor_id, app_date, app_time, app_type="Regular
     conn.commit()
     appointment_id = c.lastrowid
     conn.close()
+    bump_data_version(user_id)
     return appointment_id
 
 def update_appointment(appointment_id, app_date, app_time, app_type, symptoms, notes):
@@ -143,14 +154,23 @@ def update_appointment(appointment_id, app_date, app_time, app_type, symptoms, n
                  appointment_type=?, symptoms=?, notes=? WHERE id=?""",
              (str(app_date), str(app_time), app_type, symptoms, notes, appointment_id))
     conn.commit()
+    user_id = appointment_owner(c, appointment_id)
     conn.close()
+    bump_data_version(user_id)
 
 def cancel_appointment(appointment_id):
     conn = sqlite3.connect('hospital_portal.db')
     c = conn.cursor()
     c.execute("UPDATE appointments SET status='cancelled' WHERE id=?", (appointment_id,))
     conn.commit()
+    user_id = appointment_owner(c, appointment_id)
     conn.close()
+    bump_data_version(user_id)
+
+def appointment_owner(c, appointment_id):
+    c.execute("SELECT user_id FROM appointments WHERE id=?", (appointment_id,))
+    row = c.fetchone()
+    return row[0] if row else None
 
 def get_user_appointments(user_id):
     conn = sqlite3.connect('hospital_portal.db')
@@ -180,6 +200,7 @@ def create_lab_appointment(user_id, test_id, app_date, app_time):
     conn.commit()
     appointment_id = c.lastrowid
     conn.close()
+    bump_data_version(user_id)
     return appointment_id
 
 def get_user_lab_appointments(user_id):
@@ -213,6 +234,7 @@ def create_pharmacy_order(user_id, medications_list, total_amount, delivery_opti
     conn.commit()
     order_id = c.lastrowid
     conn.close()
+    bump_data_version(user_id)
     return order_id
 
 def get_user_pharmacy_orders(user_id):
@@ -234,6 +256,7 @@ def create_physiotherapy_session(user_id, session_date, session_time, session_ty
     conn.commit()
     session_id = c.lastrowid
     conn.close()
+    bump_data_version(user_id)
     return session_id
 
 def get_user_physiotherapy_sessions(user_id):
@@ -263,8 +286,29 @@ def add_medical_report(user_id, report_type, report_date, doctor_name, diagnosis
     conn.commit()
     report_id = c.lastrowid
     conn.close()
+    bump_data_version(user_id)
     return report_id
 
+# Chatbot context cache
+@st.cache_resource
+def data_versions():
+    """Per-patient data versions for this server process; the write functions above bump them."""
+    return {"lock": threading.Lock(), "versions": {}}
+
+def bump_data_version(user_id):
+    store = data_versions()
+    with store["lock"]:
+        store["versions"][user_id] = store["versions"].get(user_id, 0) + 1
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def load_patient_context(user_id, version):
+    return (get_user_appointments(user_id), get_user_lab_appointments(user_id), get_user_pharmacy_orders(user_id),
+            get_user_physiotherapy_sessions(user_id), get_user_medical_reports(user_id))
+
+def get_patient_context(user_id):
+    """The five record lists the chatbot answers from, re-read only after this patient's records change"""
+    return load_patient_context(user_id, data_versions()["versions"].get(user_id, 0))
+
 # LLM Response Generation using Ollama MCP
 def generate_llm_response(user_query, context, model_name):
     """Generate response using Ollama LLM via MCP server"""
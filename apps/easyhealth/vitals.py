@@ -0,0 +1,183 @@
+"""
+Vitals time series: rollup tables and vectorized trend, BMI and health score maths.
+
+Every health_monitoring reading is folded into per-patient daily, weekly and monthly
+rollups by triggers, storing a count and a sum per vital so averages stay exact as
+readings are added, edited or removed. Charts read whichever rollup keeps the
+number of points small for the range shown, so a patient with years of home-device
+readings costs the same as one with a month of them.
+"""
+import numpy as np
+import pandas as pd
+
+VITALS = (
+    "weight_kg",
+    "height_cm",
+    "blood_pressure_systolic",
+    "blood_pressure_diastolic",
+    "heart_rate",
+    "temperature",
+    "blood_glucose",
+    "oxygen_saturation",
+)
+
+# Rollup grain -> SQL expression giving the start date of the period containing {}
+ROLLUP_GRAINS = {
+    "daily": "date({})",
+    "weekly": "date({}, 'weekday 0', '-6 days')",
+    "monthly": "strftime('%Y-%m-01', {})",
+}
+
+# Days per period of each grain, finest first
+GRAIN_DAYS = {"daily": 1, "weekly": 7, "monthly": 30.44}
+
+# Most periods a series is fetched with unless the caller asks for more detail
+MAX_PERIODS = 120
+
+# Healthy range and weight of each metric in the health score
+SCORE_RANGES = {
+    "blood_pressure_systolic": ((90, 120), 20),
+    "blood_pressure_diastolic": ((60, 80), 15),
+    "heart_rate": ((60, 100), 15),
+    "bmi": ((18.5, 25), 20),
+    "blood_glucose": ((70, 140), 15),
+    "oxygen_saturation": ((95, 100), 10),
+    "temperature": ((36.1, 37.2), 5),
+}
+
+
+def _add(grain, row):
+    period = ROLLUP_GRAINS[grain].format(f"{row}.date_recorded")
+    counts = ", ".join(f"{row}.{vital} IS NOT NULL" for vital in VITALS)
+    sums = ", ".join(f"COALESCE({row}.{vital}, 0)" for vital in VITALS)
+    updates = ", ".join([f"n_{vital} = n_{vital} + excluded.n_{vital}, sum_{vital} = sum_{vital} + excluded.sum_{vital}"
+                         for vital in VITALS])
+    return f'''
+        INSERT INTO health_rollup_{grain}
+        SELECT {row}.user_id, {period}, 1, {counts}, {sums} WHERE {row}.user_id IS NOT NULL
+        ON CONFLICT (user_id, period) DO UPDATE SET readings = readings + 1, {updates};
+    '''
+
+
+def _subtract(grain, row):
+    period = ROLLUP_GRAINS[grain].format(f"{row}.date_recorded")
+    updates = ", ".join([f"n_{vital} = n_{vital} - ({row}.{vital} IS NOT NULL), "
+                         f"sum_{vital} = sum_{vital} - COALESCE({row}.{vital}, 0)" for vital in VITALS])
+    return f'''
+        UPDATE health_rollup_{grain} SET readings = readings - 1, {updates}
+        WHERE user_id = {row}.user_id AND period = {period};
+        DELETE FROM health_rollup_{grain} WHERE user_id = {row}.user_id AND period = {period} AND readings = 0;
+    '''
+
+
+def rollup_statements():
+    """DDL for the rollup tables, the triggers that maintain them, and their backfill."""
+    columns = ", ".join([f"n_{vital} INTEGER NOT NULL DEFAULT 0" for vital in VITALS]
+                        + [f"sum_{vital} REAL NOT NULL DEFAULT 0" for vital in VITALS])
+    statements = []
+    for grain, period in ROLLUP_GRAINS.items():
+        statements.append(f'''
+            CREATE TABLE IF NOT EXISTS health_rollup_{grain} (
+                user_id INTEGER NOT NULL,
+                period DATE NOT NULL,
+                readings INTEGER NOT NULL,
+                {columns},
+                PRIMARY KEY (user_id, period)
+            ) WITHOUT ROWID
+        ''')
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS health_rollup_{grain}_insert AFTER INSERT ON health_monitoring
+            BEGIN {_add(grain, "NEW")} END
+        ''')
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS health_rollup_{grain}_delete AFTER DELETE ON health_monitoring
+            BEGIN {_subtract(grain, "OLD")} END
+        ''')
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS health_rollup_{grain}_update AFTER UPDATE ON health_monitoring
+            BEGIN {_subtract(grain, "OLD")} {_add(grain, "NEW")} END
+        ''')
+        counts = ", ".join(f"COUNT({vital})" for vital in VITALS)
+        sums = ", ".join(f"TOTAL({vital})" for vital in VITALS)
+        statements.append(f'''
+            INSERT OR REPLACE INTO health_rollup_{grain}
+            SELECT user_id, {period.format("date_recorded")}, COUNT(*), {counts}, {sums}
+            FROM health_monitoring
+            WHERE user_id IS NOT NULL
+            GROUP BY 1, 2
+        ''')
+    return statements
+
+
+def rollup_query(grain, date_from=None):
+    """SELECT for one patient's rollup rows in period order, optionally from a date."""
+    counts = ", ".join(f"n_{vital}" for vital in VITALS)
+    sums = ", ".join(f"sum_{vital}" for vital in VITALS)
+    since = f"AND period >= {ROLLUP_GRAINS[grain].format('?')}" if date_from else ""
+    return f'''
+        SELECT period, readings, {counts}, {sums} FROM health_rollup_{grain}
+        WHERE user_id = ? {since}
+        ORDER BY period
+    '''
+
+
+def choose_grain(days, max_periods=MAX_PERIODS):
+    """The finest grain that covers `days` in at most `max_periods` periods (monthly beyond that)."""
+    for grain, period_days in GRAIN_DAYS.items():
+        if days / period_days <= max_periods:
+            return grain
+    return "monthly"
+
+
+def rollup_frame(rows):
+    """Turn rollup rows into a DataFrame of per-period averages indexed by period start."""
+    width = len(VITALS)
+    if not rows:
+        return pd.DataFrame(columns=["readings", *VITALS], index=pd.DatetimeIndex([], name="period"), dtype=float)
+    periods, values = zip(*((row[0], row[1:]) for row in rows))
+    values = np.asarray(values, dtype=float)
+    counts, sums = values[:, 1:1 + width], values[:, 1 + width:]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    frame = pd.DataFrame(means, columns=list(VITALS), index=pd.DatetimeIndex(pd.to_datetime(periods), name="period"))
+    frame.insert(0, "readings", values[:, 0])
+    return frame
+
+
+def add_bmi(frame):
+    """BMI per period, carrying the last known height forward (it is rarely re-measured)."""
+    height_m = frame["height_cm"].where(frame["height_cm"] > 0).ffill() / 100
+    return frame.assign(bmi=frame["weight_kg"] / height_m ** 2)
+
+
+def trend_slopes(frame, columns):
+    """Least-squares change per week of each column over the frame, ignoring gaps."""
+    days = ((frame.index - frame.index.min()) / pd.Timedelta(days=1)).to_numpy(dtype=float)[:, None]
+    values = frame[list(columns)].to_numpy(dtype=float)
+    present = ~np.isnan(values)
+    x, y = np.where(present, days, 0.0), np.where(present, values, 0.0)
+    n = present.sum(axis=0)
+    sx, sy = x.sum(axis=0), y.sum(axis=0)
+    denominator = n * (x * x).sum(axis=0) - sx * sx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slopes = np.where((n >= 2) & (denominator > 0), (n * (x * y).sum(axis=0) - sx * sy) / denominator, np.nan)
+    return pd.Series(slopes * 7, index=list(columns))
+
+
+def health_scores(frame):
+    """
+    A 0-100 score per period: each metric loses its weight in proportion to how far
+    it sits outside the healthy range (capped at one range-width). Metrics with no
+    reading in a period are left out rather than counted as healthy or unhealthy.
+    """
+    metrics = list(SCORE_RANGES)
+    values = frame.reindex(columns=metrics).to_numpy(dtype=float)
+    low, high, weight = (np.array(part, dtype=float) for part in
+                         zip(*((low, high, weight) for (low, high), weight in SCORE_RANGES.values())))
+    deviation = np.maximum(np.maximum(low - values, values - high), 0) / (high - low)
+    penalty = np.minimum(deviation, 1) * weight
+    present = ~np.isnan(values)
+    total = (present * weight).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = 100 * (1 - np.where(present, penalty, 0).sum(axis=1) / total)
+    return pd.Series(np.where(total > 0, scores, np.nan), index=frame.index).round()
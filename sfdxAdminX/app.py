@@ -1,19 +1,48 @@
+from __future__ import annotations
+
 import streamlit as st
-import openai
-import json
-from simple_salesforce import Salesforce
-import requests
-from oauthlib.oauth2 import WebApplicationClient
-from requests_oauthlib import OAuth2Session
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Optional, Tuple, List, TYPE_CHECKING
 import re
+import uuid
 from utils import (
     validate_salesforce_credentials, get_user_details, format_user_display,
     extract_command_type, parse_create_user_command, parse_update_user_command,
-    parse_deactivate_user_command, validate_parsed_command, get_available_user_fields,
-    log_chat_history_to_file, get_connection_health, sanitize_string
+    parse_deactivate_user_command, parse_mass_deactivate_command, parse_permission_command, parse_audit_command, validate_parsed_command,
+    get_available_user_fields,
+    log_chat_history_to_file, get_connection_health, sanitize_string, build_user_lookup
+)
+from soql_cache import cached_query, invalidate_sobject, query_cache, get_org_id
+from soql_builder import SOQLTemplate, SOQLBindError
+from llm_batching import llm_batcher
+from write_optimizer import optimized_update, write_coalescer
+from preflight import get_identity_index, preflight_rows
+from audit import run_audit, format_audit_summary, DEFAULT_STALE_DAYS
+from permission_assignment import (
+    assign_permission_sets, remove_permission_sets, assign_user_field, format_assignment_result
+)
+from org_pool import OrgRegistry
+from transcript_store import transcript_store
+from mass_deactivation import (
+    preview_mass_deactivation, enqueue_mass_deactivation, deactivate_batch,
+    MASS_DEACTIVATE_JOB, DEFAULT_BATCH_SIZE
+)
+from job_queue import get_worker_pool
+
+# Heavy clients (openai, simple_salesforce, requests, pandas) are imported on first use
+# so they are not paid for before the first paint; see startup_benchmark.py
+if TYPE_CHECKING:
+    from simple_salesforce import Salesforce
+
+USER_DIRECTORY = SOQLTemplate(
+    "User", ["Id", "FirstName", "LastName", "Email", "Username", "IsActive",
+             "Title", "Department", "Phone", "MobilePhone"],
+    "IsActive = :active", {"active": bool}, order_by="LastName, FirstName", limit=200
 )
 
+# Background workers are shared by every session and drain the durable job queue
+worker_pool = get_worker_pool()
+worker_pool.register_handler(MASS_DEACTIVATE_JOB, deactivate_batch, batch_size=DEFAULT_BATCH_SIZE)
+
 # Page configuration
 st.set_page_config(
     page_title="SFDC AdminX - Salesforce LLM Chatbot",
@@ -22,6 +51,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Only the newest messages are kept in session state and rendered on each rerun
+HISTORY_WINDOW = 50
+HISTORY_PAGE_SIZE = 50
+
 # Custom CSS for rich UI
 st.markdown("""
 <style>
@@ -68,211 +101,45 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def create_salesforce_connection_oauth(url: str, consumer_key: str, consumer_secret: str) -> Optional[Salesforce]:
-    """Create Salesforce connection using OAuth 2.0 Client Credentials Flow"""
-    try:
-        # Determine the oauth token endpoint
-        if url.endswith('.my.salesforce.com') or url.endswith('.salesforce.com'):
-            token_url = url + '/services/oauth2/token'
-        else:
-            token_url = url.rstrip('/') + '/services/oauth2/token'
-
-        # OAuth 2.0 Client Credentials flow
-        data = {
-            'grant_type': 'client_credentials',
-            'client_id': consumer_key,
-            'client_secret': consumer_secret
-        }
-
-        response = requests.post(token_url, data=data, timeout=30)
-        response.raise_for_status()
-
-        token_data = response.json()
-        access_token = token_data['access_token']
-        instance_url = token_data['instance_url']
-
-        # Create Salesforce instance with access token as session_id
-        sf = Salesforce(instance_url=instance_url, session_id=access_token, client_id=consumer_key)
-        return sf
-    except Exception as e:
-        st.error(f"Failed to connect to Salesforce via OAuth: {str(e)}")
-        return None
-
 def parse_command_with_llm(command: str, api_key: str) -> dict:
     """Parse natural language command using LLM"""
-    try:
-        client = openai.OpenAI(api_key=api_key)
-
-        prompt = f"""
-You are an AI assistant that parses natural language commands related to Salesforce User administration.
-Convert the user's command into a structured JSON format.
-
-Available operations: create_user, update_user, deactivate_user
-
-For each operation, extract the following information:
-
-For create_user:
-{{"operation": "create_user", "firstName": "...", "lastName": "...", "email": "...", "username": "..." }}
-
-For update_user:
-{{"operation": "update_user", "user_id": "...", "updates": {{"field": "value", ...}} }}
-
-For deactivate_user:
-{{"operation": "deactivate_user", "user_id": "..." }}
-
-IMPORTANT: For "user_id" in update_user and deactivate_user operations, use the email address if an email is mentioned, otherwise use the user identifier provided.
-
-User command: "{command}"
-
-Respond with ONLY the JSON object, no additional text.
-
-Examples:
-
-Create user commands:
-Input: "Create a new user named John Doe with email john@example.com"
-Output: {{"operation": "create_user", "firstName": "John", "lastName": "Doe", "email": "john@example.com", "username": "john@example.com"}}
-
-Input: "Add employee Jane Smith, her email is jane.smith@company.com"
-Output: {{"operation": "create_user", "firstName": "Jane", "lastName": "Smith", "email": "jane.smith@company.com", "username": "jane.smith@company.com"}}
-
-Input: "Hire Bob Johnson with email bob@company.com as new user"
-Output: {{"operation": "create_user", "firstName": "Bob", "lastName": "Johnson", "email": "bob@company.com", "username": "bob@company.com"}}
-
-Input: "Create account for Sarah Wilson - sarah.wilson@email.org"
-Output: {{"operation": "create_user", "firstName": "Sarah", "lastName": "Wilson", "email": "sarah.wilson@email.org", "username": "sarah.wilson@email.org"}}
-
-Update user commands:
-Input: "Update user with email john@example.com to have last name Smith"
-Output: {{"operation": "update_user", "user_id": "john@example.com", "updates": {{"LastName": "Smith"}} }}
-
-Input: "Change John Doe's email to john.doe@newcompany.com"
-Output: {{"operation": "update_user", "user_id": "john@example.com", "updates": {{"Email": "john.doe@newcompany.com"}} }}
-
-Input: "Set the phone number for user jane@company.com to 555-1234"
-Output: {{"operation": "update_user", "user_id": "jane@company.com", "updates": {{"Phone": "555-1234"}} }}
-
-Input: "Update bob@company.com's department to Engineering"
-Output: {{"operation": "update_user", "user_id": "bob@company.com", "updates": {{"Department": "Engineering"}} }}
-
-Input: "Make sarah.wilson@org.com the manager, set her title to Senior Manager"
-Output: {{"operation": "update_user", "user_id": "sarah.wilson@org.com", "updates": {{"Title": "Senior Manager"}} }}
-
-Input: "Change mike@corp.com's city to San Francisco and state to CA"
-Output: {{"operation": "update_user", "user_id": "mike@corp.com", "updates": {{"City": "San Francisco", "State": "CA"}} }}
-
-Input: "Set john.doe@company.com's role to System Administrator"
-Output: {{"operation": "update_user", "user_id": "john.doe@company.com", "updates": {{"UserRoleId": "System Administrator"}} }}
-
-Input: "Change mary@org.com's time zone to Pacific Standard Time"
-Output: {{"operation": "update_user", "user_id": "mary@org.com", "updates": {{"TimeZoneSidKey": "America/Los_Angeles"}} }}
-
-Input: "Update bob.smith@enterprise.com's locale to English (United States)"
-Output: {{"operation": "update_user", "user_id": "bob.smith@enterprise.com", "updates": {{"LocaleSidKey": "en_US"}} }}
-
-Input: "Set sarah.jones@corp.com's manager to mike.wilson@corp.com"
-Output: {{"operation": "update_user", "user_id": "sarah.jones@corp.com", "updates": {{"ManagerId": "mike.wilson@corp.com"}} }}
-
-Input: "Change david.lee@startup.com's department to Sales"
-Output: {{"operation": "update_user", "user_id": "david.lee@startup.com", "updates": {{"Department": "Sales"}} }}
-
-Input: "Update lisa@company.com's phone to +1-555-0123"
-Output: {{"operation": "update_user", "user_id": "lisa@company.com", "updates": {{"Phone": "+1-555-0123"}} }}
-
-Input: "Set tom.brown@firm.com's mobile number to 555-0456"
-Output: {{"operation": "update_user", "user_id": "tom.brown@firm.com", "updates": {{"MobilePhone": "555-0456"}} }}
-
-Input: "Change jane.davis@tech.com's title to Senior Software Engineer"
-Output: {{"operation": "update_user", "user_id": "jane.davis@tech.com", "updates": {{"Title": "Senior Software Engineer"}} }}
-
-Input: "Update mark@agency.com's address - 123 Main St, Springfield, IL 62701"
-Output: {{"operation": "update_user", "user_id": "mark@agency.com", "updates": {{"Street": "123 Main St", "City": "Springfield", "State": "IL", "PostalCode": "62701"}} }}
-
-Input: "Set karen@consulting.com's country to Canada"
-Output: {{"operation": "update_user", "user_id": "karen@consulting.com", "updates": {{"Country": "Canada"}} }}
-
-Input: "Change steve@retail.com's employee number to EMP12345"
-Output: {{"operation": "update_user", "user_id": "steve@retail.com", "updates": {{"EmployeeNumber": "EMP12345"}} }}
-
-Input: "Update nancy@hr.com's start date to 2024-01-15"
-Output: {{"operation": "update_user", "user_id": "nancy@hr.com", "updates": {{"HireDate": "2024-01-15"}} }}
-
-Input: "Set paul@finance.com's currency to CAD"
-Output: {{"operation": "update_user", "user_id": "paul@finance.com", "updates": {{"DefaultCurrencyIsoCode": "CAD"}} }}
-
-Input: "Change rachel@marketing.com's language to French"
-Output: {{"operation": "update_user", "user_id": "rachel@marketing.com", "updates": {{"LanguageLocaleKey": "fr"}} }}
-
-Input: "Update chris@support.com's extension number to 1234"
-Output: {{"operation": "update_user", "user_id": "chris@support.com", "updates": {{"Extension": "1234"}} }}
-
-Input: "Set amy@operations.com's federation ID to AMY123"
-Output: {{"operation": "update_user", "user_id": "amy@operations.com", "updates": {{"FederationIdentifier": "AMY123"}} }}
-
-Input: "Change mike@engineering.com's company name to Tech Innovations Inc"
-Output: {{"operation": "update_user", "user_id": "mike@engineering.com", "updates": {{"CompanyName": "Tech Innovations Inc"}} }}
-
-Input: "Update sara@legal.com's division to Corporate"
-Output: {{"operation": "update_user", "user_id": "sara@legal.com", "updates": {{"Division": "Corporate"}} }}
-
-Input: "Set john@executive.com's employee type to Full-time"
-Output: {{"operation": "update_user", "user_id": "john@executive.com", "updates": {{"Employee_Type__c": "Full-time"}} }}
-
-Deactivate user commands:
-Input: "Deactivate the user john@example.com"
-Output: {{"operation": "deactivate_user", "user_id": "john@example.com"}}
-
-Input: "Remove user jane@company.com from the system"
-Output: {{"operation": "deactivate_user", "user_id": "jane@company.com"}}
-
-Input: "Disable account for bob@company.com"
-Output: {{"operation": "deactivate_user", "user_id": "bob@company.com"}}
-"""
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that parses Salesforce commands into structured JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,
-            max_tokens=500
-        )
-
-        result = response.choices[0].message.content.strip()
-        return json.loads(result)
-
-    except Exception as e:
-        st.error(f"Error parsing command: {str(e)}")
-        return {}
+    return parse_commands_with_llm_batched([command], api_key)[0]
+
+def parse_commands_with_llm_batched(commands: List[str], api_key: str) -> List[dict]:
+    """Parse commands through the shared micro-batcher; {} for any command that could not be parsed"""
+    futures = llm_batcher.submit_many(commands, api_key)
+    parsed = []
+    for future in futures:
+        try:
+            parsed.append(future.result())
+        except Exception as e:
+            st.error(f"Error parsing command: {str(e)}")
+            parsed.append({})
+    return parsed
 
 def generate_soql(parsed_command: dict) -> str:
-    """Generate SOQL query from parsed command"""
+    """Generate SOQL query from parsed command; raises SOQLBindError for a malformed user identifier"""
     operation = parsed_command.get("operation", "")
 
     if operation == "create_user":
         # For create_user, we don't need SOQL as we'll use the SOAP API
         return "INSERT User"
     elif operation == "deactivate_user":
-        user_id = parsed_command.get("user_id", "")
-        if "@" in user_id:
-            # Assume it's email
-            return f"SELECT Id, IsActive FROM User WHERE Email = '{user_id}'"
-        else:
-            # Assume it's user id
-            return f"SELECT Id, IsActive FROM User WHERE Id = '{user_id}'"
+        # Only the Id of the matched user is read
+        return build_user_lookup(parsed_command.get("user_id", ""), fields=[])
     elif operation == "update_user":
-        user_id = parsed_command.get("user_id", "")
-        if "@" in user_id:
-            return f"SELECT Id, Email FROM User WHERE Email = '{user_id}'"
-        else:
-            return f"SELECT Id, Email FROM User WHERE Id = '{user_id}'"
+        # Fetch the known updatable fields being changed, so unchanged values can be skipped;
+        # anything else is left to the update itself to accept or reject
+        updatable = {field.lower(): field for field in get_available_user_fields()}
+        update_fields = [updatable[f.lower()] for f in parsed_command.get("updates", {}) if f.lower() in updatable]
+        return build_user_lookup(parsed_command.get("user_id", ""), fields=update_fields)
     else:
         return ""
 
-def execute_soql(sf: Salesforce, soql: str) -> dict:
-    """Execute SOQL query"""
+def execute_soql(sf: Salesforce, soql: str, use_cache: bool = True) -> dict:
+    """Execute SOQL query, through the shared cache unless use_cache is False"""
     try:
-        result = sf.query(soql)
+        result = cached_query(sf, soql) if use_cache else sf.query(soql)
         return {"success": True, "records": result.get("records", []), "total_size": result.get("totalSize", 0)}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -294,6 +161,7 @@ def create_user_in_salesforce(sf: Salesforce, parsed_command: dict) -> dict:
         }
 
         result = sf.User.create(user_data)
+        invalidate_sobject(sf, "User")
         # Handle different response types from Salesforce API
         if isinstance(result, dict) and "success" in result:
             return {"success": result["success"], "id": result.get("id", "")}
@@ -306,32 +174,17 @@ def create_user_in_salesforce(sf: Salesforce, parsed_command: dict) -> dict:
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-def update_user_in_salesforce(sf: Salesforce, parsed_command: dict, user_id: str) -> dict:
-    """Update user in Salesforce"""
-    try:
-        updates = parsed_command.get("updates", {})
-
-        result = sf.User.update(user_id, updates)
-        # Handle different response types from Salesforce API
-        if isinstance(result, dict) and "success" in result:
-            return {"success": result["success"], "id": user_id}
-        elif isinstance(result, int):
-            # HTTP status codes - 2xx range indicates success
-            if 200 <= result < 300:
-                return {"success": True, "id": user_id}
-            else:
-                # Other status codes indicate error
-                return {"success": False, "error": f"HTTP {result}: Update failed"}
-        else:
-            # Assume success if not an error
-            return {"success": True, "id": user_id}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+def update_user_in_salesforce(sf: Salesforce, parsed_command: dict, user_id: str,
+                              current: Optional[dict] = None) -> dict:
+    """Update user in Salesforce, skipping fields that already hold the requested value"""
+    updates = parsed_command.get("updates", {})
+    return optimized_update(sf, "User", user_id, updates, current=current)
 
 def deactivate_user_in_salesforce(sf: Salesforce, user_id: str) -> dict:
     """Deactivate user in Salesforce"""
     try:
         result = sf.User.update(user_id, {"IsActive": False})
+        invalidate_sobject(sf, "User")
         # Handle different response types from Salesforce API
         if isinstance(result, dict) and "success" in result:
             return {"success": result["success"], "id": user_id}
@@ -344,16 +197,415 @@ def deactivate_user_in_salesforce(sf: Salesforce, user_id: str) -> dict:
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+def execute_parsed_command(sf: Salesforce, parsed_command: dict) -> str:
+    """Execute a validated single-user command against one org and return the chat response"""
+    operation = parsed_command.get("operation", "")
+
+    if operation == "create_user":
+        # Catch username and email collisions locally instead of after a failed insert
+        try:
+            identity_index = get_identity_index(sf)
+            check = preflight_rows(identity_index, [parsed_command])[0]
+        except Exception:
+            identity_index, check = None, None
+        if check and check["issues"]:
+            response = f"❌ Cannot create user: {'; '.join(check['issues'])}."
+            if check["suggested_username"]:
+                response += f"\n\n💡 Try the username **{check['suggested_username']}** instead."
+            return response
+
+        result = create_user_in_salesforce(sf, parsed_command)
+        if result["success"]:
+            if identity_index is not None:
+                identity_index.add(parsed_command.get("username") or parsed_command.get("email", ""),
+                                   parsed_command.get("email"))
+            # Get user details for confirmation
+            user_details = get_user_details(sf, result['id'])
+            if user_details["success"]:
+                return f"✅ User created successfully!\n\n{user_details['formatted']}"
+            return f"✅ User created successfully! ID: {result['id']}"
+        return f"❌ Failed to create user: {result.get('error', 'Unknown error')}"
+
+    if operation == "deactivate_user":
+        user_id = parsed_command.get("user_id", "")
+        # Sanitize user ID
+        safe_user_id = sanitize_string(user_id)
+
+        # Get user details first
+        try:
+            soql = generate_soql(parsed_command)
+        except SOQLBindError:
+            return f"❌ User not found: {safe_user_id} is neither an email address nor a user Id"
+        user_result = execute_soql(sf, soql)
+
+        if user_result["success"] and user_result["records"]:
+            actual_user_id = user_result["records"][0]["Id"]
+            result = deactivate_user_in_salesforce(sf, actual_user_id)
+            if result["success"]:
+                return f"✅ User deactivated successfully! User {user_id} has been disabled."
+            return f"❌ Failed to deactivate user: {result.get('error', 'Unknown error')}"
+        return f"❌ User not found: {safe_user_id}"
+
+    if operation == "update_user":
+        user_id = parsed_command.get("user_id", "")
+        safe_user_id = sanitize_string(user_id)
+
+        try:
+            soql = generate_soql(parsed_command)
+        except SOQLBindError:
+            return f"❌ User not found: {safe_user_id} is neither an email address nor a user Id"
+        # Read live values: a cached record could hide an edit made outside the app and skip a real update
+        user_result = execute_soql(sf, soql, use_cache=False)
+        if not user_result["success"]:
+            return f"❌ Failed to look up user {safe_user_id}: {user_result.get('error', 'Unknown error')}"
+
+        if user_result["records"]:
+            current_user = user_result["records"][0]
+            actual_user_id = current_user["Id"]
+            result = update_user_in_salesforce(sf, parsed_command, actual_user_id, current=current_user)
+            if result["success"] and not result["applied"]:
+                unchanged = ", ".join(result["unchanged"])
+                return f"ℹ️ No changes needed — {safe_user_id} already has the requested {unchanged}."
+            if result["success"]:
+                # Verify the update by querying the user again
+                updated_user_details = get_user_details(sf, actual_user_id)
+                if updated_user_details["success"]:
+                    # Make response more innovative and show verification
+                    updates_made = list(result["applied"].keys())
+                    update_summary = ", ".join(updates_made)
+                    response = f"🎉 **Mission Accomplished!** 🚀\n\n"
+                    response += f"✅ Successfully updated **{updated_user_details['user']['FirstName']} {updated_user_details['user']['LastName']}**\n"
+                    response += f"📝 **Changes Applied:** {update_summary}\n"
+                    if result["unchanged"]:
+                        response += f"⏭️ **Already Set:** {', '.join(result['unchanged'])}\n"
+                    response += "\n"
+                    response += f"**🔍 Verified Updated Details:**\n{updated_user_details['formatted']}\n\n"
+                    response += f"💡 *All changes have been saved and verified in Salesforce!*"
+                    return response
+                return f"✅ User updated successfully! (Could not verify details due to API limitations)"
+            return f"❌ Failed to update user: {result.get('error', 'Unknown error')}"
+        return f"❌ User not found: {safe_user_id}"
+
+    if operation in ("assign_permission_set", "remove_permission_set"):
+        action = assign_permission_sets if operation == "assign_permission_set" else remove_permission_sets
+        result = action(sf, parsed_command.get("users", []), parsed_command.get("permission_sets", []),
+                        parsed_command.get("permission_set_groups", []))
+        verb = "assign permission sets" if operation == "assign_permission_set" else "remove permission sets"
+        return format_assignment_result(result, verb)
+
+    if operation in ("assign_profile", "assign_role"):
+        kind = "profile" if operation == "assign_profile" else "role"
+        result = assign_user_field(sf, parsed_command.get("users", []), kind, parsed_command.get(kind, ""))
+        return format_assignment_result(result, f"assign {kind} {parsed_command.get(kind, '')}")
+
+    available_commands = [
+        "Create user [name] [email]",
+        "Update user [email] [field: value]",
+        "Deactivate user [email]",
+        "Deactivate users with no login in [N] days / in department [X] / with profile [Y]",
+        "Assign / remove permission set [name] to / from [users]",
+        "Assign profile / role [name] to [users]",
+        "Audit licenses and logins"
+    ]
+    return f"❌ Unsupported operation. Available commands:\n" + "\n".join(f"• {cmd}" for cmd in available_commands)
+
+def format_fan_out_response(results: Dict[str, dict]) -> str:
+    """Merge per-org results from a fan-out command into one chat response"""
+    succeeded = sum(1 for r in results.values() if r["success"] and not r["result"].startswith("❌"))
+    response = f"🌐 **Ran across {len(results)} orgs** ({succeeded} succeeded)\n\n"
+    for alias, result in results.items():
+        if result["success"]:
+            response += f"**[{alias}]** {result['result']}\n\n"
+        else:
+            response += f"**[{alias}]** ❌ Connection failed: {result['error']}\n\n"
+    return response.rstrip()
+
+def format_criteria(criteria: dict) -> str:
+    """Describe mass deactivation criteria in chat-friendly text"""
+    parts = []
+    if criteria.get("inactive_days"):
+        parts.append(f"no login in {criteria['inactive_days']} days")
+    if criteria.get("department"):
+        parts.append(f"department **{criteria['department']}**")
+    if criteria.get("profile"):
+        parts.append(f"profile **{criteria['profile']}**")
+    return ", ".join(parts) if parts else "the given criteria"
+
+def render_mass_deactivation_panel(registry: OrgRegistry):
+    """Show the dry-run preview and queue the deactivation as a background job once confirmed"""
+    pending = st.session_state.get("pending_mass_deactivation")
+    if not pending:
+        return
+
+    candidates = pending["candidates"]
+    sf = registry.get_connection(pending["alias"])
+    st.markdown(f"### 🧹 Mass Deactivation Preview — {pending['alias']} ({len(candidates)} users)")
+    preview_columns = [c for c in ["FirstName", "LastName", "Username", "Department", "Profile.Name", "LastLoginDate"]
+                       if c in candidates.columns]
+    st.dataframe(candidates[preview_columns], use_container_width=True)
+
+    col_confirm, col_cancel = st.columns(2)
+    with col_confirm:
+        if st.button(f"✅ Confirm deactivation of {len(candidates)} users", type="primary"):
+            job_id = enqueue_mass_deactivation(worker_pool.queue, sf, pending["criteria"], candidates["Id"].tolist())
+            st.session_state.pending_mass_deactivation = None
+            append_message("assistant", f"⚙️ Deactivation of {len(candidates)} users queued as job #{job_id}. "
+                                        f"Progress is shown under Background Jobs.")
+            st.rerun()
+    with col_cancel:
+        if st.button("✖️ Cancel"):
+            st.session_state.pending_mass_deactivation = None
+            append_message("assistant", "🛑 Mass deactivation cancelled. No users were changed.")
+            st.rerun()
+
+def format_job_summary(job: dict) -> str:
+    """Describe a finished background job for the chat"""
+    if job["state"] == "done":
+        response = f"✅ Job #{job['id']} complete: {job['succeeded']}/{job['total']} users deactivated."
+    else:
+        response = (f"❌ Job #{job['id']} {job['state']} after {job['completed']}/{job['total']} users"
+                    f"{': ' + job['error'] if job['error'] else ''}. Retry it to continue where it stopped.")
+    failures = worker_pool.queue.failures(job["id"])
+    if failures:
+        details = "\n".join(f"• {detail.get('id', key)}: {detail.get('error', 'Unknown error')}" for key, detail in failures)
+        response += f"\n\n❌ {job['failed']} failed:\n{details}"
+    return response
+
+@st.fragment(run_every=2)
+def render_jobs_panel():
+    """Live progress for background jobs; finished jobs are announced once in the chat"""
+    jobs = worker_pool.queue.recent(5)
+    if not jobs:
+        return
+
+    attached = set(worker_pool.attached_orgs())
+    st.markdown("### ⚙️ Background Jobs")
+    for job in jobs:
+        fraction = job["completed"] / job["total"] if job["total"] else 1.0
+        st.progress(fraction, text=f"#{job['id']} {job['description']} — {job['state']} "
+                                   f"({job['completed']}/{job['total']}, {job['failed']} failed)")
+        if job["state"] in ("queued", "running"):
+            if job["org_id"] not in attached:
+                st.caption(f"⏸️ Waiting for a connection to org {job['org_id']} to resume")
+            if st.button("✖️ Cancel job", key=f"cancel_job_{job['id']}"):
+                worker_pool.queue.cancel(job["id"])
+                st.rerun()
+        elif job["state"] in ("failed", "cancelled"):
+            if st.button("🔁 Retry remaining", key=f"retry_job_{job['id']}"):
+                worker_pool.queue.retry(job["id"])
+                st.rerun()
+
+    finished = [job for job in jobs if job["state"] in ("done", "failed")
+                and job["id"] not in st.session_state.announced_jobs]
+    if finished:
+        for job in finished:
+            st.session_state.announced_jobs.add(job["id"])
+            response = format_job_summary(job)
+            append_message("assistant", response)
+            log_chat_history_to_file(f"[job #{job['id']}]", response)
+        st.rerun()
+
+def render_preflight_results(sf: Salesforce, uploaded_file):
+    """Check an onboarding CSV against the org's identity index and show the findings"""
+    import pandas as pd
+
+    try:
+        frame = pd.read_csv(uploaded_file, dtype=str).fillna("")
+        columns = {c.lower(): c for c in frame.columns}
+        rows = [
+            {
+                "firstName": record.get(columns.get("firstname", ""), ""),
+                "lastName": record.get(columns.get("lastname", ""), ""),
+                "email": record.get(columns.get("email", ""), ""),
+                "username": record.get(columns.get("username", ""), ""),
+            }
+            for record in frame.to_dict("records")
+        ]
+        results = preflight_rows(get_identity_index(sf), rows)
+    except Exception as e:
+        st.error(f"❌ Pre-flight failed: {str(e)}")
+        return
+
+    flagged = [r for r in results if r["issues"]]
+    if not flagged:
+        st.success(f"✅ All {len(results)} rows are clear to create")
+        return
+    st.warning(f"⚠️ {len(flagged)} of {len(results)} rows need attention")
+    st.dataframe([
+        {
+            "Row": r["row"],
+            "Username": r["username"],
+            "Email": r["email"],
+            "Issues": "; ".join(r["issues"]),
+            "Suggested Username": r["suggested_username"] or "",
+        }
+        for r in flagged
+    ], use_container_width=True)
+
+def render_audit_panel():
+    """Show the detailed tables of the latest audit with CSV downloads"""
+    reports = st.session_state.get("audit_reports")
+    if not reports:
+        return
+
+    sections = [
+        ("stale", "💤 Stale accounts"),
+        ("never_logged_in", "🚫 Never logged in"),
+        ("license_utilization", "🎫 License utilization"),
+        ("manager_issues", "👔 Frozen or inactive managers"),
+    ]
+    for alias, report in reports.items():
+        with st.expander(f"📊 Audit report — {alias}", expanded=False):
+            tabs = st.tabs([title for _, title in sections])
+            for tab, (key, title) in zip(tabs, sections):
+                with tab:
+                    frame = report[key]
+                    st.dataframe(frame.head(500), use_container_width=True)
+                    st.download_button(f"⬇️ Download {len(frame)} rows", frame.to_csv(index=False),
+                                       file_name=f"{alias}_{key}.csv", mime="text/csv",
+                                       key=f"audit_{alias}_{key}")
+
+def process_command(command: str, parsed_command: dict, registry: OrgRegistry) -> str:
+    """Fall back to regex parsing if needed, validate, and run one command against the selected org(s)"""
+    # If LLM parsing fails, use fallback regex parsing
+    if not parsed_command:
+        command_type = extract_command_type(command)
+        if command_type == "create_user":
+            parsed_command = parse_create_user_command(command)
+        elif command_type == "update_user":
+            parsed_command = parse_update_user_command(command)
+        elif command_type == "deactivate_user":
+            parsed_command = parse_deactivate_user_command(command)
+        elif command_type == "mass_deactivate":
+            parsed_command = parse_mass_deactivate_command(command)
+        elif command_type == "audit":
+            parsed_command = parse_audit_command(command)
+        elif command_type in ("assign_permission_set", "remove_permission_set", "assign_profile", "assign_role"):
+            parsed_command = parse_permission_command(command)
+
+    # Validate parsed command
+    if parsed_command:
+        is_valid, validation_error = validate_parsed_command(parsed_command)
+        if not is_valid:
+            response = f"❌ Invalid command format: {validation_error}"
+            log_chat_history_to_file(command, response)
+            return response
+
+    if not parsed_command:
+        response = "❌ I couldn't understand your command. Please try rephrasing or using one of the example formats shown in the sidebar."
+    else:
+        # Execute command against the selected org(s)
+        operation = parsed_command.get("operation", "")
+        target_orgs = registry.resolve_targets(st.session_state.get("command_target") or st.session_state.active_org)
+
+        if not target_orgs:
+            response = "❌ No connected org matches the selected command target."
+
+        elif operation == "mass_deactivate":
+            if len(target_orgs) > 1:
+                response = "❌ Mass deactivation previews run against one org at a time. Select a single org as the command target."
+            else:
+                alias = target_orgs[0]
+                criteria = parsed_command.get("criteria", {})
+                preview = registry.run(alias, lambda sf: preview_mass_deactivation(sf, criteria))
+                if preview["success"]:
+                    candidates = preview["candidates"]
+                    excluded = preview["excluded"]
+                    st.session_state.pending_mass_deactivation = {
+                        "alias": alias,
+                        "criteria": criteria,
+                        "candidates": candidates
+                    }
+                    response = f"🔎 **Dry run:** {preview['total_matched']} active users match {format_criteria(criteria)}\n\n"
+                    response += f"🛡️ Excluded: {excluded['admins']} admins, {excluded['integration']} integration users, "
+                    response += f"{excluded['system']} system users, {excluded['allowlisted']} allowlisted\n\n"
+                    if preview["user_types"]:
+                        types = ", ".join(f"{count} {label}" for label, count in preview["user_types"].items())
+                        response += f"👥 Includes non-standard users: {types}\n\n"
+                    if len(candidates):
+                        response += f"⚠️ **{len(candidates)} users** would be deactivated. Review the preview below and confirm to proceed."
+                    else:
+                        response += "✅ Nothing to deactivate."
+                        st.session_state.pending_mass_deactivation = None
+                else:
+                    response = f"❌ Failed to find matching users: {preview.get('error', 'Unknown error')}"
+
+        elif operation == "audit":
+            stale_days = int(parsed_command.get("stale_days") or DEFAULT_STALE_DAYS)
+            full = bool(parsed_command.get("full"))
+            results = registry.fan_out(target_orgs, lambda sf: run_audit(sf, stale_days=stale_days, full=full))
+            # Keep the detailed tables for the report panel; the chat gets the headline numbers
+            st.session_state.audit_reports = {
+                alias: outcome["result"] for alias, outcome in results.items()
+                if outcome["success"] and outcome["result"]["success"]
+            }
+            summaries = {
+                alias: format_audit_summary(outcome["result"]) if outcome["success"]
+                else f"❌ Failed to reach org {alias}: {outcome['error']}"
+                for alias, outcome in results.items()
+            }
+            if len(summaries) > 1:
+                response = "\n\n".join(f"**{alias}:** {summary}" for alias, summary in summaries.items())
+            else:
+                response = summaries[target_orgs[0]]
+
+        elif len(target_orgs) > 1:
+            results = registry.fan_out(target_orgs, lambda sf: execute_parsed_command(sf, parsed_command))
+            response = format_fan_out_response(results)
+
+        else:
+            try:
+                response = registry.run(target_orgs[0], lambda sf: execute_parsed_command(sf, parsed_command))
+            except Exception as e:
+                response = f"❌ Failed to reach org {target_orgs[0]}: {str(e)}"
+
+    return response
+
+def get_transcript_session_id() -> str:
+    """Return the transcript id for this browser session, kept in the URL so it survives refreshes"""
+    session_id = st.query_params.get("sid")
+    if not session_id:
+        session_id = uuid.uuid4().hex
+        st.query_params["sid"] = session_id
+    return session_id
+
+def append_message(role: str, content: str):
+    """Persist a chat message and keep only the recent window in memory"""
+    message_id = transcript_store.append(st.session_state.transcript_session_id, role, content)
+    st.session_state.messages.append({"id": message_id, "role": role, "content": content})
+    del st.session_state.messages[:-HISTORY_WINDOW]
+
+def render_chat_message(message: dict) -> str:
+    """Render one chat message as an HTML block"""
+    if message["role"] == "user":
+        return f'<div class="chat-message user-message"><strong>You:</strong> {message["content"]}</div>'
+    return f'<div class="chat-message assistant-message"><strong>AdminX:</strong> {message["content"]}</div>'
+
 def main():
     # Main header
     st.markdown('<h1 class="main-header">⚡ SFDC AdminX</h1>', unsafe_allow_html=True)
     st.markdown("**Salesforce Administration Chatbot powered by LLM**")
 
     # Initialize session state
+    if 'transcript_session_id' not in st.session_state:
+        st.session_state.transcript_session_id = get_transcript_session_id()
     if 'messages' not in st.session_state:
-        st.session_state.messages = []
+        st.session_state.messages = transcript_store.recent(st.session_state.transcript_session_id, HISTORY_WINDOW)
+    if 'older_messages' not in st.session_state:
+        st.session_state.older_messages = []
     if 'salesforce_connected' not in st.session_state:
         st.session_state.salesforce_connected = False
+    if 'pending_mass_deactivation' not in st.session_state:
+        st.session_state.pending_mass_deactivation = None
+    if 'announced_jobs' not in st.session_state:
+        # Jobs that finished before this session started are not re-announced
+        st.session_state.announced_jobs = {job["id"] for job in worker_pool.queue.recent(5)
+                                           if job["state"] in ("done", "failed")}
+    if 'org_registry' not in st.session_state:
+        st.session_state.org_registry = OrgRegistry()
+    if 'active_org' not in st.session_state:
+        st.session_state.active_org = None
+    registry = st.session_state.org_registry
 
     # Sidebar configuration
     with st.sidebar:
@@ -376,6 +628,10 @@ def main():
                                       help="Connected app consumer key (Client ID)")
         sf_consumer_secret = st.text_input("Consumer Secret", type="password",
                                          help="Connected app consumer secret (Client Secret)")
+        sf_alias = st.text_input("Org Alias", placeholder="prod, uat-sandbox, ...",
+                               help="Name used to target this org; defaults to the My Domain name")
+        sf_groups = st.text_input("Org Groups", placeholder="sandboxes, emea",
+                                help="Comma-separated groups for running a command across several orgs")
 
         connect_button = st.button("🔗 Connect to Salesforce", type="primary")
 
@@ -388,39 +644,54 @@ def main():
                 st.error("❌ Instance URL must start with https://")
                 st.session_state.salesforce_connected = False
             else:
+                alias = sf_alias.strip() or sf_url.split("//", 1)[-1].split(".")[0]
+                registry.register(alias, sf_url, sf_consumer_key, sf_consumer_secret, sf_groups.split(","))
                 with st.spinner("Connecting to Salesforce via OAuth Client Credentials..."):
-                    sf = create_salesforce_connection_oauth(sf_url, sf_consumer_key, sf_consumer_secret)
+                    try:
+                        sf = registry.get_connection(alias)
+                    except Exception as e:
+                        st.error(f"Failed to connect to Salesforce via OAuth: {str(e)}")
+                        sf = None
                     if sf:
                         # Test connection health
                         health = get_connection_health(sf)
                         if health["healthy"]:
                             st.session_state.salesforce_connection = sf
+                            st.session_state.active_org = alias
+                            st.session_state.command_target = alias
                             st.session_state.salesforce_connected = True
-                            st.success(f"✅ Connected to Salesforce via OAuth Client Credentials! ({health['user_count']} users found)")
+                            worker_pool.attach_connection(get_org_id(sf), lambda alias=alias: registry.get_connection(alias))
+                            st.success(f"✅ Connected to Salesforce org **{alias}** via OAuth Client Credentials! ({health['user_count']} users found)")
                         else:
                             st.error(f"❌ OAuth connection successful but unhealthy: {health['error']}")
+                            sf = None
+                    if not sf:
+                        registry.remove(alias)
+                        if alias == st.session_state.active_org:
+                            st.session_state.active_org = None
                             st.session_state.salesforce_connected = False
-                    else:
-                        st.session_state.salesforce_connected = False
 
         # Connection status and user list
         if st.session_state.salesforce_connected:
-            st.markdown('<p class="status-success">● Connected to Salesforce</p>', unsafe_allow_html=True)
+            st.markdown(f'<p class="status-success">● Connected to Salesforce ({st.session_state.active_org})</p>', unsafe_allow_html=True)
+
+            # Multi-org targeting
+            if len(registry.aliases()) > 1:
+                with st.expander(f"🌐 Connected Orgs ({len(registry.aliases())})", expanded=False):
+                    st.dataframe(registry.describe(), use_container_width=True)
+            target_options = registry.target_options()
+            if st.session_state.get("command_target") not in target_options:
+                st.session_state.command_target = st.session_state.active_org
+            st.selectbox("🎯 Command Target", target_options, key="command_target",
+                         help="Run commands against one org, a group of orgs or every connected org")
 
             # User List Section
             with st.expander("👥 User Directory", expanded=False):
                 st.markdown("### 📋 Current Users")
                 try:
                     # Query all active users
-                    soql = """
-                    SELECT Id, FirstName, LastName, Email, Username, IsActive,
-                           Title, Department, Phone, MobilePhone
-                    FROM User
-                    WHERE IsActive = true
-                    ORDER BY LastName, FirstName
-                    LIMIT 200
-                    """
-                    user_result = st.session_state.salesforce_connection.query(soql)
+                    soql = USER_DIRECTORY.render(active=True)
+                    user_result = cached_query(st.session_state.salesforce_connection, soql)
 
                     if user_result["totalSize"] > 0:
                         # Prepare data for display
@@ -451,6 +722,25 @@ def main():
                 except Exception as e:
                     st.error(f"❌ Failed to load user directory: {str(e)}")
 
+            # Bulk onboarding pre-flight
+            with st.expander("🛫 Onboarding Pre-flight", expanded=False):
+                st.caption("Upload a CSV with FirstName, LastName, Email and optional Username columns "
+                           "to find collisions and duplicates before creating anyone.")
+                onboarding_file = st.file_uploader("Onboarding CSV", type=["csv"], key="onboarding_csv")
+                if onboarding_file is not None:
+                    render_preflight_results(st.session_state.salesforce_connection, onboarding_file)
+
+            cache_stats = query_cache.stats()
+            st.caption(f"🗄️ Query cache: {cache_stats['hit_rate']:.0%} hit rate "
+                       f"({cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+                       f"{cache_stats['entries']} entries)")
+            write_stats = write_coalescer.stats()
+            st.caption(f"✍️ Writes: {write_stats['dml_calls']} API calls for {write_stats['requested']} updates "
+                       f"({write_stats['calls_saved']} saved, {write_stats['fields_dropped']} unchanged fields skipped)")
+            llm_stats = llm_batcher.stats()
+            st.caption(f"🧠 Parsing: {llm_stats['requests']} LLM requests for {llm_stats['commands']} commands "
+                       f"({llm_stats['requests_saved']} saved by batching)")
+
         else:
             st.markdown('<p class="status-error">● Not Connected</p>', unsafe_allow_html=True)
 
@@ -463,11 +753,17 @@ def main():
         - Create a new user [name, email]
         - Update user [email/id] [field: value]
         - Deactivate user [email/id]
+        - Deactivate users matching [criteria]
+        - Assign or remove permission sets / groups [users]
+        - Assign profile or role [users]
+        - Audit licenses and logins
 
         **Examples:**
         - "Create user John Doe john@email.com"
         - "Update user john@email.com to have last name Smith"
         - "Deactivate user john@email.com"
+        - "Deactivate users with no login in 90 days"
+        - "Assign permission set Sales_Console to ann@corp.com, raj@corp.com"
         """)
 
         # Available User Fields
@@ -482,7 +778,9 @@ def main():
 
     with col2:
         if st.button("🗑️ Clear Chat"):
+            transcript_store.clear(st.session_state.transcript_session_id)
             st.session_state.messages = []
+            st.session_state.older_messages = []
             st.rerun()
 
     # Display chat messages
@@ -491,18 +789,34 @@ def main():
     with chat_container:
         st.markdown("### 💬 Chat History")
 
-        for message in st.session_state.messages:
-            if message["role"] == "user":
-                st.markdown(f'<div class="chat-message user-message"><strong>You:</strong> {message["content"]}</div>',
-                          unsafe_allow_html=True)
+        # Older pages are only fetched from the transcript store on request
+        loaded = st.session_state.older_messages + st.session_state.messages
+        if loaded and st.button("⬆️ Load older messages"):
+            older_page = transcript_store.before(st.session_state.transcript_session_id, loaded[0]["id"], HISTORY_PAGE_SIZE)
+            if older_page:
+                st.session_state.older_messages = older_page + st.session_state.older_messages
             else:
-                st.markdown(f'<div class="chat-message assistant-message"><strong>AdminX:</strong> {message["content"]}</div>',
+                st.info("No older messages")
+
+        if st.session_state.older_messages:
+            with st.expander(f"🕘 Earlier messages ({len(st.session_state.older_messages)})", expanded=True):
+                st.markdown("\n\n".join(render_chat_message(m) for m in st.session_state.older_messages),
                           unsafe_allow_html=True)
 
-    # Chat input
+        if st.session_state.messages:
+            st.markdown("\n\n".join(render_chat_message(m) for m in st.session_state.messages),
+                      unsafe_allow_html=True)
+
+    # Confirmation for criteria-based deactivation and progress of queued jobs
+    if st.session_state.salesforce_connected:
+        render_mass_deactivation_panel(registry)
+        render_audit_panel()
+    render_jobs_panel()
+
+    # Chat input; a pasted block runs one command per line
     st.markdown("---")
-    chat_input = st.text_input("Enter your command:", key="chat_input",
-                              placeholder="Type a user administration command...")
+    chat_input = st.text_area("Enter your command:", key="chat_input", height=80,
+                              placeholder="Type a user administration command, or paste several, one per line...")
     send_button = st.button("📤 Send", type="primary")
 
     if send_button and chat_input.strip():
@@ -514,112 +828,17 @@ def main():
             st.error("Please connect to Salesforce first")
             return
 
-        # Add user message
-        st.session_state.messages.append({"role": "user", "content": chat_input})
-
-        # Process command
-        with st.spinner("Processing your command..."):
-            # Try LLM parsing first
-            parsed_command = parse_command_with_llm(chat_input, api_key)
-
-            # If LLM parsing fails, use fallback regex parsing
-            if not parsed_command:
-                command_type = extract_command_type(chat_input)
-                if command_type == "create_user":
-                    parsed_command = parse_create_user_command(chat_input)
-                elif command_type == "update_user":
-                    parsed_command = parse_update_user_command(chat_input)
-                elif command_type == "deactivate_user":
-                    parsed_command = parse_deactivate_user_command(chat_input)
-
-            # Validate parsed command
-            if parsed_command:
-                is_valid, validation_error = validate_parsed_command(parsed_command)
-                if not is_valid:
-                    response = f"❌ Invalid command format: {validation_error}"
-                    # Add assistant response and skip further processing
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                    log_chat_history_to_file(chat_input, response)
-                    st.rerun()
-                    return
-
-            if not parsed_command:
-                response = "❌ I couldn't understand your command. Please try rephrasing or using one of the example formats shown in the sidebar."
-            else:
-                # Execute command
-                operation = parsed_command.get("operation", "")
-                sf = st.session_state.salesforce_connection
-
-                if operation == "create_user":
-                    result = create_user_in_salesforce(sf, parsed_command)
-                    if result["success"]:
-                        # Get user details for confirmation
-                        user_details = get_user_details(sf, result['id'])
-                        if user_details["success"]:
-                            response = f"✅ User created successfully!\n\n{user_details['formatted']}"
-                        else:
-                            response = f"✅ User created successfully! ID: {result['id']}"
-                    else:
-                        response = f"❌ Failed to create user: {result.get('error', 'Unknown error')}"
-
-                elif operation == "deactivate_user":
-                    user_id = parsed_command.get("user_id", "")
-                    # Sanitize user ID
-                    safe_user_id = sanitize_string(user_id)
-
-                    # Get user details first
-                    soql = generate_soql(parsed_command)
-                    user_result = execute_soql(sf, soql)
-
-                    if user_result["success"] and user_result["records"]:
-                        actual_user_id = user_result["records"][0]["Id"]
-                        result = deactivate_user_in_salesforce(sf, actual_user_id)
-                        if result["success"]:
-                            response = f"✅ User deactivated successfully! User {user_id} has been disabled."
-                        else:
-                            response = f"❌ Failed to deactivate user: {result.get('error', 'Unknown error')}"
-                    else:
-                        response = f"❌ User not found: {safe_user_id}"
-
-                elif operation == "update_user":
-                    user_id = parsed_command.get("user_id", "")
-                    safe_user_id = sanitize_string(user_id)
-
-                    soql = generate_soql(parsed_command)
-                    user_result = execute_soql(sf, soql)
-
-                    if user_result["success"] and user_result["records"]:
-                        actual_user_id = user_result["records"][0]["Id"]
-                        result = update_user_in_salesforce(sf, parsed_command, actual_user_id)
-                        if result["success"]:
-                            # Verify the update by querying the user again
-                            updated_user_details = get_user_details(sf, actual_user_id)
-                            if updated_user_details["success"]:
-                                # Make response more innovative and show verification
-                                updates_made = list(parsed_command.get("updates", {}).keys())
-                                update_summary = ", ".join(updates_made)
-                                response = f"🎉 **Mission Accomplished!** 🚀\n\n"
-                                response += f"✅ Successfully updated **{updated_user_details['user']['FirstName']} {updated_user_details['user']['LastName']}**\n"
-                                response += f"📝 **Changes Applied:** {update_summary}\n\n"
-                                response += f"**🔍 Verified Updated Details:**\n{updated_user_details['formatted']}\n\n"
-                                response += f"💡 *All changes have been saved and verified in Salesforce!*"
-                            else:
-                                response = f"✅ User updated successfully! (Could not verify details due to API limitations)"
-                        else:
-                            response = f"❌ Failed to update user: {result.get('error', 'Unknown error')}"
-                    else:
-                        response = f"❌ User not found: {safe_user_id}"
+        commands = [line.strip() for line in chat_input.splitlines() if line.strip()]
 
-                else:
-                    available_commands = [
-                        "Create user [name] [email]",
-                        "Update user [email] [field: value]",
-                        "Deactivate user [email]"
-                    ]
-                    response = f"❌ Unsupported operation. Available commands:\n" + "\n".join(f"• {cmd}" for cmd in available_commands)
-
-        # Add assistant response
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        # Process commands
+        with st.spinner("Processing your command..." if len(commands) == 1 else f"Processing {len(commands)} commands..."):
+            # Every line of the block is parsed in one batched LLM request
+            parsed_commands = parse_commands_with_llm_batched(commands, api_key)
+
+            for command, parsed_command in zip(commands, parsed_commands):
+                append_message("user", command)
+                response = process_command(command, parsed_command, registry)
+                append_message("assistant", response)
 
         # Rerun to update the display
         st.rerun()
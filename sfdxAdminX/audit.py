@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import os
+import datetime
+from typing import Dict, Any, Optional, Iterator, List, TYPE_CHECKING
+from soql_cache import get_org_id
+from soql_builder import SOQLTemplate
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+AUDIT_CACHE_DIR = ".adminx_audit_cache"
+
+DEFAULT_STALE_DAYS = 90
+LOGIN_HISTORY_DAYS = 30
+
+USER_FIELDS = [
+    "Id", "Username", "Name", "IsActive", "UserType", "LastLoginDate", "CreatedDate",
+    "ManagerId", "Profile.Name", "Profile.UserLicense.Name", "SystemModstamp"
+]
+LOGIN_FIELDS = ["Id", "UserId", "LoginTime", "Status"]
+
+DATETIME_COLUMNS = ["LastLoginDate", "CreatedDate", "SystemModstamp", "LoginTime"]
+
+ALL_USERS = SOQLTemplate("User", USER_FIELDS)
+CHANGED_USERS = SOQLTemplate("User", USER_FIELDS, "SystemModstamp > :since", {"since": datetime.datetime})
+LOGINS_SINCE = SOQLTemplate("LoginHistory", LOGIN_FIELDS, "LoginTime >= :since", {"since": datetime.datetime})
+LOGINS_AFTER = SOQLTemplate("LoginHistory", LOGIN_FIELDS, "LoginTime > :since", {"since": datetime.datetime})
+FROZEN_LOGINS = SOQLTemplate("UserLogin", ["UserId"], "IsFrozen = :frozen", {"frozen": bool})
+LICENSES = SOQLTemplate("UserLicense", ["Name", "TotalLicenses", "UsedLicenses"])
+
+
+def _stream_records(sf, soql: str, bulk_sobject: Optional[str] = None) -> Iterator[List[dict]]:
+    """
+    Stream query results in chunks: through the Bulk API for full pulls, paginated REST for deltas
+    """
+    if bulk_sobject:
+        yield from getattr(sf.bulk, bulk_sobject).query(soql, lazy_operation=True)
+        return
+    chunk = []
+    for record in sf.query_all_iter(soql):
+        chunk.append(record)
+        if len(chunk) >= 2000:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _to_frame(chunks: Iterator[List[dict]], columns: List[str]) -> pd.DataFrame:
+    """
+    Flatten streamed records into one DataFrame with parsed UTC datetimes
+    """
+    import pandas as pd
+
+    frames = [pd.json_normalize(chunk) for chunk in chunks if chunk]
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    frame = frame.drop(columns=[c for c in frame.columns if c.endswith("attributes.type")
+                                or c.endswith("attributes.url") or c.endswith(".attributes")
+                                or c == "attributes"])
+    for column in columns:
+        if column not in frame.columns:
+            frame[column] = None
+    for column in DATETIME_COLUMNS:
+        if column in frame.columns:
+            values = frame[column]
+            # The Bulk API returns datetimes as epoch milliseconds, REST as ISO strings
+            if pd.api.types.is_numeric_dtype(values):
+                frame[column] = pd.to_datetime(values, unit="ms", utc=True)
+            else:
+                frame[column] = pd.to_datetime(values, utc=True, errors="coerce", format="ISO8601")
+    return frame[columns]
+
+
+def _cache_path(org_id: str) -> str:
+    return os.path.join(AUDIT_CACHE_DIR, f"{org_id}.pkl")
+
+
+def load_audit_cache(org_id: str) -> Optional[dict]:
+    import pandas as pd
+
+    path = _cache_path(org_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_pickle(path)
+    except Exception:
+        return None
+
+
+def save_audit_cache(org_id: str, cache: dict):
+    import pandas as pd
+
+    os.makedirs(AUDIT_CACHE_DIR, exist_ok=True)
+    tmp_path = _cache_path(org_id) + ".tmp"
+    pd.to_pickle(cache, tmp_path)
+    os.replace(tmp_path, _cache_path(org_id))
+
+
+def sync_org_snapshot(sf, login_days: int = LOGIN_HISTORY_DAYS, full: bool = False) -> dict:
+    """
+    Bring the cached users and login history of an org up to date.
+    The first run streams every user through the Bulk API; later runs pull only
+    users changed since the newest SystemModstamp and logins after the newest LoginTime,
+    and move each user's LastLoginDate up to their newest successful login.
+    Returns: {"users", "logins", "frozen_ids", "licenses", "delta_users", "delta_logins", "full"}
+    """
+    import pandas as pd
+
+    org_id = get_org_id(sf)
+    cache = None if full else load_audit_cache(org_id)
+    now = pd.Timestamp.now(tz="UTC")
+    login_cutoff = now - pd.Timedelta(days=login_days)
+
+    if cache is None:
+        users = _to_frame(_stream_records(sf, ALL_USERS.render(), bulk_sobject="User"), USER_FIELDS)
+        logins = _to_frame(_stream_records(sf, LOGINS_SINCE.render(since=login_cutoff)), LOGIN_FIELDS)
+        delta_users, delta_logins = len(users), len(logins)
+    else:
+        users, logins = cache["users"], cache["logins"]
+        changed = _to_frame(_stream_records(
+            sf, CHANGED_USERS.render(since=cache["users_synced_to"])), USER_FIELDS)
+        new_logins = _to_frame(_stream_records(
+            sf, LOGINS_AFTER.render(since=cache["logins_synced_to"])), LOGIN_FIELDS)
+        delta_users, delta_logins = len(changed), len(new_logins)
+        if delta_users:
+            users = pd.concat([users, changed], ignore_index=True).drop_duplicates("Id", keep="last")
+        if delta_logins:
+            logins = pd.concat([logins, new_logins], ignore_index=True).drop_duplicates("Id", keep="last")
+            # A login doesn't bump SystemModstamp, so carry each user's newest successful login over by hand
+            successes = new_logins[new_logins["Status"].eq("Success")]
+            latest = users["Id"].map(successes.groupby("UserId")["LoginTime"].max())
+            newer = latest.notna() & ~(users["LastLoginDate"] >= latest)
+            users = users.assign(LastLoginDate=users["LastLoginDate"].where(~newer, latest))
+
+    logins = logins[logins["LoginTime"] >= login_cutoff].reset_index(drop=True)
+    users = users.reset_index(drop=True)
+
+    # Frozen logins and license counts are small; always read them fresh
+    frozen = sf.query_all(FROZEN_LOGINS.render(frozen=True)).get("records", [])
+    licenses = pd.json_normalize(sf.query_all(LICENSES.render()).get("records", []))
+    licenses = licenses.drop(columns=[c for c in licenses.columns if c.startswith("attributes")])
+
+    previous = cache or {}
+    save_audit_cache(org_id, {
+        "users": users,
+        "logins": logins,
+        "users_synced_to": users["SystemModstamp"].max() if len(users) else previous.get("users_synced_to", login_cutoff),
+        "logins_synced_to": logins["LoginTime"].max() if len(logins) else previous.get("logins_synced_to", login_cutoff),
+    })
+
+    return {
+        "users": users,
+        "logins": logins,
+        "frozen_ids": [record["UserId"] for record in frozen],
+        "licenses": licenses,
+        "delta_users": delta_users,
+        "delta_logins": delta_logins,
+        "full": cache is None,
+    }
+
+
+def analyze_org(users: pd.DataFrame, logins: pd.DataFrame, frozen_ids: List[str],
+                licenses: pd.DataFrame, stale_days: int = DEFAULT_STALE_DAYS,
+                now: Optional[pd.Timestamp] = None) -> Dict[str, Any]:
+    """
+    Compute the audit findings with column operations only, no per-user loops.
+    Returns DataFrames for stale accounts, never-logged-in users, license utilization
+    by profile and license, users reporting to frozen or inactive managers, plus a summary.
+    """
+    import numpy as np
+    import pandas as pd
+
+    now = now or pd.Timestamp.now(tz="UTC")
+    stale_cutoff = now - pd.Timedelta(days=stale_days)
+
+    active = users["IsActive"].astype(str).str.lower().eq("true").to_numpy()
+    last_login = users["LastLoginDate"]
+    never_logged_in = active & last_login.isna().to_numpy()
+    # New accounts get the same grace period before they count as stale
+    stale = active & np.where(last_login.isna(), users["CreatedDate"] < stale_cutoff, last_login < stale_cutoff)
+
+    days_since_login = ((now - last_login).dt.days).astype("Int64")
+
+    # Login history: successful logins and failures per user over the window
+    succeeded = logins["Status"].eq("Success")
+    login_counts = logins.assign(ok=succeeded, failed=~succeeded).groupby("UserId")[["ok", "failed"]].sum()
+    users_logins = users["Id"].map(login_counts["ok"]).fillna(0).astype(int)
+    users_failed = users["Id"].map(login_counts["failed"]).fillna(0).astype(int)
+
+    report_columns = ["Id", "Username", "Name", "Profile.Name", "LastLoginDate"]
+    stale_frame = users.loc[stale, report_columns].assign(DaysSinceLogin=days_since_login[stale],
+                                                          RecentLogins=users_logins[stale],
+                                                          FailedLogins=users_failed[stale])
+    stale_frame = stale_frame.sort_values("DaysSinceLogin", ascending=False, na_position="first")
+    never_frame = users.loc[never_logged_in, ["Id", "Username", "Name", "Profile.Name", "CreatedDate"]]
+
+    # Utilization: active users per profile against the licenses that profile consumes
+    by_profile = (users.loc[active]
+                  .groupby(["Profile.UserLicense.Name", "Profile.Name"], dropna=False)
+                  .size().rename("ActiveUsers").reset_index()
+                  .rename(columns={"Profile.UserLicense.Name": "License", "Profile.Name": "Profile"}))
+    if len(licenses):
+        license_table = licenses.rename(columns={"Name": "License"})
+        license_table["Utilization"] = (license_table["UsedLicenses"]
+                                        / license_table["TotalLicenses"].replace(0, np.nan)).round(3)
+        by_profile = by_profile.merge(license_table, on="License", how="left")
+    by_profile = by_profile.sort_values("ActiveUsers", ascending=False)
+
+    # Managers: look up each user's manager through an Id-indexed Series instead of a join per row
+    manager_active = users["ManagerId"].map(users.set_index("Id")["IsActive"].astype(str).str.lower().eq("true"))
+    has_manager = users["ManagerId"].notna().to_numpy()
+    manager_frozen = users["ManagerId"].isin(frozen_ids).to_numpy()
+    bad_manager = active & has_manager & (manager_frozen | manager_active.eq(False).to_numpy())
+    managers = users.loc[bad_manager, ["Id", "Username", "Name", "ManagerId"]].assign(
+        ManagerState=np.where(manager_frozen[bad_manager], "frozen", "inactive"))
+
+    summary = {
+        "users": int(len(users)),
+        "active": int(active.sum()),
+        "stale": int(stale.sum()),
+        "never_logged_in": int(never_logged_in.sum()),
+        "frozen": int(users["Id"].isin(frozen_ids).sum()),
+        "bad_managers": int(bad_manager.sum()),
+        "logins": int(succeeded.sum()),
+        "failed_logins": int((~succeeded).sum()),
+        "stale_days": stale_days,
+    }
+    return {
+        "summary": summary,
+        "stale": stale_frame.reset_index(drop=True),
+        "never_logged_in": never_frame.reset_index(drop=True),
+        "license_utilization": by_profile.reset_index(drop=True),
+        "manager_issues": managers.reset_index(drop=True),
+    }
+
+
+def run_audit(sf, stale_days: int = DEFAULT_STALE_DAYS, full: bool = False) -> dict:
+    """
+    Sync the org snapshot and analyze it.
+    Returns the analysis plus sync and timing details, or {"success": False, "error"}.
+    """
+    try:
+        started = datetime.datetime.now()
+        snapshot = sync_org_snapshot(sf, full=full)
+        synced = datetime.datetime.now()
+        report = analyze_org(snapshot["users"], snapshot["logins"], snapshot["frozen_ids"],
+                             snapshot["licenses"], stale_days=stale_days)
+        report.update({
+            "success": True,
+            "full_sync": snapshot["full"],
+            "delta_users": snapshot["delta_users"],
+            "delta_logins": snapshot["delta_logins"],
+            "sync_seconds": (synced - started).total_seconds(),
+            "analysis_seconds": (datetime.datetime.now() - synced).total_seconds(),
+        })
+        return report
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def format_audit_summary(report: dict) -> str:
+    """
+    Format the audit headline numbers for display in chat
+    """
+    if not report["success"]:
+        return f"❌ Audit failed: {report.get('error', 'Unknown error')}"
+
+    summary = report["summary"]
+    sync = "full sync" if report["full_sync"] else f"{report['delta_users']} changed users, {report['delta_logins']} new logins"
+    response = f"📊 **Org audit** — {summary['users']} users ({summary['active']} active)\n\n"
+    response += f"• 💤 Stale (no login in {summary['stale_days']} days): **{summary['stale']}**\n"
+    response += f"• 🚫 Never logged in: **{summary['never_logged_in']}**\n"
+    response += f"• 🧊 Frozen users: **{summary['frozen']}**\n"
+    response += f"• 👔 Active users under frozen or inactive managers: **{summary['bad_managers']}**\n"
+    response += f"• 🔑 Logins in the last {LOGIN_HISTORY_DAYS} days: {summary['logins']} ({summary['failed_logins']} failed)\n\n"
+
+    top_profiles = report["license_utilization"].head(5)
+    if len(top_profiles):
+        response += "**License use by profile:**\n"
+        for row in top_profiles.to_dict("records"):
+            utilization = row.get("Utilization")
+            license_note = f" — license {utilization:.0%} used" if isinstance(utilization, float) and utilization == utilization else ""
+            response += f"• {row['Profile']} ({row['License']}): {row['ActiveUsers']} active{license_note}\n"
+        response += "\n"
+
+    response += f"⏱️ {sync} in {report['sync_seconds']:.1f}s, analysis in {report['analysis_seconds']:.2f}s"
+    return response
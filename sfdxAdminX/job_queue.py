@@ -0,0 +1,351 @@
+import json
+import time
+import uuid
+import sqlite3
+import datetime
+import threading
+from typing import Dict, Any, Optional, Callable, List
+
+JOB_DB = "adminx_jobs.db"
+
+# A running job whose worker stops heart-beating for this long is handed to another worker
+LEASE_SECONDS = 60
+# Workers renew their lease this often while a handler runs, so a slow batch keeps its job
+HEARTBEAT_SECONDS = LEASE_SECONDS / 3
+POLL_INTERVAL = 1.0
+DEFAULT_WORKERS = 2
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+class JobQueue:
+    """
+    Durable job queue backed by SQLite.
+
+    A job is a batch of records (e.g. user Ids) to process for one org. Every
+    record keeps its own state and result, so a job interrupted by a rerun,
+    closed tab or process restart resumes with only the unfinished records.
+    """
+
+    def __init__(self, db_path: str = JOB_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                org_id TEXT NOT NULL,
+                description TEXT,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued', -- queued, running, done, failed, cancelled
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                total INTEGER NOT NULL DEFAULT 0,
+                succeeded INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                lease_owner TEXT,
+                lease_expires REAL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_items (
+                job_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                record_key TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending', -- pending, done, failed
+                result TEXT,
+                PRIMARY KEY (job_id, seq)
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, id);
+            CREATE INDEX IF NOT EXISTS idx_job_items_pending ON job_items (job_id, state, seq);
+        """)
+
+    def enqueue(self, kind: str, org_id: str, record_keys: List[str], payload: Optional[dict] = None,
+                description: str = "", max_attempts: int = 3) -> int:
+        """
+        Persist a new job with one item per record and return its id
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(
+                    """INSERT INTO jobs (kind, org_id, description, payload, max_attempts, total, created_at, updated_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (kind, org_id, description, json.dumps(payload or {}), max_attempts, len(record_keys), _now(), _now())
+                )
+                job_id = cursor.lastrowid
+                self._conn.executemany(
+                    "INSERT INTO job_items (job_id, seq, record_key) VALUES (?, ?, ?)",
+                    [(job_id, seq, key) for seq, key in enumerate(record_keys)]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def claim(self, worker_id: str, org_ids: List[str], kinds: List[str]) -> Optional[dict]:
+        """
+        Atomically lease the oldest runnable job for one of the given orgs.
+        Running jobs whose lease has expired are runnable again.
+        """
+        if not org_ids or not kinds:
+            return None
+        org_marks = ", ".join("?" for _ in org_ids)
+        kind_marks = ", ".join("?" for _ in kinds)
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                f"""UPDATE jobs
+                    SET state = 'running', lease_owner = ?, lease_expires = ?,
+                        attempts = attempts + 1, updated_at = ?
+                    WHERE id = (
+                        SELECT id FROM jobs
+                        WHERE (state = 'queued' OR (state = 'running' AND lease_expires < ?))
+                          AND org_id IN ({org_marks}) AND kind IN ({kind_marks})
+                        ORDER BY id LIMIT 1
+                    )
+                    RETURNING *""",
+                (worker_id, now + LEASE_SECONDS, _now(), now, *org_ids, *kinds)
+            ).fetchall()
+        return self._job_dict(rows[0]) if rows else None
+
+    def pending_items(self, job_id: int, limit: int) -> List[tuple]:
+        """
+        Return up to `limit` unfinished (seq, record_key) pairs of a job
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, record_key FROM job_items WHERE job_id = ? AND state = 'pending' ORDER BY seq LIMIT ?",
+                (job_id, limit)
+            ).fetchall()
+        return [(row["seq"], row["record_key"]) for row in rows]
+
+    def renew_lease(self, job_id: int, worker_id: str) -> bool:
+        """
+        Extend a running job's lease.
+        Returns False if the job was cancelled or another worker took it over.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                """UPDATE jobs SET lease_expires = ?, updated_at = ?
+                   WHERE id = ? AND lease_owner = ? AND state = 'running'""",
+                (time.time() + LEASE_SECONDS, _now(), job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def record_results(self, job_id: int, worker_id: str, results: List[tuple]) -> bool:
+        """
+        Store per-record results as (seq, success, detail) and renew the lease.
+        Returns False if the job was cancelled or another worker took it over.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                owner = self._conn.execute(
+                    "SELECT lease_owner, state FROM jobs WHERE id = ?", (job_id,)
+                ).fetchone()
+                if owner is None or owner["lease_owner"] != worker_id or owner["state"] != "running":
+                    self._conn.execute("ROLLBACK")
+                    return False
+                self._conn.executemany(
+                    "UPDATE job_items SET state = ?, result = ? WHERE job_id = ? AND seq = ?",
+                    [("done" if success else "failed", json.dumps(detail), job_id, seq)
+                     for seq, success, detail in results]
+                )
+                self._conn.execute(
+                    """UPDATE jobs SET
+                           succeeded = (SELECT COUNT(*) FROM job_items WHERE job_id = ? AND state = 'done'),
+                           failed = (SELECT COUNT(*) FROM job_items WHERE job_id = ? AND state = 'failed'),
+                           lease_expires = ?, updated_at = ?
+                       WHERE id = ?""",
+                    (job_id, job_id, time.time() + LEASE_SECONDS, _now(), job_id)
+                )
+                self._conn.execute("COMMIT")
+                return True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def finish(self, job_id: int, worker_id: str):
+        """
+        Mark a job done once it has no pending items left
+        """
+        with self._lock:
+            self._conn.execute(
+                """UPDATE jobs SET state = 'done', lease_owner = NULL, lease_expires = NULL, updated_at = ?
+                   WHERE id = ? AND lease_owner = ? AND state = 'running'""",
+                (_now(), job_id, worker_id)
+            )
+
+    def release(self, job_id: int, worker_id: str, error: str):
+        """
+        Give a job back after an error; it is retried until max_attempts is reached
+        """
+        with self._lock:
+            self._conn.execute(
+                """UPDATE jobs SET
+                       state = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                       error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?
+                   WHERE id = ? AND lease_owner = ? AND state = 'running'""",
+                (error, _now(), job_id, worker_id)
+            )
+
+    def cancel(self, job_id: int):
+        with self._lock:
+            self._conn.execute(
+                """UPDATE jobs SET state = 'cancelled', lease_owner = NULL, updated_at = ?
+                   WHERE id = ? AND state IN ('queued', 'running')""",
+                (_now(), job_id)
+            )
+
+    def retry(self, job_id: int):
+        """
+        Re-queue a failed job; records that already finished are not repeated
+        """
+        with self._lock:
+            self._conn.execute(
+                """UPDATE jobs SET state = 'queued', attempts = 0, error = NULL, updated_at = ?
+                   WHERE id = ? AND state IN ('failed', 'cancelled')""",
+                (_now(), job_id)
+            )
+
+    def get(self, job_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job_dict(row) if row else None
+
+    def recent(self, limit: int = 10) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._job_dict(row) for row in rows]
+
+    def failures(self, job_id: int, limit: int = 20) -> List[tuple]:
+        """
+        Return (record_key, detail) for failed records of a job
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record_key, result FROM job_items WHERE job_id = ? AND state = 'failed' ORDER BY seq LIMIT ?",
+                (job_id, limit)
+            ).fetchall()
+        return [(row["record_key"], json.loads(row["result"])) for row in rows]
+
+    @staticmethod
+    def _job_dict(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["completed"] = job["succeeded"] + job["failed"]
+        return job
+
+
+class WorkerPool:
+    """
+    Background threads that drain the job queue.
+
+    Handlers are registered per job kind and receive (sf, job, items) where
+    items is a list of (seq, record_key); they return (seq, success, detail)
+    per item. Jobs only run while a connection factory for their org is
+    attached, so queued work waits until a session reconnects that org.
+    """
+
+    def __init__(self, queue: JobQueue, num_workers: int = DEFAULT_WORKERS):
+        self.queue = queue
+        self.num_workers = num_workers
+        self._handlers: Dict[str, tuple] = {}
+        self._connections: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def register_handler(self, kind: str, handler: Callable, batch_size: int = 200):
+        with self._lock:
+            self._handlers[kind] = (handler, batch_size)
+
+    def attach_connection(self, org_id: str, connect: Callable[[], Any]):
+        """
+        Make an org available to the workers; `connect` returns a live client
+        """
+        with self._lock:
+            self._connections[org_id] = connect
+
+    def attached_orgs(self) -> List[str]:
+        with self._lock:
+            return list(self._connections)
+
+    def start(self):
+        """
+        Start the worker threads once; later calls are no-ops
+        """
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.num_workers):
+                thread = threading.Thread(target=self._work, name=f"adminx-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        worker_id = f"{uuid.uuid4().hex[:8]}"
+        while True:
+            with self._lock:
+                org_ids = list(self._connections)
+                kinds = list(self._handlers)
+            job = self.queue.claim(worker_id, org_ids, kinds)
+            if job is None:
+                time.sleep(POLL_INTERVAL)
+                continue
+            self._run_job(worker_id, job)
+
+    def _heartbeat(self, worker_id: str, job_id: int, stop: threading.Event):
+        while not stop.wait(HEARTBEAT_SECONDS):
+            if not self.queue.renew_lease(job_id, worker_id):
+                return
+
+    def _run_job(self, worker_id: str, job: dict):
+        with self._lock:
+            handler, batch_size = self._handlers[job["kind"]]
+            connect = self._connections[job["org_id"]]
+        # Keep the lease alive however long a single batch takes
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(worker_id, job["id"], stop),
+                                     name=f"adminx-heartbeat-{job['id']}", daemon=True)
+        heartbeat.start()
+        try:
+            sf = connect()
+            while True:
+                items = self.queue.pending_items(job["id"], batch_size)
+                if not items:
+                    self.queue.finish(job["id"], worker_id)
+                    return
+                results = handler(sf, job, items)
+                if not self.queue.record_results(job["id"], worker_id, results):
+                    # Cancelled or taken over by another worker
+                    return
+        except Exception as e:
+            self.queue.release(job["id"], worker_id, str(e))
+        finally:
+            stop.set()
+            heartbeat.join()
+
+
+_pool_lock = threading.Lock()
+_worker_pool: Optional[WorkerPool] = None
+
+
+def get_worker_pool() -> WorkerPool:
+    """
+    Return the process-wide worker pool, creating and starting it on first use
+    """
+    global _worker_pool
+    with _pool_lock:
+        if _worker_pool is None:
+            _worker_pool = WorkerPool(JobQueue())
+            _worker_pool.start()
+        return _worker_pool
@@ -0,0 +1,326 @@
+import json
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Callable
+
+# Commands arriving within this window share one LLM request
+BATCH_WINDOW = 0.01
+MAX_BATCH_SIZE = 20
+
+LLM_MODEL = "gpt-3.5-turbo"
+MAX_TOKENS_PER_COMMAND = 300
+
+# Few-shot instructions sent once per request, however many commands it carries
+COMMAND_PARSING_PROMPT = """
+You are an AI assistant that parses natural language commands related to Salesforce User administration.
+Convert each of the user's commands into a structured JSON object.
+
+Available operations: create_user, update_user, deactivate_user, mass_deactivate,
+assign_permission_set, remove_permission_set, assign_profile, assign_role, audit
+
+For each operation, extract the following information:
+
+For create_user:
+{"operation": "create_user", "firstName": "...", "lastName": "...", "email": "...", "username": "..." }
+
+For update_user:
+{"operation": "update_user", "user_id": "...", "updates": {"field": "value", ...} }
+
+For deactivate_user:
+{"operation": "deactivate_user", "user_id": "..." }
+
+For mass_deactivate (deactivate every user matching criteria; include only the criteria mentioned):
+{"operation": "mass_deactivate", "criteria": {"inactive_days": 90, "department": "...", "profile": "...", "allowlist": ["..."], "integration_users": ["..."]} }
+
+For assign_permission_set and remove_permission_set (any number of users, permission sets and permission set groups):
+{"operation": "assign_permission_set", "users": ["..."], "permission_sets": ["..."], "permission_set_groups": ["..."]}
+
+For assign_profile and assign_role (any number of users):
+{"operation": "assign_profile", "users": ["..."], "profile": "..."}
+{"operation": "assign_role", "users": ["..."], "role": "..."}
+
+For audit (org-wide license and login report; include stale_days only if mentioned, full only if a fresh full pull is asked for):
+{"operation": "audit", "stale_days": 90, "full": false}
+
+IMPORTANT: For "user_id" in update_user and deactivate_user operations, use the email address if an email is mentioned, otherwise use the user identifier provided.
+
+Examples:
+
+Create user commands:
+Input: "Create a new user named John Doe with email john@example.com"
+Output: {"operation": "create_user", "firstName": "John", "lastName": "Doe", "email": "john@example.com", "username": "john@example.com"}
+
+Input: "Add employee Jane Smith, her email is jane.smith@company.com"
+Output: {"operation": "create_user", "firstName": "Jane", "lastName": "Smith", "email": "jane.smith@company.com", "username": "jane.smith@company.com"}
+
+Input: "Hire Bob Johnson with email bob@company.com as new user"
+Output: {"operation": "create_user", "firstName": "Bob", "lastName": "Johnson", "email": "bob@company.com", "username": "bob@company.com"}
+
+Input: "Create account for Sarah Wilson - sarah.wilson@email.org"
+Output: {"operation": "create_user", "firstName": "Sarah", "lastName": "Wilson", "email": "sarah.wilson@email.org", "username": "sarah.wilson@email.org"}
+
+Update user commands:
+Input: "Update user with email john@example.com to have last name Smith"
+Output: {"operation": "update_user", "user_id": "john@example.com", "updates": {"LastName": "Smith"} }
+
+Input: "Change John Doe's email to john.doe@newcompany.com"
+Output: {"operation": "update_user", "user_id": "john@example.com", "updates": {"Email": "john.doe@newcompany.com"} }
+
+Input: "Set the phone number for user jane@company.com to 555-1234"
+Output: {"operation": "update_user", "user_id": "jane@company.com", "updates": {"Phone": "555-1234"} }
+
+Input: "Update bob@company.com's department to Engineering"
+Output: {"operation": "update_user", "user_id": "bob@company.com", "updates": {"Department": "Engineering"} }
+
+Input: "Make sarah.wilson@org.com the manager, set her title to Senior Manager"
+Output: {"operation": "update_user", "user_id": "sarah.wilson@org.com", "updates": {"Title": "Senior Manager"} }
+
+Input: "Change mike@corp.com's city to San Francisco and state to CA"
+Output: {"operation": "update_user", "user_id": "mike@corp.com", "updates": {"City": "San Francisco", "State": "CA"} }
+
+Input: "Change mary@org.com's time zone to Pacific Standard Time"
+Output: {"operation": "update_user", "user_id": "mary@org.com", "updates": {"TimeZoneSidKey": "America/Los_Angeles"} }
+
+Input: "Update bob.smith@enterprise.com's locale to English (United States)"
+Output: {"operation": "update_user", "user_id": "bob.smith@enterprise.com", "updates": {"LocaleSidKey": "en_US"} }
+
+Input: "Set sarah.jones@corp.com's manager to mike.wilson@corp.com"
+Output: {"operation": "update_user", "user_id": "sarah.jones@corp.com", "updates": {"ManagerId": "mike.wilson@corp.com"} }
+
+Input: "Change david.lee@startup.com's department to Sales"
+Output: {"operation": "update_user", "user_id": "david.lee@startup.com", "updates": {"Department": "Sales"} }
+
+Input: "Update lisa@company.com's phone to +1-555-0123"
+Output: {"operation": "update_user", "user_id": "lisa@company.com", "updates": {"Phone": "+1-555-0123"} }
+
+Input: "Set tom.brown@firm.com's mobile number to 555-0456"
+Output: {"operation": "update_user", "user_id": "tom.brown@firm.com", "updates": {"MobilePhone": "555-0456"} }
+
+Input: "Change jane.davis@tech.com's title to Senior Software Engineer"
+Output: {"operation": "update_user", "user_id": "jane.davis@tech.com", "updates": {"Title": "Senior Software Engineer"} }
+
+Input: "Update mark@agency.com's address - 123 Main St, Springfield, IL 62701"
+Output: {"operation": "update_user", "user_id": "mark@agency.com", "updates": {"Street": "123 Main St", "City": "Springfield", "State": "IL", "PostalCode": "62701"} }
+
+Input: "Set karen@consulting.com's country to Canada"
+Output: {"operation": "update_user", "user_id": "karen@consulting.com", "updates": {"Country": "Canada"} }
+
+Input: "Change steve@retail.com's employee number to EMP12345"
+Output: {"operation": "update_user", "user_id": "steve@retail.com", "updates": {"EmployeeNumber": "EMP12345"} }
+
+Input: "Update nancy@hr.com's start date to 2024-01-15"
+Output: {"operation": "update_user", "user_id": "nancy@hr.com", "updates": {"HireDate": "2024-01-15"} }
+
+Input: "Set paul@finance.com's currency to CAD"
+Output: {"operation": "update_user", "user_id": "paul@finance.com", "updates": {"DefaultCurrencyIsoCode": "CAD"} }
+
+Input: "Change rachel@marketing.com's language to French"
+Output: {"operation": "update_user", "user_id": "rachel@marketing.com", "updates": {"LanguageLocaleKey": "fr"} }
+
+Input: "Update chris@support.com's extension number to 1234"
+Output: {"operation": "update_user", "user_id": "chris@support.com", "updates": {"Extension": "1234"} }
+
+Input: "Set amy@operations.com's federation ID to AMY123"
+Output: {"operation": "update_user", "user_id": "amy@operations.com", "updates": {"FederationIdentifier": "AMY123"} }
+
+Input: "Change mike@engineering.com's company name to Tech Innovations Inc"
+Output: {"operation": "update_user", "user_id": "mike@engineering.com", "updates": {"CompanyName": "Tech Innovations Inc"} }
+
+Input: "Update sara@legal.com's division to Corporate"
+Output: {"operation": "update_user", "user_id": "sara@legal.com", "updates": {"Division": "Corporate"} }
+
+Input: "Set john@executive.com's employee type to Full-time"
+Output: {"operation": "update_user", "user_id": "john@executive.com", "updates": {"Employee_Type__c": "Full-time"} }
+
+Deactivate user commands:
+Input: "Deactivate the user john@example.com"
+Output: {"operation": "deactivate_user", "user_id": "john@example.com"}
+
+Input: "Remove user jane@company.com from the system"
+Output: {"operation": "deactivate_user", "user_id": "jane@company.com"}
+
+Input: "Disable account for bob@company.com"
+Output: {"operation": "deactivate_user", "user_id": "bob@company.com"}
+
+Mass deactivate commands:
+Input: "Deactivate all users who haven't logged in for 90 days"
+Output: {"operation": "mass_deactivate", "criteria": {"inactive_days": 90} }
+
+Input: "Disable stale users in the Sales department with no login in 60 days, except ceo@company.com"
+Output: {"operation": "mass_deactivate", "criteria": {"inactive_days": 60, "department": "Sales", "allowlist": ["ceo@company.com"]} }
+
+Input: "Deactivate everyone on the Chatter Free User profile"
+Output: {"operation": "mass_deactivate", "criteria": {"profile": "Chatter Free User"} }
+
+Permission, profile and role commands:
+Input: "Give ann@corp.com and raj@corp.com the Sales_Console and Report_Builder permission sets"
+Output: {"operation": "assign_permission_set", "users": ["ann@corp.com", "raj@corp.com"], "permission_sets": ["Sales_Console", "Report_Builder"], "permission_set_groups": []}
+
+Input: "Remove the Support Agent permission set group from lee@corp.com"
+Output: {"operation": "remove_permission_set", "users": ["lee@corp.com"], "permission_sets": [], "permission_set_groups": ["Support Agent"]}
+
+Input: "Set the profile of ann@corp.com and raj@corp.com to Standard User"
+Output: {"operation": "assign_profile", "users": ["ann@corp.com", "raj@corp.com"], "profile": "Standard User"}
+
+Input: "Set john.doe@company.com's role to VP Sales"
+Output: {"operation": "assign_role", "users": ["john.doe@company.com"], "role": "VP Sales"}
+
+Audit commands:
+Input: "Run a license and login audit, stale means 60 days"
+Output: {"operation": "audit", "stale_days": 60}
+"""
+
+
+class BatchMismatchError(ValueError):
+    """
+    The LLM reply doesn't line up one-to-one with the commands it was sent
+    """
+
+
+def build_batch_prompt(commands: List[str]) -> str:
+    """
+    Append numbered commands to the shared instructions and ask for one JSON array back
+    """
+    numbered = "\n".join(f"{index}. {json.dumps(command)}" for index, command in enumerate(commands, start=1))
+    return (
+        f"{COMMAND_PARSING_PROMPT}\n"
+        f"User commands:\n{numbered}\n\n"
+        f"Respond with ONLY a JSON array containing exactly {len(commands)} objects, one per command in the same order. "
+        f"Add an \"index\" key to every object holding the number of the command it parses. "
+        f"Use {{\"index\": n}} for command n if you cannot parse it. No additional text."
+    )
+
+
+def match_batch_reply(parsed, count: int) -> List[dict]:
+    """
+    Check that a reply holds exactly one object per command, each echoing its command's number.
+    Returns the objects without their index; raises BatchMismatchError otherwise.
+    """
+    if isinstance(parsed, dict) and count == 1:
+        parsed = [parsed]
+    if not isinstance(parsed, list):
+        raise BatchMismatchError("LLM reply was not a JSON array")
+    if len(parsed) != count:
+        raise BatchMismatchError(f"LLM reply had {len(parsed)} items for {count} commands")
+    results = []
+    for position, item in enumerate(parsed, start=1):
+        if not isinstance(item, dict) or item.get("index") != position:
+            raise BatchMismatchError(f"LLM reply item {position} does not belong to command {position}")
+        results.append({key: value for key, value in item.items() if key != "index"})
+    return results
+
+
+def parse_commands_with_llm(commands: List[str], api_key: str) -> List[dict]:
+    """
+    Parse several natural language commands with a single LLM request.
+    Returns one parsed command per input, {} where the model gave nothing usable.
+    Raises on API errors, and BatchMismatchError unless the reply lines up with the commands.
+    """
+    import openai
+
+    client = openai.OpenAI(api_key=api_key)
+    response = client.chat.completions.create(
+        model=LLM_MODEL,
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant that parses Salesforce commands into structured JSON."},
+            {"role": "user", "content": build_batch_prompt(commands)}
+        ],
+        temperature=0.1,
+        max_tokens=min(4000, MAX_TOKENS_PER_COMMAND * len(commands) + 200)
+    )
+
+    return match_batch_reply(json.loads(response.choices[0].message.content.strip()), len(commands))
+
+
+class LLMMicroBatcher:
+    """
+    Gathers parse requests into shared LLM calls.
+
+    The first command opens a short window; commands submitted by any session
+    with the same API key before it closes (or until the batch is full) go out
+    in one request, and each caller gets back its own parsed command. If the
+    reply doesn't line up with the batch, nothing from it is used and every
+    command is parsed again in a request of its own.
+    """
+
+    def __init__(self, parse_batch: Callable[[List[str], str], List[dict]] = parse_commands_with_llm,
+                 window: float = BATCH_WINDOW, max_batch_size: int = MAX_BATCH_SIZE):
+        self.parse_batch = parse_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[str, List[tuple]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"commands": 0, "requests": 0}
+
+    def submit(self, command: str, api_key: str) -> Future:
+        """
+        Queue one command and return a future resolving to its parsed dict
+        """
+        return self.submit_many([command], api_key)[0]
+
+    def submit_many(self, commands: List[str], api_key: str) -> List[Future]:
+        """
+        Queue several commands, e.g. the lines of a pasted block, so they share requests
+        """
+        futures = []
+        full_batches = []
+        with self._lock:
+            for command in commands:
+                future = Future()
+                futures.append(future)
+                batch = self._pending.get(api_key)
+                if batch is None:
+                    batch = self._pending[api_key] = []
+                    timer = threading.Timer(self.window, self._flush_key, args=(api_key, batch))
+                    timer.daemon = True
+                    timer.start()
+                batch.append((command, future))
+                self._stats["commands"] += 1
+                if len(batch) >= self.max_batch_size:
+                    # Full batches go out now instead of waiting for the window
+                    del self._pending[api_key]
+                    full_batches.append(batch)
+        for batch in full_batches:
+            threading.Thread(target=self._run_batch, args=(api_key, batch), daemon=True).start()
+        return futures
+
+    def stats(self) -> dict:
+        """
+        Return how many commands were parsed and how many LLM requests that took
+        """
+        with self._lock:
+            return {**self._stats, "requests_saved": self._stats["commands"] - self._stats["requests"]}
+
+    def _flush_key(self, api_key: str, batch: List[tuple]):
+        with self._lock:
+            # The batch may already have been sent because it filled up
+            if self._pending.get(api_key) is not batch:
+                return
+            del self._pending[api_key]
+        self._run_batch(api_key, batch)
+
+    def _run_batch(self, api_key: str, batch: List[tuple]):
+        with self._lock:
+            self._stats["requests"] += 1
+        try:
+            results = self.parse_batch([command for command, _ in batch], api_key)
+            if len(results) != len(batch):
+                raise BatchMismatchError(f"Parser returned {len(results)} results for {len(batch)} commands")
+        except BatchMismatchError as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # Misaligned results could apply a command to the wrong user, so none are used
+            for command, future in batch:
+                self._run_batch(api_key, [(command, future)])
+            return
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+# Process-wide batcher shared by every Streamlit session
+llm_batcher = LLMMicroBatcher()
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Optional, Iterator, List, TYPE_CHECKING
+from soql_cache import get_org_id, invalidate_sobject
+from soql_builder import SOQLTemplate, DateLiteral
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_BATCH_SIZE = 200
+MASS_DEACTIVATE_JOB = "mass_deactivate"
+
+CANDIDATE_FIELDS = [
+    "Id", "FirstName", "LastName", "Email", "Username", "Department", "UserType",
+    "LastLoginDate", "Profile.Name", "Profile.PermissionsModifyAllData", "Profile.PermissionsApiUserOnly"
+]
+
+ADMIN_PROFILES = {"system administrator"}
+
+# Integration accounts that don't sit on an API-only profile, by username
+INTEGRATION_USERNAMES = set()
+
+# Users the platform runs itself; they never log in and can't be deactivated
+SYSTEM_USER_TYPES = {"Guest", "AutomatedProcess"}
+
+# Display labels for the other non-Standard UserType values, which stay in the review
+USER_TYPE_LABELS = {
+    "PowerPartner": "partner",
+    "PowerCustomerSuccess": "customer community plus",
+    "CustomerSuccess": "customer community",
+    "CspLitePortal": "high-volume portal",
+    "SelfService": "self-service portal",
+    "CsnOnly": "Chatter only",
+}
+
+
+@lru_cache(maxsize=None)
+def _candidate_template(by_login: bool, by_department: bool, by_profile: bool) -> SOQLTemplate:
+    """
+    Compile the candidate query once per combination of criteria
+    """
+    conditions = ["IsActive = true"]
+    binds = {}
+    if by_login:
+        conditions.append("(LastLoginDate < :inactive_since OR LastLoginDate = null)")
+        binds["inactive_since"] = DateLiteral
+    if by_department:
+        conditions.append("Department = :department")
+        binds["department"] = str
+    if by_profile:
+        conditions.append("Profile.Name = :profile")
+        binds["profile"] = str
+    return SOQLTemplate("User", CANDIDATE_FIELDS, " AND ".join(conditions), binds)
+
+
+def build_candidate_soql(criteria: dict) -> str:
+    """
+    Build the SOQL selecting active users that match the deactivation criteria.
+    Supported criteria: inactive_days, department, profile.
+    """
+    inactive_days = criteria.get("inactive_days")
+    department = criteria.get("department")
+    profile = criteria.get("profile")
+
+    binds = {}
+    if inactive_days:
+        binds["inactive_since"] = f"LAST_N_DAYS:{int(inactive_days)}"
+    if department:
+        binds["department"] = str(department)
+    if profile:
+        binds["profile"] = str(profile)
+    return _candidate_template(bool(inactive_days), bool(department), bool(profile)).render(**binds)
+
+
+def stream_matching_users(sf, criteria: dict) -> Iterator[List[dict]]:
+    """
+    Stream matching users through the Bulk API in result-sized chunks
+    """
+    soql = build_candidate_soql(criteria)
+    for chunk in sf.bulk.User.query(soql, lazy_operation=True):
+        yield chunk
+
+
+def apply_exclusions(users: pd.DataFrame, allowlist: Optional[list] = None,
+                     integration_users: Optional[list] = None) -> tuple:
+    """
+    Drop admins, integration, system and allowlisted users in one vectorized pass.
+    Integration users are those on an API-only profile or named in
+    INTEGRATION_USERNAMES / `integration_users`; portal and community users stay in.
+    Returns: (candidates, excluded_counts)
+    """
+    import pandas as pd
+
+    if users.empty:
+        return users, {"admins": 0, "integration": 0, "system": 0, "allowlisted": 0}
+
+    def column(name: str, default: Any = "") -> pd.Series:
+        if name in users.columns:
+            return users[name].fillna(default)
+        return pd.Series(default, index=users.index)
+
+    profile_name = column("Profile.Name").astype(str).str.lower()
+    username = column("Username").astype(str).str.lower()
+    email = column("Email").astype(str).str.lower()
+    user_type = column("UserType", "Standard").astype(str)
+    modify_all = column("Profile.PermissionsModifyAllData", False).astype(str).str.lower() == "true"
+    api_only = column("Profile.PermissionsApiUserOnly", False).astype(str).str.lower() == "true"
+
+    integration_names = {name.strip().lower() for name in [*INTEGRATION_USERNAMES, *(integration_users or [])]
+                         if name and name.strip()}
+
+    is_admin = profile_name.isin(ADMIN_PROFILES) | modify_all
+    is_integration = (api_only | username.isin(integration_names)) & ~is_admin
+    is_system = user_type.isin(SYSTEM_USER_TYPES) & ~is_admin & ~is_integration
+
+    allowed = {entry.strip().lower() for entry in (allowlist or []) if entry and entry.strip()}
+    is_allowlisted = (username.isin(allowed) | email.isin(allowed)) & ~is_admin & ~is_integration & ~is_system
+
+    excluded = is_admin | is_integration | is_system | is_allowlisted
+    excluded_counts = {
+        "admins": int(is_admin.sum()),
+        "integration": int(is_integration.sum()),
+        "system": int(is_system.sum()),
+        "allowlisted": int(is_allowlisted.sum()),
+    }
+    return users[~excluded].reset_index(drop=True), excluded_counts
+
+
+def count_user_types(users: pd.DataFrame) -> dict:
+    """
+    Count non-Standard users by display label, e.g. {"partner": 3}
+    """
+    if users.empty or "UserType" not in users.columns:
+        return {}
+    types = users["UserType"].fillna("Standard").astype(str)
+    types = types[types != "Standard"]
+    return types.map(lambda value: USER_TYPE_LABELS.get(value, value)).value_counts().to_dict()
+
+
+def preview_mass_deactivation(sf, criteria: dict) -> dict:
+    """
+    Dry run: collect the matching users and apply exclusions without any DML
+    """
+    import pandas as pd
+
+    try:
+        frames = [pd.json_normalize(chunk) for chunk in stream_matching_users(sf, criteria) if chunk]
+        users = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=CANDIDATE_FIELDS)
+        users = users.drop(columns=[c for c in users.columns if c.endswith("attributes.type")
+                                    or c.endswith("attributes.url")])
+        candidates, excluded = apply_exclusions(users, criteria.get("allowlist"), criteria.get("integration_users"))
+        return {
+            "success": True,
+            "total_matched": len(users),
+            "candidates": candidates,
+            "excluded": excluded,
+            "user_types": count_user_types(candidates),
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def enqueue_mass_deactivation(queue, sf, criteria: dict, user_ids: list) -> int:
+    """
+    Record a confirmed run as a durable background job before any DML is issued
+    """
+    return queue.enqueue(
+        MASS_DEACTIVATE_JOB, get_org_id(sf), list(user_ids),
+        payload={"criteria": criteria},
+        description=f"Deactivate {len(user_ids)} users"
+    )
+
+
+def deactivate_batch(sf, job: dict, items: list) -> list:
+    """
+    Job handler: deactivate one batch of users through the Bulk API.
+    Receives (seq, user_id) items and returns (seq, success, detail) per user.
+    """
+    records = [{"Id": user_id, "IsActive": False} for _, user_id in items]
+    try:
+        batch_results = sf.bulk.User.update(records, batch_size=len(records))
+    finally:
+        invalidate_sobject(sf, "User")
+
+    results = []
+    for (seq, user_id), result in zip(items, batch_results):
+        if result.get("success"):
+            results.append((seq, True, {"id": user_id}))
+        else:
+            errors = result.get("errors") or ["Unknown error"]
+            results.append((seq, False, {"id": user_id, "error": "; ".join(str(e) for e in errors)}))
+    return results
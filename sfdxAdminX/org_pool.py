@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, List, TYPE_CHECKING
+from soql_cache import get_org_id
+
+if TYPE_CHECKING:
+    from simple_salesforce import Salesforce
+
+ALL_ORGS = "All orgs"
+GROUP_PREFIX = "Group: "
+
+# Salesforce sessions default to a 2 hour timeout; refresh well before that
+SESSION_MAX_AGE = 3600
+MAX_FAN_OUT_WORKERS = 8
+
+
+def authenticate_org(url: str, consumer_key: str, consumer_secret: str) -> Salesforce:
+    """
+    Authenticate with the OAuth 2.0 Client Credentials flow.
+    Raises on any HTTP or token error.
+    """
+    import requests
+    from simple_salesforce import Salesforce
+
+    # Determine the oauth token endpoint
+    if url.endswith('.my.salesforce.com') or url.endswith('.salesforce.com'):
+        token_url = url + '/services/oauth2/token'
+    else:
+        token_url = url.rstrip('/') + '/services/oauth2/token'
+
+    # OAuth 2.0 Client Credentials flow
+    data = {
+        'grant_type': 'client_credentials',
+        'client_id': consumer_key,
+        'client_secret': consumer_secret
+    }
+
+    response = requests.post(token_url, data=data, timeout=30)
+    response.raise_for_status()
+
+    token_data = response.json()
+    access_token = token_data['access_token']
+    instance_url = token_data['instance_url']
+
+    # Create Salesforce instance with access token as session_id
+    sf = Salesforce(instance_url=instance_url, session_id=access_token, client_id=consumer_key)
+    # The identity URL ends in /id/<org Id>/<user Id>; the org Id keys the shared query cache
+    identity_parts = token_data.get('id', '').rstrip('/').split('/')
+    if len(identity_parts) >= 2:
+        sf.adminx_org_id = identity_parts[-2]
+    return sf
+
+
+class OrgRegistry:
+    """
+    Pool of authenticated Salesforce clients for many orgs.
+
+    Orgs are registered under an alias with optional group names. Clients are
+    created lazily, reused across commands and re-authenticated once their
+    session is old or has expired.
+    """
+
+    def __init__(self, session_max_age: float = SESSION_MAX_AGE):
+        self.session_max_age = session_max_age
+        self._orgs: Dict[str, dict] = {}
+        self._lock = threading.RLock()
+
+    def register(self, alias: str, url: str, consumer_key: str, consumer_secret: str,
+                 groups: Optional[List[str]] = None):
+        """
+        Add or replace an org; any pooled client for the alias is dropped
+        """
+        with self._lock:
+            self._orgs[alias] = {
+                "url": url,
+                "consumer_key": consumer_key,
+                "consumer_secret": consumer_secret,
+                "groups": sorted({g.strip() for g in (groups or []) if g.strip()}),
+                "connection": None,
+                "connected_at": 0.0,
+                "lock": threading.Lock(),
+            }
+
+    def remove(self, alias: str):
+        with self._lock:
+            self._orgs.pop(alias, None)
+
+    def aliases(self) -> List[str]:
+        with self._lock:
+            return sorted(self._orgs)
+
+    def groups(self) -> List[str]:
+        with self._lock:
+            return sorted({group for org in self._orgs.values() for group in org["groups"]})
+
+    def describe(self) -> List[dict]:
+        """
+        Summarize registered orgs for display
+        """
+        with self._lock:
+            return [
+                {
+                    "alias": alias,
+                    "url": org["url"],
+                    "groups": ", ".join(org["groups"]),
+                    "connected": org["connection"] is not None,
+                }
+                for alias, org in sorted(self._orgs.items())
+            ]
+
+    def target_options(self) -> List[str]:
+        """
+        Options for a target selector: each org, each group, then every org
+        """
+        options = self.aliases() + [f"{GROUP_PREFIX}{group}" for group in self.groups()]
+        if len(self._orgs) > 1:
+            options.append(ALL_ORGS)
+        return options
+
+    def resolve_targets(self, target: str) -> List[str]:
+        """
+        Expand an alias, a group option or the all-orgs option into aliases
+        """
+        with self._lock:
+            if target == ALL_ORGS:
+                return sorted(self._orgs)
+            if target.startswith(GROUP_PREFIX):
+                group = target[len(GROUP_PREFIX):]
+                return sorted(alias for alias, org in self._orgs.items() if group in org["groups"])
+            return [target] if target in self._orgs else []
+
+    def get_connection(self, alias: str, refresh: bool = False) -> Salesforce:
+        """
+        Return the pooled client for an org, authenticating if needed
+        """
+        with self._lock:
+            org = self._orgs.get(alias)
+        if org is None:
+            raise KeyError(f"Unknown org: {alias}")
+
+        # Per-org lock so concurrent commands share one login per org
+        with org["lock"]:
+            stale = time.monotonic() - org["connected_at"] > self.session_max_age
+            if refresh or org["connection"] is None or stale:
+                org["connection"] = authenticate_org(org["url"], org["consumer_key"], org["consumer_secret"])
+                org["connected_at"] = time.monotonic()
+            return org["connection"]
+
+    def find_by_org_id(self, org_id: str) -> Optional[str]:
+        """
+        Find the alias of an already connected org by its org Id
+        """
+        with self._lock:
+            for alias, org in self._orgs.items():
+                if org["connection"] is not None and get_org_id(org["connection"]) == org_id:
+                    return alias
+        return None
+
+    def run(self, alias: str, operation: Callable[[Salesforce], Any]) -> Any:
+        """
+        Run an operation against one org, re-authenticating once on an expired session
+        """
+        from simple_salesforce.exceptions import SalesforceExpiredSession
+
+        try:
+            return operation(self.get_connection(alias))
+        except SalesforceExpiredSession:
+            return operation(self.get_connection(alias, refresh=True))
+
+    def fan_out(self, aliases: List[str], operation: Callable[[Salesforce], Any],
+                max_workers: int = MAX_FAN_OUT_WORKERS) -> Dict[str, dict]:
+        """
+        Run an operation concurrently against several orgs.
+        Returns per-org results in alias order: {"success": True, "result": ...}
+        or {"success": False, "error": "..."}.
+        """
+        def run_one(alias: str) -> dict:
+            try:
+                return {"success": True, "result": self.run(alias, operation)}
+            except Exception as e:
+                return {"success": False, "error": str(e)}
+
+        if not aliases:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(aliases))) as executor:
+            results = list(executor.map(run_one, aliases))
+        return dict(zip(aliases, results))
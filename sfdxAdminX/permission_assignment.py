@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, TYPE_CHECKING
+from soql_cache import cached_query, invalidate_sobject
+from soql_builder import SOQLTemplate, SalesforceId
+
+if TYPE_CHECKING:
+    from simple_salesforce import Salesforce
+
+# sObject Collections accept at most 200 records per request
+COLLECTION_BATCH_SIZE = 200
+
+# Permission sets, groups, profiles and roles change rarely; keep name lookups for an hour
+METADATA_TTL = 3600
+
+
+def _name_lookup(sobject: str, name_fields: List[str], extra_filter: Optional[str] = None) -> tuple:
+    where = "(" + " OR ".join(f"{field} IN :names" for field in name_fields) + ")"
+    if extra_filter:
+        where += f" AND {extra_filter}"
+    return SOQLTemplate(sobject, ["Id"] + name_fields, where, {"names": str}), name_fields
+
+
+# How each assignable kind is looked up by name (API name or label)
+METADATA_LOOKUPS = {
+    "permission_set": _name_lookup("PermissionSet", ["Name", "Label"], "IsOwnedByProfile = false"),
+    "permission_set_group": _name_lookup("PermissionSetGroup", ["DeveloperName", "MasterLabel"]),
+    "profile": _name_lookup("Profile", ["Name"]),
+    "role": _name_lookup("UserRole", ["Name", "DeveloperName"]),
+}
+
+USERS_BY_ID = SOQLTemplate("User", ["Id", "Email", "Username"], "Id IN :ids", {"ids": SalesforceId})
+USERS_BY_NAME = SOQLTemplate("User", ["Id", "Email", "Username"],
+                             "Email IN :names OR Username IN :names", {"names": str})
+EXISTING_ASSIGNMENTS = {
+    field: SOQLTemplate("PermissionSetAssignment", ["Id", "AssigneeId", field],
+                        f"AssigneeId IN :user_ids AND {field} IN :target_ids",
+                        {"user_ids": SalesforceId, "target_ids": SalesforceId})
+    for field in ("PermissionSetId", "PermissionSetGroupId")
+}
+
+_USER_ID = re.compile(r"^005[A-Za-z0-9]{12}(?:[A-Za-z0-9]{3})?$")
+
+
+def _chunks(items: list, size: int = COLLECTION_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def resolve_metadata_ids(sf: Salesforce, kind: str, names: List[str]) -> Dict[str, str]:
+    """
+    Resolve permission set, group, profile or role names (API name or label) to Ids.
+    Uses one cached query per kind; names that match nothing are left out.
+    """
+    template, name_fields = METADATA_LOOKUPS[kind]
+    names = sorted({n.strip() for n in names if n and n.strip()})
+    records = []
+    for soql in template.render_chunks("names", names=names):
+        records.extend(cached_query(sf, soql, ttl=METADATA_TTL).get("records", []))
+
+    wanted = {name.lower(): name for name in names}
+    resolved = {}
+    for record in records:
+        for field in name_fields:
+            name = wanted.get(str(record.get(field) or "").lower())
+            if name and name not in resolved:
+                resolved[name] = record["Id"]
+    return resolved
+
+
+def resolve_user_ids(sf: Salesforce, identifiers: List[str]) -> Dict[str, str]:
+    """
+    Resolve user emails, usernames or Ids to user Ids in one query
+    """
+    identifiers = sorted({i.strip() for i in identifiers if i and i.strip()})
+    # Id filters reject values that aren't Ids, so only real Ids go in that list
+    ids = [i for i in identifiers if _USER_ID.match(i)]
+    names = [i for i in identifiers if not _USER_ID.match(i)]
+    queries = list(USERS_BY_ID.render_chunks("ids", ids=ids)) + list(USERS_BY_NAME.render_chunks("names", names=names))
+    records = []
+    for soql in queries:
+        records.extend(cached_query(sf, soql).get("records", []))
+
+    wanted = {identifier.lower(): identifier for identifier in identifiers}
+    resolved = {}
+    for record in records:
+        for value in (record.get("Id"), record.get("Username"), record.get("Email")):
+            identifier = wanted.get(str(value or "").lower())
+            if identifier and identifier not in resolved:
+                resolved[identifier] = record["Id"]
+    return resolved
+
+
+def _collection_errors(result: dict) -> str:
+    errors = result.get("errors") or []
+    return "; ".join(e.get("message", str(e)) if isinstance(e, dict) else str(e) for e in errors) or "Unknown error"
+
+
+def _write_collection(sf: Salesforce, method: str, records: List[dict]) -> List[dict]:
+    """
+    Insert or update records through sObject Collections, 200 per request, without all-or-none.
+    Returns one {"id", "success", "errors"} result per record, in order.
+    """
+    results = []
+    for batch in _chunks(records):
+        response = sf.restful("composite/sobjects", method=method,
+                              json={"allOrNone": False, "records": batch})
+        results.extend(response)
+    return results
+
+
+def _delete_collection(sf: Salesforce, record_ids: List[str]) -> List[dict]:
+    """
+    Delete records through sObject Collections, 200 Ids per request
+    """
+    results = []
+    for batch in _chunks(record_ids):
+        response = sf.restful("composite/sobjects", method="DELETE",
+                              params={"ids": ",".join(batch), "allOrNone": "false"})
+        results.extend(response)
+    return results
+
+
+def _summarize(results: List[dict], unresolved: List[str]) -> dict:
+    failed = [r for r in results if not r["success"]]
+    return {
+        "success": True,
+        "results": results,
+        "succeeded": len(results) - len(failed),
+        "failed": len(failed),
+        "unresolved": unresolved,
+    }
+
+
+def _resolve_assignment_targets(sf: Salesforce, users: List[str], permission_sets: List[str],
+                                permission_set_groups: List[str]) -> tuple:
+    user_ids = resolve_user_ids(sf, users)
+    set_ids = resolve_metadata_ids(sf, "permission_set", permission_sets)
+    group_ids = resolve_metadata_ids(sf, "permission_set_group", permission_set_groups)
+    unresolved = ([u for u in users if u not in user_ids]
+                  + [p for p in permission_sets if p not in set_ids]
+                  + [g for g in permission_set_groups if g not in group_ids])
+    return user_ids, set_ids, group_ids, unresolved
+
+
+def _existing_assignments(sf: Salesforce, user_ids: List[str], field: str, target_ids: List[str]) -> Dict[tuple, str]:
+    """
+    Map (AssigneeId, target Id) to the PermissionSetAssignment Id for assignments that already exist
+    """
+    if not user_ids or not target_ids:
+        return {}
+    existing = {}
+    for soql in EXISTING_ASSIGNMENTS[field].render_chunks("user_ids", user_ids=user_ids, target_ids=target_ids):
+        for record in sf.query_all(soql).get("records", []):
+            existing[(record["AssigneeId"], record[field])] = record["Id"]
+    return existing
+
+
+def assign_permission_sets(sf: Salesforce, users: List[str], permission_sets: Optional[List[str]] = None,
+                           permission_set_groups: Optional[List[str]] = None) -> dict:
+    """
+    Assign permission sets and permission set groups to many users.
+    Existing assignments are skipped; new ones are inserted in collections of 200.
+    """
+    permission_sets = permission_sets or []
+    permission_set_groups = permission_set_groups or []
+    try:
+        user_ids, set_ids, group_ids, unresolved = _resolve_assignment_targets(
+            sf, users, permission_sets, permission_set_groups)
+
+        planned = []
+        for field, targets in (("PermissionSetId", set_ids), ("PermissionSetGroupId", group_ids)):
+            existing = _existing_assignments(sf, list(user_ids.values()), field, list(targets.values()))
+            for user, user_id in user_ids.items():
+                for name, target_id in targets.items():
+                    if (user_id, target_id) not in existing:
+                        planned.append((user, name, {"attributes": {"type": "PermissionSetAssignment"},
+                                                     "AssigneeId": user_id, field: target_id}))
+
+        try:
+            raw_results = _write_collection(sf, "POST", [record for _, _, record in planned]) if planned else []
+        finally:
+            invalidate_sobject(sf, "PermissionSetAssignment")
+
+        results = [
+            {"user": user, "target": name, "success": bool(r.get("success")),
+             "error": None if r.get("success") else _collection_errors(r)}
+            for (user, name, _), r in zip(planned, raw_results)
+        ]
+        summary = _summarize(results, unresolved)
+        summary["skipped"] = len(user_ids) * (len(set_ids) + len(group_ids)) - len(planned)
+        return summary
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def remove_permission_sets(sf: Salesforce, users: List[str], permission_sets: Optional[List[str]] = None,
+                           permission_set_groups: Optional[List[str]] = None) -> dict:
+    """
+    Remove permission set and permission set group assignments from many users.
+    Matching PermissionSetAssignment rows are deleted in collections of 200.
+    """
+    permission_sets = permission_sets or []
+    permission_set_groups = permission_set_groups or []
+    try:
+        user_ids, set_ids, group_ids, unresolved = _resolve_assignment_targets(
+            sf, users, permission_sets, permission_set_groups)
+        users_by_id = {user_id: user for user, user_id in user_ids.items()}
+
+        planned = []
+        for field, targets in (("PermissionSetId", set_ids), ("PermissionSetGroupId", group_ids)):
+            names_by_id = {target_id: name for name, target_id in targets.items()}
+            existing = _existing_assignments(sf, list(user_ids.values()), field, list(targets.values()))
+            for (user_id, target_id), assignment_id in existing.items():
+                planned.append((users_by_id[user_id], names_by_id[target_id], assignment_id))
+
+        try:
+            raw_results = _delete_collection(sf, [assignment_id for _, _, assignment_id in planned]) if planned else []
+        finally:
+            invalidate_sobject(sf, "PermissionSetAssignment")
+
+        results = [
+            {"user": user, "target": name, "success": bool(r.get("success")),
+             "error": None if r.get("success") else _collection_errors(r)}
+            for (user, name, _), r in zip(planned, raw_results)
+        ]
+        summary = _summarize(results, unresolved)
+        summary["not_assigned"] = len(user_ids) * (len(set_ids) + len(group_ids)) - len(planned)
+        return summary
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def assign_user_field(sf: Salesforce, users: List[str], kind: str, name: str) -> dict:
+    """
+    Set the profile or role of many users with User updates in collections of 200
+    """
+    field = {"profile": "ProfileId", "role": "UserRoleId"}[kind]
+    try:
+        user_ids = resolve_user_ids(sf, users)
+        target_id = resolve_metadata_ids(sf, kind, [name]).get(name.strip())
+        if target_id is None:
+            return {"success": False, "error": f"No {kind.replace('_', ' ')} named '{name}' was found"}
+        unresolved = [u for u in users if u not in user_ids]
+
+        records = [{"attributes": {"type": "User"}, "Id": user_id, field: target_id} for user_id in user_ids.values()]
+        try:
+            raw_results = _write_collection(sf, "PATCH", records) if records else []
+        finally:
+            invalidate_sobject(sf, "User")
+
+        results = [
+            {"user": user, "target": name, "success": bool(r.get("success")),
+             "error": None if r.get("success") else _collection_errors(r)}
+            for user, r in zip(user_ids, raw_results)
+        ]
+        return _summarize(results, unresolved)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def format_assignment_result(result: dict, action: str) -> str:
+    """
+    Format a bulk assignment result for display in chat
+    """
+    if not result["success"]:
+        return f"❌ Failed to {action}: {result.get('error', 'Unknown error')}"
+
+    response = f"✅ {action.capitalize()}: {result['succeeded']} succeeded, {result['failed']} failed"
+    if result.get("skipped"):
+        response += f", {result['skipped']} already in place"
+    if result.get("not_assigned"):
+        response += f", {result['not_assigned']} were not assigned"
+    if result["unresolved"]:
+        response += f"\n\n⚠️ Not found: {', '.join(result['unresolved'])}"
+    failures = [r for r in result["results"] if not r["success"]]
+    if failures:
+        response += "\n\n❌ Failures:\n" + "\n".join(f"• {r['user']} → {r['target']}: {r['error']}" for r in failures[:20])
+    return response
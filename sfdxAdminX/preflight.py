@@ -0,0 +1,149 @@
+import time
+import threading
+from typing import Dict, List, Optional
+from soql_cache import get_org_id
+from soql_builder import SOQLTemplate
+
+# Rebuild an org's index after this long so users created elsewhere are picked up
+INDEX_MAX_AGE = 600
+
+IDENTITY_QUERY = SOQLTemplate("User", ["Username", "Email", "IsActive"])
+
+
+def _key(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+def _split_username(username: str) -> tuple:
+    local, _, domain = _key(username).partition("@")
+    return local, domain
+
+
+class IdentityIndex:
+    """
+    Hashed index of the usernames and active-user emails in one org.
+
+    Lookups are set membership, so checking a row costs O(1) regardless of
+    org size.
+    """
+
+    def __init__(self, usernames=(), active_emails=()):
+        self.usernames = {_key(u) for u in usernames if u}
+        self.active_emails = {_key(e) for e in active_emails if e}
+        self.built_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_org(cls, sf) -> "IdentityIndex":
+        """
+        Build the index from every user in the org, streaming the query results
+        """
+        usernames, active_emails = [], []
+        for record in sf.query_all_iter(IDENTITY_QUERY.render()):
+            usernames.append(record.get("Username"))
+            if record.get("IsActive"):
+                active_emails.append(record.get("Email"))
+        return cls(usernames, active_emails)
+
+    def username_taken(self, username: str) -> bool:
+        return _key(username) in self.usernames
+
+    def email_active(self, email: str) -> bool:
+        return _key(email) in self.active_emails
+
+    def add(self, username: str, email: Optional[str] = None, active: bool = True):
+        """
+        Record a user created through the app so later checks see it
+        """
+        with self._lock:
+            self.usernames.add(_key(username))
+            if email and active:
+                self.active_emails.add(_key(email))
+
+    def suggest_username(self, username: str, reserved: Optional[set] = None,
+                         next_suffix: Optional[Dict[str, int]] = None) -> str:
+        """
+        Suggest a unique username by numbering the local part: jane@acme.com -> jane1@acme.com.
+        `reserved` holds names already claimed by other rows of the same batch, and
+        `next_suffix` carries a counter per base name across a batch so repeated
+        bases don't rescan the numbers already handed out.
+        """
+        local, domain = _split_username(username)
+        base = f"{local}@{domain}" if domain else local
+        reserved = reserved if reserved is not None else set()
+        next_suffix = next_suffix if next_suffix is not None else {}
+        suffix = next_suffix.get(base, 1)
+        while True:
+            candidate = f"{local}{suffix}@{domain}" if domain else f"{local}{suffix}"
+            suffix += 1
+            if candidate not in self.usernames and candidate not in reserved:
+                break
+        next_suffix[base] = suffix
+        return candidate
+
+
+def preflight_rows(index: IdentityIndex, rows: List[dict]) -> List[dict]:
+    """
+    Check new-user rows against the org and against each other before any API call.
+    Rows use the create_user keys (firstName, lastName, email, username; username defaults to email).
+    Returns one result per row: {"row", "username", "email", "issues", "suggested_username"}.
+    """
+    results = []
+    seen_usernames: Dict[str, int] = {}
+    seen_emails: Dict[str, int] = {}
+    claimed = set()
+    next_suffix: Dict[str, int] = {}
+
+    for number, row in enumerate(rows, start=1):
+        email = _key(row.get("email"))
+        username = _key(row.get("username")) or email
+        issues = []
+
+        if not username:
+            issues.append("missing username and email")
+        elif index.username_taken(username):
+            issues.append("username already exists in the org")
+        elif username in seen_usernames:
+            issues.append(f"duplicate username of row {seen_usernames[username]}")
+
+        if email and index.email_active(email):
+            issues.append("email already belongs to an active user")
+        elif email and email in seen_emails:
+            issues.append(f"duplicate email of row {seen_emails[email]}")
+
+        suggestion = None
+        if username and (index.username_taken(username) or username in seen_usernames):
+            suggestion = index.suggest_username(username, claimed, next_suffix)
+            claimed.add(suggestion)
+        elif username:
+            claimed.add(username)
+            seen_usernames[username] = number
+        if email:
+            seen_emails.setdefault(email, number)
+
+        results.append({
+            "row": number,
+            "username": username,
+            "email": email,
+            "issues": issues,
+            "suggested_username": suggestion,
+        })
+    return results
+
+
+_indexes: Dict[str, IdentityIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_identity_index(sf, refresh: bool = False) -> IdentityIndex:
+    """
+    Return the org's identity index, building it on first use or once it is stale
+    """
+    org_id = get_org_id(sf)
+    with _indexes_lock:
+        index = _indexes.get(org_id)
+    if refresh or index is None or time.monotonic() - index.built_at > INDEX_MAX_AGE:
+        index = IdentityIndex.from_org(sf)
+        with _indexes_lock:
+            _indexes[org_id] = index
+    return index
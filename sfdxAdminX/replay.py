@@ -0,0 +1,541 @@
+"""
+Replay harness for SFDC AdminX command traffic.
+
+Reads chat_history.log (or a JSONL log with one {"timestamp", "command",
+"response"} object per line), drives every command through the full app
+with Streamlit's AppTest against an in-memory Salesforce stand-in, and
+records latency, API calls and the response of each command.
+
+    python replay.py run --log chat_history.log --out base.json
+    python replay.py run --app-dir ../other-checkout/sfdxAdminX --speed 10 --out head.json
+    python replay.py diff base.json head.json
+    python replay.py compare --base-dir ../old/sfdxAdminX --head-dir . --log chat_history.log
+
+--speed replays at N times the original pace; 0 (the default) sends commands
+back to back. Commands are parsed with the regex fallback unless --llm live
+is given, in which case OPENAI_API_KEY is used.
+"""
+import os
+import re
+import sys
+import json
+import time
+import types
+import argparse
+import datetime
+import tempfile
+import subprocess
+import statistics
+from collections import Counter
+from typing import Dict, Any, Optional, List, Iterator
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MOCK_INSTANCE_URL = "https://replay.my.salesforce.com"
+MOCK_ORG_ID = "00DREPLAY000001"
+
+_TEXT_ENTRY = re.compile(r"^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] (User|AdminX): ?(.*)$")
+_SEPARATOR = "-" * 50
+_EMAIL = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+
+
+# ---------------------------------------------------------------------------
+# Log parsing
+# ---------------------------------------------------------------------------
+
+def _parse_timestamp(value: Any) -> Optional[datetime.datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def parse_text_log(lines: Iterator[str]) -> List[dict]:
+    """
+    Parse the chat_history.log format: a User line, an AdminX line whose
+    response may continue over several lines, then a dashed separator
+    """
+    entries = []
+    current = None
+    field = None
+    for raw in lines:
+        line = raw.rstrip("\n")
+        if line == _SEPARATOR:
+            if current:
+                entries.append(current)
+            current, field = None, None
+            continue
+        match = _TEXT_ENTRY.match(line)
+        if match and match.group(2) == "User":
+            current = {"timestamp": _parse_timestamp(match.group(1)), "command": match.group(3), "response": ""}
+            field = "command"
+        elif match and current is not None:
+            current["response"] = match.group(3)
+            field = "response"
+        elif current is not None and field:
+            current[field] += "\n" + line
+    if current:
+        entries.append(current)
+    return entries
+
+
+def parse_jsonl_log(lines: Iterator[str]) -> List[dict]:
+    """
+    Parse structured logs: one JSON object per line with a command and optional timestamp and response
+    """
+    entries = []
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        entries.append({
+            "timestamp": _parse_timestamp(record.get("timestamp")),
+            "command": record.get("command") or record.get("message") or record.get("user", ""),
+            "response": record.get("response", ""),
+        })
+    return entries
+
+
+def parse_log(path: str) -> List[dict]:
+    """
+    Read a command log in either format into a list of {"timestamp", "command", "response"}.
+    Background job announcements are skipped since they were not typed by a user.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    first = next((line for line in lines if line.strip()), "")
+    entries = parse_jsonl_log(lines) if first.lstrip().startswith("{") else parse_text_log(lines)
+    return [e for e in entries if e["command"].strip() and not e["command"].startswith("[job #")]
+
+
+# ---------------------------------------------------------------------------
+# Local Salesforce stand-in
+# ---------------------------------------------------------------------------
+
+_CONDITION = re.compile(
+    r"([A-Za-z_][\w.]*)\s*(=|!=|IN)\s*(\([^)]*\)|'(?:[^'\\]|\\.)*'|true|false|null)", re.IGNORECASE)
+_LIMIT = re.compile(r"\bLIMIT\s+(\d+)", re.IGNORECASE)
+
+
+def _literal(token: str) -> Any:
+    token = token.strip()
+    if token.startswith("'"):
+        return token[1:-1].replace("\\'", "'").replace("\\\\", "\\")
+    lowered = token.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    return None if lowered == "null" else token
+
+
+def _field(record: dict, path: str) -> Any:
+    value: Any = record
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def _matches(record: dict, where: str) -> bool:
+    """
+    Evaluate equality, inequality and IN conditions joined by AND/OR.
+    Conditions the stand-in doesn't understand (date literals, ranges) are treated as true.
+    """
+    for group in re.split(r"\s+OR\s+", where, flags=re.IGNORECASE):
+        holds = True
+        for field, operator, value in _CONDITION.findall(group):
+            actual = _field(record, field)
+            if isinstance(actual, str):
+                actual = actual.lower()
+            if operator.upper() == "IN":
+                options = {str(_literal(v)).lower() for v in re.findall(r"'(?:[^'\\]|\\.)*'", value)}
+                holds = holds and str(actual).lower() in options
+            else:
+                expected = _literal(value)
+                if isinstance(expected, str):
+                    expected = expected.lower()
+                holds = holds and ((actual == expected) == (operator == "="))
+        if holds:
+            return True
+    return False
+
+
+class _MockSObject:
+    def __init__(self, org: "MockOrg", name: str):
+        self.org = org
+        self.name = name
+
+    def create(self, data: dict) -> dict:
+        self.org.record_call("create")
+        record_id = f"005RP{len(self.org.records(self.name)):010d}"
+        self.org.records(self.name)[record_id] = dict(data, Id=record_id)
+        return {"id": record_id, "success": True, "errors": []}
+
+    def update(self, record_id: str, data: dict) -> int:
+        self.org.record_call("update")
+        record = self.org.records(self.name).get(record_id)
+        if record is None:
+            raise ValueError(f"Entity is deleted or does not exist: {record_id}")
+        record.update(data)
+        return 204
+
+
+class _MockBulkSObject:
+    def __init__(self, org: "MockOrg", name: str):
+        self.org = org
+        self.name = name
+
+    def query(self, soql: str, lazy_operation: bool = False):
+        self.org.record_call("bulk_query")
+        records = self.org.select(soql)
+        return iter([records]) if lazy_operation else records
+
+    def update(self, records: List[dict], batch_size: int = 10000) -> List[dict]:
+        self.org.record_call("bulk_update")
+        results = []
+        for record in records:
+            stored = self.org.records(self.name).get(record["Id"])
+            if stored is None:
+                results.append({"id": record["Id"], "success": False, "errors": ["ENTITY_IS_DELETED"]})
+            else:
+                stored.update({k: v for k, v in record.items() if k != "Id"})
+                results.append({"id": record["Id"], "success": True, "errors": []})
+        return results
+
+
+class _MockBulk:
+    def __init__(self, org: "MockOrg"):
+        self.org = org
+
+    def __getattr__(self, name: str) -> _MockBulkSObject:
+        return _MockBulkSObject(self.org, name)
+
+
+class MockOrg:
+    """
+    In-memory Salesforce stand-in with the parts of the simple_salesforce API the app uses.
+    Every call is counted by kind and can be given a fixed latency.
+    """
+
+    def __init__(self, users: Optional[List[dict]] = None, api_latency: float = 0.0):
+        self.sf_instance = MOCK_INSTANCE_URL.split("//", 1)[1]
+        self.base_url = MOCK_INSTANCE_URL
+        self.adminx_org_id = MOCK_ORG_ID
+        self.session_id = "replay-session"
+        self.api_latency = api_latency
+        self.calls: Counter = Counter()
+        self._tables: Dict[str, Dict[str, dict]] = {"user": {}}
+        for user in users or []:
+            self._tables["user"][user["Id"]] = dict(user)
+        self.bulk = _MockBulk(self)
+
+    def __getattr__(self, name: str) -> _MockSObject:
+        if name[:1].isupper():
+            return _MockSObject(self, name)
+        raise AttributeError(name)
+
+    def records(self, sobject: str) -> Dict[str, dict]:
+        return self._tables.setdefault(sobject.lower(), {})
+
+    def record_call(self, kind: str):
+        self.calls[kind] += 1
+        if self.api_latency:
+            time.sleep(self.api_latency)
+
+    def select(self, soql: str) -> List[dict]:
+        match = re.search(r"\bFROM\s+(\w+)(?:\s+WHERE\s+(.*?))?(?:\s+ORDER\s+BY\s+.*?)?(?:\s+LIMIT\s+\d+)?\s*$",
+                          " ".join(soql.split()), re.IGNORECASE)
+        if not match:
+            raise ValueError(f"MALFORMED_QUERY: {soql}")
+        sobject, where = match.group(1), match.group(2)
+        rows = [dict(r, attributes={"type": sobject}) for r in self.records(sobject).values()
+                if not where or _matches(r, where)]
+        limit = _LIMIT.search(soql)
+        return rows[:int(limit.group(1))] if limit else rows
+
+    def query(self, soql: str) -> dict:
+        self.record_call("query")
+        records = self.select(soql)
+        return {"totalSize": len(records), "done": True, "records": records}
+
+    def query_all(self, soql: str) -> dict:
+        return self.query(soql)
+
+    def query_all_iter(self, soql: str):
+        return iter(self.query(soql)["records"])
+
+    def restful(self, path: str, params: Optional[dict] = None, method: str = "GET", **kwargs):
+        self.record_call("rest")
+        if path.startswith("composite/sobjects"):
+            records = (kwargs.get("json") or {}).get("records") or (params or {}).get("ids", "").split(",")
+            return [{"id": r.get("Id") if isinstance(r, dict) else r, "success": True, "errors": []}
+                    for r in records]
+        return {}
+
+
+def seed_users_from_log(entries: List[dict]) -> List[dict]:
+    """
+    Create a user for every email a non-create command refers to, so update and
+    deactivate traffic exercises the same code paths it did in the real org
+    """
+    emails = []
+    for entry in entries:
+        if re.search(r"\b(?:create|new|add|hire)\b", entry["command"], re.IGNORECASE):
+            continue
+        emails.extend(e.lower() for e in _EMAIL.findall(entry["command"]))
+    users = []
+    for index, email in enumerate(sorted(set(emails))):
+        local = email.split("@")[0]
+        users.append({
+            "Id": f"005RS{index:010d}", "FirstName": local.split(".")[0].title(), "LastName": "Replay",
+            "Email": email, "Username": email, "IsActive": True, "Title": "", "Department": "",
+            "Phone": "", "MobilePhone": "", "UserType": "Standard",
+            "Profile": {"Name": "Standard User", "PermissionsModifyAllData": False},
+        })
+    return users
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def _install_stand_ins(org: MockOrg, llm: str):
+    """
+    Route OAuth and Salesforce clients to the stand-in, and disable the LLM unless replaying live
+    """
+    import requests
+    import simple_salesforce
+
+    real_post = requests.post
+
+    class _TokenResponse:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"access_token": org.session_id, "instance_url": MOCK_INSTANCE_URL,
+                    "id": f"https://login.salesforce.com/id/{MOCK_ORG_ID}/005REPLAYADMIN"}
+
+    def post(url, *args, **kwargs):
+        if "/services/oauth2/token" in url:
+            return _TokenResponse()
+        return real_post(url, *args, **kwargs)
+
+    requests.post = post
+    simple_salesforce.Salesforce = lambda *args, **kwargs: org
+
+    if llm == "off":
+        def disabled(*args, **kwargs):
+            raise RuntimeError("LLM disabled for replay")
+        sys.modules["openai"] = types.SimpleNamespace(OpenAI=disabled)
+
+
+def _widget(widgets, label: str):
+    return next(w for w in widgets if w.label == label)
+
+
+def replay(entries: List[dict], app_dir: str, speed: float = 0.0, llm: str = "off",
+           api_latency: float = 0.0) -> dict:
+    """
+    Replay command entries through the app in app_dir against a fresh stand-in org.
+    Runs in a scratch directory so transcripts, jobs and logs of the real app are untouched.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    sys.path.insert(0, app_dir)
+    org = MockOrg(seed_users_from_log(entries), api_latency=api_latency)
+    _install_stand_ins(org, llm)
+    os.chdir(tempfile.mkdtemp(prefix="adminx-replay-"))
+
+    at = AppTest.from_file(os.path.join(app_dir, "app.py"), default_timeout=120).run()
+    _widget(at.text_input, "API Key").input(os.environ.get("OPENAI_API_KEY", "") if llm == "live" else "replay")
+    _widget(at.text_input, "Instance URL").input(MOCK_INSTANCE_URL)
+    _widget(at.text_input, "Consumer Key").input("replay")
+    _widget(at.text_input, "Consumer Secret").input("replay")
+    _widget(at.button, "🔗 Connect to Salesforce").click()
+    at.run()
+    if not at.session_state["salesforce_connected"]:
+        raise RuntimeError("App did not connect to the stand-in org")
+
+    results = []
+    previous_timestamp = None
+    for entry in entries:
+        if speed and previous_timestamp and entry["timestamp"]:
+            time.sleep(max(0.0, (entry["timestamp"] - previous_timestamp).total_seconds() / speed))
+        previous_timestamp = entry["timestamp"] or previous_timestamp
+
+        calls_before = sum(org.calls.values())
+        inputs = [w for w in list(at.text_area) + list(at.text_input) if w.label == "Enter your command:"]
+        inputs[0].input(entry["command"])
+        _widget(at.button, "📤 Send").click()
+        started = time.perf_counter()
+        at.run()
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        messages = at.session_state["messages"]
+        response = messages[-1]["content"] if messages and messages[-1]["role"] == "assistant" else ""
+        results.append({
+            "command": entry["command"],
+            "logged_response": entry["response"],
+            "response": response,
+            "latency_ms": round(latency_ms, 2),
+            "api_calls": sum(org.calls.values()) - calls_before,
+            "exceptions": [str(e.value) for e in at.exception],
+        })
+
+    return {
+        "app_dir": app_dir,
+        "revision": _git_revision(app_dir),
+        "recorded_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "api_calls_by_kind": dict(org.calls),
+        "results": results,
+    }
+
+
+def _git_revision(path: str) -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=path,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+# ---------------------------------------------------------------------------
+# Diff report
+# ---------------------------------------------------------------------------
+
+def _normalize_response(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize_run(run: dict) -> dict:
+    latencies = [r["latency_ms"] for r in run["results"]]
+    return {
+        "commands": len(latencies),
+        "mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+        "p50_ms": _percentile(latencies, 0.5),
+        "p95_ms": _percentile(latencies, 0.95),
+        "api_calls": sum(r["api_calls"] for r in run["results"]),
+        "exceptions": sum(1 for r in run["results"] if r["exceptions"]),
+    }
+
+
+def diff_runs(base: dict, head: dict) -> dict:
+    """
+    Pair up the commands of two runs and report latency, API-call and response differences
+    """
+    rows = []
+    for index, (a, b) in enumerate(zip(base["results"], head["results"]), start=1):
+        rows.append({
+            "index": index,
+            "command": a["command"],
+            "latency_delta_ms": b["latency_ms"] - a["latency_ms"],
+            "api_calls_delta": b["api_calls"] - a["api_calls"],
+            "response_changed": _normalize_response(a["response"]) != _normalize_response(b["response"]),
+            "base_response": a["response"],
+            "head_response": b["response"],
+        })
+    return {
+        "base": summarize_run(base),
+        "head": summarize_run(head),
+        "unpaired": abs(len(base["results"]) - len(head["results"])),
+        "rows": rows,
+    }
+
+
+def print_diff(report: dict, base_label: str, head_label: str):
+    base, head = report["base"], report["head"]
+    print(f"{'':14}{base_label:>14}{head_label:>14}{'delta':>12}")
+    for key in ["commands", "mean_ms", "p50_ms", "p95_ms", "api_calls", "exceptions"]:
+        print(f"{key:14}{base[key]:>14.1f}{head[key]:>14.1f}{head[key] - base[key]:>+12.1f}")
+
+    changed = [row for row in report["rows"] if row["response_changed"]]
+    call_changes = [row for row in report["rows"] if row["api_calls_delta"]]
+    print(f"\n{len(changed)} responses changed, {len(call_changes)} commands changed API-call count")
+    for row in call_changes:
+        print(f"  #{row['index']:<4} {row['api_calls_delta']:+d} calls  {row['command'][:60]}")
+    for row in changed:
+        print(f"\n  #{row['index']} {row['command'][:70]}")
+        print(f"    - {_normalize_response(row['base_response'])[:160]}")
+        print(f"    + {_normalize_response(row['head_response'])[:160]}")
+    if report["unpaired"]:
+        print(f"\n⚠️ {report['unpaired']} commands only ran in one build")
+
+
+# ---------------------------------------------------------------------------
+# Command line
+# ---------------------------------------------------------------------------
+
+def _load(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _run_in_subprocess(app_dir: str, args: argparse.Namespace, out_path: str):
+    subprocess.run([sys.executable, os.path.abspath(__file__), "run", "--app-dir", app_dir, "--log", args.log,
+                    "--speed", str(args.speed), "--llm", args.llm, "--api-latency", str(args.api_latency),
+                    "--out", out_path], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay AdminX command logs against a local Salesforce stand-in")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    def add_replay_options(sub):
+        sub.add_argument("--log", default=os.path.join(APP_DIR, "chat_history.log"), help="command log to replay")
+        sub.add_argument("--speed", type=float, default=0.0, help="pace multiplier; 0 replays back to back")
+        sub.add_argument("--llm", choices=["off", "live"], default="off", help="parse with the regex fallback or a live LLM")
+        sub.add_argument("--api-latency", type=float, default=0.0, help="seconds added to every stand-in API call")
+
+    run_parser = subparsers.add_parser("run", help="replay a log through one build")
+    add_replay_options(run_parser)
+    run_parser.add_argument("--app-dir", default=APP_DIR, help="directory holding the build's app.py")
+    run_parser.add_argument("--out", required=True, help="where to write the run results (JSON)")
+
+    diff_parser = subparsers.add_parser("diff", help="compare two run results")
+    diff_parser.add_argument("base")
+    diff_parser.add_argument("head")
+
+    compare_parser = subparsers.add_parser("compare", help="replay a log through two builds and diff them")
+    add_replay_options(compare_parser)
+    compare_parser.add_argument("--base-dir", required=True)
+    compare_parser.add_argument("--head-dir", default=APP_DIR)
+
+    args = parser.parse_args()
+
+    if args.action == "run":
+        log_path, out_path = os.path.abspath(args.log), os.path.abspath(args.out)
+        entries = parse_log(log_path)
+        print(f"Replaying {len(entries)} commands from {log_path}")
+        run = replay(entries, os.path.abspath(args.app_dir), speed=args.speed, llm=args.llm,
+                     api_latency=args.api_latency)
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2, ensure_ascii=False)
+        summary = summarize_run(run)
+        print(f"{summary['commands']} commands, mean {summary['mean_ms']:.0f} ms, "
+              f"p95 {summary['p95_ms']:.0f} ms, {summary['api_calls']} API calls -> {out_path}")
+
+    elif args.action == "diff":
+        base, head = _load(args.base), _load(args.head)
+        print_diff(diff_runs(base, head), base.get("revision", "base"), head.get("revision", "head"))
+
+    else:
+        args.log = os.path.abspath(args.log)
+        workdir = tempfile.mkdtemp(prefix="adminx-compare-")
+        base_out, head_out = os.path.join(workdir, "base.json"), os.path.join(workdir, "head.json")
+        # Each build runs in its own interpreter so their modules never mix
+        _run_in_subprocess(os.path.abspath(args.base_dir), args, base_out)
+        _run_in_subprocess(os.path.abspath(args.head_dir), args, head_out)
+        base, head = _load(base_out), _load(head_out)
+        print_diff(diff_runs(base, head), base.get("revision", "base"), head.get("revision", "head"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import re
+import datetime
+from functools import lru_cache
+from typing import Dict, Any, Optional, Iterator, List, Tuple
+
+# Queries travel in the REST query URL; stay well under the ~16k URL limit
+MAX_QUERY_LENGTH = 15000
+
+_IDENTIFIER = re.compile(r"^[A-Za-z][A-Za-z0-9_]*(?:\.[A-Za-z][A-Za-z0-9_]*)*$")
+_SALESFORCE_ID = re.compile(r"^[A-Za-z0-9]{15}(?:[A-Za-z0-9]{3})?$")
+_PLACEHOLDER = re.compile(r":([A-Za-z_][A-Za-z0-9_]*)")
+_DATE_LITERAL = re.compile(r"^(?:[A-Z_]+|[A-Z_]+:\d+)$")
+
+# Characters that must be backslash-escaped inside a SOQL string literal
+_ESCAPES = {"\\": "\\\\", "'": "\\'", '"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+
+
+class SOQLBindError(ValueError):
+    """
+    A bind value is missing or doesn't match its declared type
+    """
+
+
+class SalesforceId(str):
+    """
+    Bind type for 15 or 18 character record Ids
+    """
+
+
+class DateLiteral(str):
+    """
+    Bind type for SOQL date literals such as TODAY or LAST_N_DAYS:90
+    """
+
+
+def escape_literal(value: str) -> str:
+    """
+    Escape a string for use inside single quotes in SOQL
+    """
+    return "".join(_ESCAPES.get(char, char) for char in str(value))
+
+
+def check_identifier(name: str) -> str:
+    """
+    Validate a field, relationship path or sObject name; raises SOQLBindError
+    """
+    if not _IDENTIFIER.match(str(name)):
+        raise SOQLBindError(f"Invalid SOQL identifier: {name!r}")
+    return name
+
+
+def format_value(value: Any, bind_type: Optional[type] = None) -> str:
+    """
+    Render one bind value as a SOQL literal, checking it against its declared type
+    """
+    if isinstance(value, (list, tuple, set, frozenset)):
+        if not value:
+            raise SOQLBindError("IN list binds must not be empty")
+        return "(" + ", ".join(format_value(item, bind_type) for item in value) + ")"
+    if value is None:
+        return "null"
+
+    if bind_type is SalesforceId:
+        if not isinstance(value, str) or not _SALESFORCE_ID.match(value):
+            raise SOQLBindError(f"Not a Salesforce Id: {value!r}")
+        return f"'{value}'"
+    if bind_type is DateLiteral:
+        if not isinstance(value, str) or not _DATE_LITERAL.match(value):
+            raise SOQLBindError(f"Not a SOQL date literal: {value!r}")
+        return value
+    if bind_type is not None and not isinstance(value, bind_type):
+        raise SOQLBindError(f"Expected {bind_type.__name__}, got {type(value).__name__}: {value!r}")
+
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        if value != value or value in (float("inf"), float("-inf")):
+            raise SOQLBindError(f"Not a finite number: {value!r}")
+        return repr(value)
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return f"'{escape_literal(value)}'"
+
+
+class SOQLTemplate:
+    """
+    A query compiled once and rendered with typed bind values.
+
+    The WHERE clause names its binds as :name, e.g. "Email = :email AND IsActive = :active";
+    bind types are declared up front and checked on every render, so a malformed value fails
+    locally instead of costing a round trip. Field lists are validated at compile time and
+    projected variants are compiled once and reused.
+    """
+
+    def __init__(self, sobject: str, fields: List[str], where: Optional[str] = None,
+                 binds: Optional[Dict[str, type]] = None, order_by: Optional[str] = None,
+                 limit: Optional[int] = None):
+        self.sobject = check_identifier(sobject)
+        self.fields = tuple(check_identifier(f) for f in dict.fromkeys(fields))
+        self.where = where
+        self.binds = dict(binds or {})
+        self.order_by = order_by
+        self.limit = limit
+
+        # Split the WHERE clause into literal text and bind names once
+        self._parts: List[Tuple[str, Optional[str]]] = []
+        if where:
+            position = 0
+            for match in _PLACEHOLDER.finditer(where):
+                self._parts.append((where[position:match.start()], match.group(1)))
+                position = match.end()
+            self._parts.append((where[position:], None))
+        undeclared = {name for _, name in self._parts if name and name not in self.binds}
+        if undeclared:
+            raise SOQLBindError(f"Undeclared binds in template: {', '.join(sorted(undeclared))}")
+
+        tail = ""
+        if order_by:
+            tail += f" ORDER BY {order_by}"
+        if limit is not None:
+            tail += f" LIMIT {int(limit)}"
+        self._head = f"SELECT {', '.join(self.fields)} FROM {self.sobject}"
+        self._tail = tail
+
+    def project(self, fields: List[str]) -> "SOQLTemplate":
+        """
+        Return a compiled variant selecting only the given fields (Id is always kept)
+        """
+        return _projected(self, tuple(dict.fromkeys(["Id"] + list(fields))))
+
+    def render(self, **values: Any) -> str:
+        """
+        Render the query with escaped, type-checked bind values
+        """
+        missing = [name for _, name in self._parts if name and name not in values]
+        if missing:
+            raise SOQLBindError(f"Missing bind values: {', '.join(missing)}")
+        if not self._parts:
+            return self._head + self._tail
+        where = "".join(text + (format_value(values[name], self.binds[name]) if name else "")
+                        for text, name in self._parts)
+        return f"{self._head} WHERE {where}{self._tail}"
+
+    def render_chunks(self, in_bind: str, max_length: int = MAX_QUERY_LENGTH, **values: Any) -> Iterator[str]:
+        """
+        Render one query per slice of a list bind so every query stays under max_length.
+        Yields nothing for an empty list.
+        """
+        items = list(values.pop(in_bind))
+        if not items:
+            return
+        bind_type = self.binds[in_bind]
+        occurrences = sum(1 for _, name in self._parts if name == in_bind)
+        # Length of the query without the list; each item adds its literal plus a separator per occurrence
+        sample = format_value([items[0]], bind_type)
+        fixed = len(self.render(**values, **{in_bind: [items[0]]})) - occurrences * len(sample)
+        chunk, length = [], fixed + 2 * occurrences
+        for item in items:
+            item_length = (len(format_value(item, bind_type)) + 2) * occurrences
+            if chunk and length + item_length > max_length:
+                yield self.render(**values, **{in_bind: chunk})
+                chunk, length = [], fixed + 2 * occurrences
+            chunk.append(item)
+            length += item_length
+        yield self.render(**values, **{in_bind: chunk})
+
+
+@lru_cache(maxsize=256)
+def _projected(template: SOQLTemplate, fields: Tuple[str, ...]) -> SOQLTemplate:
+    return SOQLTemplate(template.sobject, list(fields), template.where, template.binds,
+                        template.order_by, template.limit)
+
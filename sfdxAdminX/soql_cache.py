@@ -0,0 +1,178 @@
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Callable
+
+# Matches the sObject named by every FROM clause, including subqueries
+_FROM_PATTERN = re.compile(r"\bFROM\s+([A-Za-z_][A-Za-z0-9_]*)", re.IGNORECASE)
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_soql(soql: str) -> str:
+    """
+    Collapse whitespace so that formatting differences map to the same cache key
+    """
+    return _WHITESPACE_PATTERN.sub(" ", soql).strip()
+
+
+def extract_sobjects(soql: str) -> set:
+    """
+    Return the lower-cased sObject names a query reads from
+    """
+    return {name.lower() for name in _FROM_PATTERN.findall(soql)}
+
+
+def get_org_id(sf) -> str:
+    """
+    Identify the org behind a connection.
+    Uses the org Id captured at login, falling back to the instance host.
+    """
+    org_id = getattr(sf, "adminx_org_id", None)
+    if org_id:
+        return org_id
+    return getattr(sf, "sf_instance", None) or getattr(sf, "base_url", "") or "default"
+
+
+class SOQLCache:
+    """
+    Shared query-result cache keyed by org Id and normalized SOQL.
+
+    Entries expire after a TTL, the least recently used entries are evicted once
+    the entry or byte budget is exceeded, and every entry is indexed by the
+    sObjects it reads so that DML on an object evicts only the affected queries.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024,
+                 default_ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._by_sobject: Dict[tuple, set] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, org_id: str, soql: str) -> Optional[dict]:
+        """
+        Return a cached result, or None on a miss or expired entry
+        """
+        key = (org_id, normalize_soql(soql))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry["expires_at"] <= time.monotonic():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry["result"]
+
+    def put(self, org_id: str, soql: str, result: dict, ttl: Optional[float] = None):
+        """
+        Store a query result and evict least recently used entries if over budget
+        """
+        normalized = normalize_soql(soql)
+        key = (org_id, normalized)
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            sobjects = extract_sobjects(normalized)
+            self._entries[key] = {
+                "result": result,
+                "size": size,
+                "sobjects": sobjects,
+                "expires_at": time.monotonic() + (self.default_ttl if ttl is None else ttl),
+            }
+            self._bytes += size
+            for sobject in sobjects:
+                self._by_sobject.setdefault((org_id, sobject), set()).add(key)
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._stats["evictions"] += 1
+
+    def invalidate_sobject(self, org_id: str, sobject: str) -> int:
+        """
+        Evict every cached query in an org that reads from the given sObject.
+        Returns the number of evicted entries.
+        """
+        with self._lock:
+            keys = self._by_sobject.pop((org_id, sobject.lower()), set())
+            for key in list(keys):
+                self._remove(key)
+            self._stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        """
+        Drop every cached entry, keeping the metrics
+        """
+        with self._lock:
+            self._entries.clear()
+            self._by_sobject.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Return hit-rate and size metrics for display
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry["size"]
+        for sobject in entry["sobjects"]:
+            keys = self._by_sobject.get((key[0], sobject))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_sobject[(key[0], sobject)]
+
+
+# Process-wide cache shared by every Streamlit session
+query_cache = SOQLCache()
+
+
+def cached_query(sf, soql: str, ttl: Optional[float] = None,
+                 runner: Optional[Callable[[str], dict]] = None) -> dict:
+    """
+    Run a SOQL query through the shared cache.
+    Raises whatever the underlying query raises; failures are never cached.
+    """
+    org_id = get_org_id(sf)
+    result = query_cache.get(org_id, soql)
+    if result is not None:
+        return result
+
+    result = (runner or sf.query)(soql)
+    query_cache.put(org_id, soql, result, ttl=ttl)
+    return result
+
+
+def invalidate_sobject(sf, sobject: str) -> int:
+    """
+    Evict cached queries reading from an sObject after DML on it
+    """
+    return query_cache.invalidate_sobject(get_org_id(sf), sobject)
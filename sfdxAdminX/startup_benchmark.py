@@ -0,0 +1,204 @@
+"""
+Startup benchmark for SFDC AdminX.
+
+Runs the app once headlessly under `python -X importtime`, measures the
+time to the first completed render and the import cost the app adds on top
+of Streamlit, and does the same for a minimal reference app in the same run.
+Wall-clock numbers depend on the machine, so startup_baseline.json stores the
+app/reference ratios and only those are compared; the absolute times are
+reported for information.
+
+    python startup_benchmark.py            # check against the baseline, exit 1 on regression
+    python startup_benchmark.py --record   # write the current ratios as the new baseline
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import datetime
+import subprocess
+import statistics
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, "app.py")
+BASELINE_FILE = os.path.join(APP_DIR, "startup_baseline.json")
+HISTORY_FILE = os.path.join(APP_DIR, "startup_history.jsonl")
+
+BEGIN_MARKER = "adminx-startup: begin"
+END_MARKER = "adminx-startup: end"
+
+# Modules that must stay lazily imported; loading any of them during startup is a regression
+LAZY_MODULES = ["openai", "simple_salesforce", "requests", "oauthlib", "requests_oauthlib", "pandas"]
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$")
+
+# A bare Streamlit page with the same layout calls, timed alongside the app as the yardstick
+REFERENCE_APP = """
+import streamlit as st
+st.set_page_config(page_title="reference", page_icon="⚡", layout="wide")
+st.markdown("<style></style>", unsafe_allow_html=True)
+with st.sidebar:
+    st.text_input("Instance URL")
+    st.button("Connect")
+st.title("Reference")
+st.chat_input("Type a command")
+"""
+
+# Streamlit is imported before the markers, so only the app's own import cost falls between them
+PROBE = """
+import sys, time, json
+from streamlit.testing.v1 import AppTest
+sys.stderr.write({begin!r} + "\\n")
+sys.stderr.flush()
+start = time.perf_counter()
+at = AppTest.from_file({path!r}, default_timeout=120).run()
+elapsed = time.perf_counter() - start
+sys.stderr.flush()
+sys.stderr.write({end!r} + "\\n")
+print(json.dumps({{"first_render_s": elapsed, "exceptions": [str(e.value) for e in at.exception]}}))
+"""
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Parse `-X importtime` lines between the markers into (module, self_us, cumulative_us, depth)
+    """
+    imports = []
+    recording = False
+    for line in stderr.splitlines():
+        if line.startswith(BEGIN_MARKER):
+            recording = True
+        elif line.startswith(END_MARKER):
+            break
+        elif recording:
+            match = IMPORT_LINE.match(line)
+            if match:
+                self_us, cumulative_us, indent, module = match.groups()
+                imports.append((module, int(self_us), int(cumulative_us), len(indent)))
+    return imports
+
+
+def run_once(workdir: str, app_path: str = APP_PATH) -> dict:
+    """
+    Start an app once in a fresh interpreter and collect its startup profile
+    """
+    probe = PROBE.format(begin=BEGIN_MARKER, end=END_MARKER, path=app_path)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=workdir, capture_output=True, text=True,
+        env={**os.environ, "PYTHONPATH": APP_DIR + os.pathsep + os.environ.get("PYTHONPATH", "")},
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup probe failed:\n{completed.stderr[-2000:]}")
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    imports = parse_importtime(completed.stderr)
+    top_level_depth = min((depth for _, _, _, depth in imports), default=0)
+    result["import_ms"] = sum(self_us for _, self_us, _, _ in imports) / 1000
+    result["modules"] = sorted({module for module, _, _, _ in imports})
+    result["slowest"] = sorted(
+        ((module, cumulative_us / 1000) for module, _, cumulative_us, depth in imports if depth == top_level_depth),
+        key=lambda item: item[1], reverse=True
+    )[:10]
+    return result
+
+
+def measure(runs: int, workdir: str) -> dict:
+    """
+    Run the app and reference probes alternately and keep the median timings and ratios
+    """
+    reference_path = os.path.join(workdir, "reference_app.py")
+    with open(reference_path, "w", encoding="utf-8") as f:
+        f.write(REFERENCE_APP)
+
+    samples, references = [], []
+    for _ in range(runs):
+        references.append(run_once(workdir, reference_path))
+        samples.append(run_once(workdir))
+    return {
+        "first_render_s": statistics.median(s["first_render_s"] for s in samples),
+        "import_ms": statistics.median(s["import_ms"] for s in samples),
+        "reference_render_s": statistics.median(r["first_render_s"] for r in references),
+        "reference_import_ms": statistics.median(r["import_ms"] for r in references),
+        # Paired per run, so a machine that is slow for both cancels out
+        "first_render_ratio": statistics.median(s["first_render_s"] / r["first_render_s"]
+                                                for s, r in zip(samples, references)),
+        "import_ratio": statistics.median(s["import_ms"] / max(r["import_ms"], 0.001)
+                                          for s, r in zip(samples, references)),
+        "lazy_violations": sorted({m.split(".")[0] for s in samples for m in s["modules"]
+                                   if m.split(".")[0] in LAZY_MODULES}),
+        "exceptions": samples[-1]["exceptions"],
+        "slowest": samples[-1]["slowest"],
+    }
+
+
+def check(result: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Return a list of regressions against the baseline ratios
+    """
+    problems = []
+    if result["exceptions"]:
+        problems.append(f"app raised during first render: {result['exceptions']}")
+    if result["lazy_violations"]:
+        problems.append(f"lazily loaded modules imported at startup: {', '.join(result['lazy_violations'])}")
+    for metric in ["first_render_ratio", "import_ratio"]:
+        limit = baseline.get(metric)
+        if limit is not None and result[metric] > limit * (1 + tolerance):
+            problems.append(f"{metric} {result[metric]:.2f} exceeds baseline {limit:.2f} by more than {tolerance:.0%}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure SFDC AdminX cold start and block regressions")
+    parser.add_argument("--runs", type=int, default=3, help="number of cold starts to take the median of")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown over the baseline ratios")
+    parser.add_argument("--record", action="store_true", help="write the measured ratios as the new baseline")
+    args = parser.parse_args()
+
+    # Run from a scratch directory so the probe never touches the real transcript or logs
+    workdir = os.path.join(APP_DIR, ".startup_benchmark")
+    os.makedirs(workdir, exist_ok=True)
+    result = measure(args.runs, workdir)
+
+    print(f"time to first render: {result['first_render_s'] * 1000:.0f} ms "
+          f"({result['first_render_ratio']:.2f}x the reference app's {result['reference_render_s'] * 1000:.0f} ms)")
+    print(f"app import cost:      {result['import_ms']:.0f} ms "
+          f"({result['import_ratio']:.2f}x the reference app's {result['reference_import_ms']:.0f} ms)")
+    print("slowest top-level imports:")
+    for module, cumulative_ms in result["slowest"]:
+        print(f"  {cumulative_ms:8.1f} ms  {module}")
+
+    with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps({
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "first_render_s": result["first_render_s"],
+            "import_ms": result["import_ms"],
+            "first_render_ratio": result["first_render_ratio"],
+            "import_ratio": result["import_ratio"],
+        }) + "\n")
+
+    if args.record:
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"first_render_ratio": round(result["first_render_ratio"], 2),
+                       "import_ratio": round(result["import_ratio"], 2)}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {BASELINE_FILE}")
+        return
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    problems = check(result, baseline, args.tolerance)
+    if problems:
+        print("\nStartup regression:")
+        for problem in problems:
+            print(f"  ✗ {problem}")
+        sys.exit(1)
+    print("\n✓ Startup within baseline")
+
+
+if __name__ == "__main__":
+    main()
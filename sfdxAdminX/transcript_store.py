@@ -0,0 +1,82 @@
+import sqlite3
+import datetime
+import threading
+from typing import List
+
+TRANSCRIPT_DB = "chat_transcripts.db"
+
+
+class TranscriptStore:
+    """
+    SQLite-backed chat transcript, one stream of messages per browser session.
+    Messages are read back by id so the UI can page through older history
+    without holding it in memory.
+    """
+
+    def __init__(self, db_path: str = TRANSCRIPT_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)")
+        self._conn.commit()
+
+    def append(self, session_id: str, role: str, content: str) -> int:
+        """
+        Store a message and return its id
+        """
+        timestamp = datetime.datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                (session_id, role, content, timestamp)
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def recent(self, session_id: str, limit: int) -> List[dict]:
+        """
+        Return the newest messages of a session, oldest first
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, role, content FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, limit)
+            ).fetchall()
+        return [{"id": row[0], "role": row[1], "content": row[2]} for row in reversed(rows)]
+
+    def before(self, session_id: str, before_id: int, limit: int) -> List[dict]:
+        """
+        Return the page of messages preceding a message id, oldest first
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, role, content FROM messages WHERE session_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (session_id, before_id, limit)
+            ).fetchall()
+        return [{"id": row[0], "role": row[1], "content": row[2]} for row in reversed(rows)]
+
+    def count(self, session_id: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+
+# Process-wide store shared by every Streamlit session
+transcript_store = TranscriptStore()
@@ -1,7 +1,22 @@
+from __future__ import annotations
+
 import re
 import json
-from typing import Dict, Any, Optional
-from simple_salesforce import Salesforce
+from typing import Dict, Any, Optional, TYPE_CHECKING
+from soql_cache import cached_query
+from soql_builder import SOQLTemplate, SalesforceId
+
+if TYPE_CHECKING:
+    from simple_salesforce import Salesforce
+
+# Fields format_user_display reads
+USER_DETAIL_FIELDS = [
+    "Id", "FirstName", "LastName", "Email", "Username", "IsActive",
+    "Title", "Phone", "MobilePhone", "Department"
+]
+USER_BY_EMAIL = SOQLTemplate("User", USER_DETAIL_FIELDS, "Email = :email", {"email": str})
+USER_BY_ID = SOQLTemplate("User", USER_DETAIL_FIELDS, "Id = :user_id", {"user_id": SalesforceId})
+HEALTH_CHECK = SOQLTemplate("User", ["Id"], limit=1)
 
 def validate_salesforce_credentials(url: str, username: str, password: str, token: str) -> tuple[bool, str]:
     """
@@ -19,29 +34,26 @@ def validate_salesforce_credentials(url: str, username: str, password: str, toke
 
     return True, ""
 
+def build_user_lookup(user_id: str, fields: Optional[list] = None) -> str:
+    """
+    Build the query finding a user by email or Id.
+    Selects only `fields` (plus Id) when given; raises SOQLBindError for a malformed Id.
+    """
+    user_id = (user_id or "").strip()
+    if "@" in user_id:
+        template, binds = USER_BY_EMAIL, {"email": user_id}
+    else:
+        template, binds = USER_BY_ID, {"user_id": user_id}
+    if fields is not None:
+        template = template.project(fields)
+    return template.render(**binds)
+
 def get_user_details(sf: Salesforce, user_id: str) -> dict:
     """
     Get detailed user information from Salesforce
     """
     try:
-        if "@" in user_id:
-            # Search by email
-            soql = f"""
-            SELECT Id, FirstName, LastName, Email, Username, IsActive,
-                   Title, Phone, MobilePhone, Department
-            FROM User
-            WHERE Email = '{user_id}'
-            """
-        else:
-            # Search by ID
-            soql = f"""
-            SELECT Id, FirstName, LastName, Email, Username, IsActive,
-                   Title, Phone, MobilePhone, Department
-            FROM User
-            WHERE Id = '{user_id}'
-            """
-
-        result = sf.query(soql)
+        result = cached_query(sf, build_user_lookup(user_id))
 
         if result["totalSize"] > 0:
             user = result["records"][0]
@@ -87,7 +99,19 @@ def extract_command_type(command: str) -> str:
     """
     command_lower = command.lower()
 
-    if any(word in command_lower for word in ["create", "new", "add", "hire"]):
+    if re.search(r"\baudit\b", command_lower):
+        return "audit"
+    elif re.search(r"\b(?:deactivate|disable)\s+(?:all\s+)?(?:stale\s+)?users\b", command_lower):
+        return "mass_deactivate"
+    elif re.search(r"\b(?:remove|revoke|unassign)\s+(?:the\s+)?permission\s+set", command_lower):
+        return "remove_permission_set"
+    elif re.search(r"\b(?:assign|grant|give)\s+(?:the\s+)?permission\s+set", command_lower):
+        return "assign_permission_set"
+    elif re.search(r"\b(?:assign|set|change)\b.*\bprofile\b", command_lower):
+        return "assign_profile"
+    elif re.search(r"\b(?:assign|set|change)\b.*\brole\b", command_lower):
+        return "assign_role"
+    elif any(word in command_lower for word in ["create", "new", "add", "hire"]):
         return "create_user"
     elif any(word in command_lower for word in ["update", "change", "modify", "edit"]):
         return "update_user"
@@ -162,6 +186,79 @@ def parse_deactivate_user_command(command: str) -> dict:
 
     return {}
 
+def parse_mass_deactivate_command(command: str) -> dict:
+    """
+    Basic regex-based parsing for criteria-based deactivation commands as fallback
+    """
+    criteria = {}
+
+    days_match = re.search(r"(?:no|without\s+a?)\s*login\s+(?:in|for)\s+(?:the\s+last\s+)?(\d+)\s+days", command, re.IGNORECASE)
+    if days_match:
+        criteria["inactive_days"] = int(days_match.group(1))
+
+    department_match = re.search(r"department\s+([A-Za-z0-9 &-]+?)(?:\s+(?:and|with|except|who)\b|$)", command, re.IGNORECASE)
+    if department_match:
+        criteria["department"] = department_match.group(1).strip()
+
+    profile_match = re.search(r"profile\s+([A-Za-z0-9 &-]+?)(?:\s+(?:and|with|except|who)\b|$)", command, re.IGNORECASE)
+    if profile_match:
+        criteria["profile"] = profile_match.group(1).strip()
+
+    if criteria:
+        return {
+            "operation": "mass_deactivate",
+            "criteria": criteria
+        }
+
+    return {}
+
+def parse_audit_command(command: str) -> dict:
+    """
+    Basic regex-based parsing for audit commands as fallback
+    """
+    parsed = {"operation": "audit"}
+    days_match = re.search(r"(\d+)\s+days", command, re.IGNORECASE)
+    if days_match:
+        parsed["stale_days"] = int(days_match.group(1))
+    if re.search(r"\b(?:full|fresh|from scratch)\b", command, re.IGNORECASE):
+        parsed["full"] = True
+    return parsed
+
+def _split_user_list(text: str) -> list:
+    """
+    Split "a@x.com, b@x.com and c@x.com" into individual user identifiers
+    """
+    return [part.strip() for part in re.split(r",|\band\b|\s+", text) if part.strip()]
+
+def parse_permission_command(command: str) -> dict:
+    """
+    Basic regex-based parsing for permission set, group, profile and role assignment commands as fallback
+    """
+    pattern = (r"(assign|grant|give|remove|revoke|unassign)\s+(?:the\s+)?"
+               r"(permission\s+set\s+group|permission\s+set|profile|role)\s+(.+?)\s+(?:to|from)\s+(.+)")
+    match = re.search(pattern, command, re.IGNORECASE)
+    if not match:
+        return {}
+
+    action, kind, name, users_text = match.groups()
+    kind = re.sub(r"\s+", " ", kind.lower())
+    name = name.strip().strip("'\"")
+    users = _split_user_list(users_text)
+    removing = action.lower() in ("remove", "revoke", "unassign")
+
+    if kind == "profile" and not removing:
+        return {"operation": "assign_profile", "users": users, "profile": name}
+    if kind == "role" and not removing:
+        return {"operation": "assign_role", "users": users, "role": name}
+    if kind in ("permission set", "permission set group"):
+        return {
+            "operation": "remove_permission_set" if removing else "assign_permission_set",
+            "users": users,
+            "permission_sets": [name] if kind == "permission set" else [],
+            "permission_set_groups": [name] if kind == "permission set group" else [],
+        }
+    return {}
+
 def validate_parsed_command(command: dict) -> tuple[bool, str]:
     """
     Validate the parsed command structure
@@ -190,6 +287,30 @@ def validate_parsed_command(command: dict) -> tuple[bool, str]:
         if not command.get("user_id"):
             return False, "User ID is required for deactivate"
 
+    elif operation == "mass_deactivate":
+        criteria = command.get("criteria") or {}
+        if not any(criteria.get(key) for key in ["inactive_days", "department", "profile"]):
+            return False, "At least one criterion (inactive_days, department, profile) is required for mass_deactivate"
+        if criteria.get("inactive_days") and not str(criteria["inactive_days"]).isdigit():
+            return False, "inactive_days must be a whole number of days"
+
+    elif operation in ("assign_permission_set", "remove_permission_set"):
+        if not command.get("users"):
+            return False, f"At least one user is required for {operation}"
+        if not (command.get("permission_sets") or command.get("permission_set_groups")):
+            return False, f"At least one permission set or permission set group is required for {operation}"
+
+    elif operation in ("assign_profile", "assign_role"):
+        field = "profile" if operation == "assign_profile" else "role"
+        if not command.get("users"):
+            return False, f"At least one user is required for {operation}"
+        if not command.get(field):
+            return False, f"A {field} name is required for {operation}"
+
+    elif operation == "audit":
+        if command.get("stale_days") and not str(command["stale_days"]).isdigit():
+            return False, "stale_days must be a whole number of days"
+
     else:
         return False, f"Unknown operation: {operation}"
 
@@ -223,8 +344,8 @@ def get_connection_health(sf: Salesforce) -> dict:
     Check the health of Salesforce connection
     """
     try:
-        # Simple query to test connection
-        result = sf.query("SELECT Id FROM User LIMIT 1")
+        # Always a live query: a cached result would report an expired or revoked session as healthy
+        result = sf.query(HEALTH_CHECK.render())
         return {"healthy": True, "user_count": result.get("totalSize", 0)}
     except Exception as e:
         return {"healthy": False, "error": str(e)}
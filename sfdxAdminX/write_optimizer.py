@@ -0,0 +1,142 @@
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, Tuple
+from soql_cache import get_org_id, invalidate_sobject
+
+
+def _normalize_value(value: Any) -> Any:
+    """
+    Map equivalent representations to one value: None and "" are both empty,
+    "true"/"false" strings compare equal to booleans
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip()
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    return text
+
+
+def diff_updates(current: dict, updates: dict) -> Tuple[dict, dict]:
+    """
+    Split requested updates into fields that change the record and fields that already hold the value.
+    Fields missing from the current record are always kept.
+    Returns: (changed, unchanged)
+    """
+    changed, unchanged = {}, {}
+    for field, value in updates.items():
+        if field in current and _normalize_value(current[field]) == _normalize_value(value):
+            unchanged[field] = value
+        else:
+            changed[field] = value
+    return changed, unchanged
+
+
+class WriteCoalescer:
+    """
+    Merges pending updates to the same record into a single DML call.
+
+    An update to a record with no write in flight is sent straight away. Updates
+    that arrive while a write to the same record is in flight are merged into one
+    follow-up call (later values win), sent as soon as the in-flight write returns,
+    and every caller merged into it receives the result of that shared call.
+    """
+
+    def __init__(self):
+        self._in_flight = set()
+        self._pending: Dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+        self._stats = {"requested": 0, "dml_calls": 0, "noop_skipped": 0, "coalesced": 0, "fields_dropped": 0}
+
+    def submit(self, sf, sobject: str, record_id: str, fields: dict) -> Future:
+        """
+        Queue an update and return a future resolving to the raw API result
+        """
+        key = (get_org_id(sf), sobject, record_id)
+        with self._lock:
+            self._stats["requested"] += 1
+            pending = self._pending.get(key)
+            if pending is not None:
+                pending["fields"].update(fields)
+                self._stats["coalesced"] += 1
+                return pending["future"]
+
+            batch = {"sf": sf, "fields": dict(fields), "future": Future()}
+            if key in self._in_flight:
+                # Sent by the in-flight writer once its own call returns
+                self._pending[key] = batch
+                return batch["future"]
+            self._in_flight.add(key)
+
+        self._flush(key, batch)
+        return batch["future"]
+
+    def record_noop(self, fields_dropped: int, skipped_call: bool):
+        """
+        Count fields removed by the diff, and a whole call if nothing was left to write
+        """
+        with self._lock:
+            self._stats["requested"] += int(skipped_call)
+            self._stats["noop_skipped"] += int(skipped_call)
+            self._stats["fields_dropped"] += fields_dropped
+
+    def stats(self) -> dict:
+        """
+        Return call counts, including API calls saved by no-op elimination and coalescing
+        """
+        with self._lock:
+            return {**self._stats, "calls_saved": self._stats["noop_skipped"] + self._stats["coalesced"]}
+
+    def _flush(self, key: tuple, batch: dict):
+        with self._lock:
+            self._stats["dml_calls"] += 1
+        sf, sobject, record_id = batch["sf"], key[1], key[2]
+        try:
+            result = getattr(sf, sobject).update(record_id, batch["fields"])
+            batch["future"].set_result(result)
+        except Exception as e:
+            batch["future"].set_exception(e)
+        finally:
+            invalidate_sobject(sf, sobject)
+            with self._lock:
+                queued = self._pending.pop(key, None)
+                if queued is None:
+                    self._in_flight.discard(key)
+            if queued is not None:
+                # The callers merged into the follow-up are waiting on it, not on this caller
+                threading.Thread(target=self._flush, args=(key, queued), daemon=True).start()
+
+
+# Process-wide coalescer shared by every Streamlit session
+write_coalescer = WriteCoalescer()
+
+
+def optimized_update(sf, sobject: str, record_id: str, updates: dict,
+                     current: Optional[dict] = None) -> dict:
+    """
+    Apply an update with unchanged fields removed and concurrent writes coalesced.
+    Returns: {"success", "id", "applied", "unchanged"} or {"success": False, "error"}
+    """
+    changed, unchanged = diff_updates(current or {}, updates)
+    if not changed:
+        write_coalescer.record_noop(len(unchanged), skipped_call=True)
+        return {"success": True, "id": record_id, "applied": {}, "unchanged": unchanged}
+    write_coalescer.record_noop(len(unchanged), skipped_call=False)
+
+    try:
+        result = write_coalescer.submit(sf, sobject, record_id, changed).result()
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+    # simple_salesforce returns the HTTP status code (204) for a successful update
+    if isinstance(result, dict) and "success" in result:
+        success = result["success"]
+    elif isinstance(result, int):
+        success = 200 <= result < 300
+    else:
+        success = True
+    if not success:
+        return {"success": False, "error": f"HTTP {result}: Update failed"}
+    return {"success": True, "id": record_id, "applied": changed, "unchanged": unchanged}